@@ -3,49 +3,109 @@ Generates starter code templates with TODO comments for specific tasks
 """
 
 import logging
-from typing import List
-from pyd_models.schemas import BoilerPlateCodeSchema, StarterCode
+import time
+from typing import List, Optional, Tuple
+from pyd_models.schemas import (
+    BatchScaffoldResponse, BatchStarterCodeResponse, BoilerPlateCodeSchema, ScaffoldTask, StarterCode, TodoLineRange
+)
 from services import get_anthropic_client
+from utils.code_scanner import CodeStructure, TodoLocator, scan_code
 from utils.json_parser import extract_json_from_response
+from utils.tracing import span
+from utils.logging_config import payload_logging_enabled
 
 logger = logging.getLogger(__name__)
 
+# Languages whose methods must live inside a type, and languages built from braces
+TYPE_ONLY_METHOD_LANGUAGES = {'java', 'c#', 'csharp', 'cs'}
+BRACE_LANGUAGES = TYPE_ONLY_METHOD_LANGUAGES | {'c', 'c++', 'cpp', 'javascript', 'js', 'typescript', 'ts'}
+
+
+def find_malformed_code(structure: CodeStructure, language: str = None) -> Optional[str]:
+    """
+    Why the scanned code looks cut off or garbled (a truncated or rate-limited
+    response), or None if its structure is sound
+    """
+    language = (language or '').lower()
+    if language in BRACE_LANGUAGES and structure.depth != 0:
+        return f"unbalanced braces ({structure.depth} block(s) left open)"
+    if language in TYPE_ONLY_METHOD_LANGUAGES and structure.methods_outside_class:
+        line_number, line = structure.line_at(structure.methods_outside_class[0])
+        return f"method outside any class at line {line_number}: {line}"
+    return None
+
+
 #validation function to check for duplication
-def validate_no_duplication(code_snippet: str, class_names: list) -> bool:
+def validate_no_duplication(code_snippet: str, class_names: list, language: str = None,
+                            structure: CodeStructure = None) -> bool:
     """Check if classes are duplicated in the generated code"""
     if not class_names:
         return True  # No classes to check
 
+    # One scan finds every class declaration outside comments and strings
+    if structure is None:
+        structure = scan_code(code_snippet, language)
+
     for class_name in class_names:
-        # Use regex to find actual class declarations (not overlapping patterns)
-        import re
-        
-        # Pattern matches: (public|private|protected)? class ClassName
-        # This handles C#, Java, Python, etc.
-        pattern = rf'\b(?:public\s+|private\s+|protected\s+)?class\s+{re.escape(class_name)}\b'
-        
-        matches = re.findall(pattern, code_snippet, re.IGNORECASE)
-        count = len(matches)
-        
+        count = structure.class_count(class_name)
+
         if count > 1:
             logger.error(f"Class {class_name} appears {count} times - DUPLICATION DETECTED!")
-            # Find line numbers where class appears
-            lines = code_snippet.split('\n')
-            for i, line in enumerate(lines, 1):
-                if re.search(pattern, line, re.IGNORECASE):
-                    logger.error(f"  Line {i}: {line.strip()}")
+            # Report the lines where the class is declared
+            for offset in structure.class_offsets(class_name):
+                line_number, line = structure.line_at(offset)
+                logger.error(f"  Line {line_number}: {line}")
             return False
         elif count == 0:
             logger.warning(f"Class {class_name} not found in generated code!")
     
     # Also check for namespace/package duplication
-    namespace_count = code_snippet.count("namespace ConsoleApp1")
-    if namespace_count > 1:
-        logger.error(f"Namespace duplicated {namespace_count} times!")
-        return False
+    for namespace, namespace_count in structure.namespaces.items():
+        if namespace_count > 1:
+            logger.error(f"Namespace {namespace} duplicated {namespace_count} times!")
+            return False
     
     return True
 
+
+def starter_codes(files: dict, tasks: List[ScaffoldTask]) -> List[StarterCode]:
+    """The v1 per-task records, each carrying its whole file's code"""
+    return [
+        StarterCode(
+            code_snippet=files[task.filename],
+            instructions=task.instructions,
+            todos=task.todos,
+            concept_examples=task.concept_examples,
+            filename=task.filename
+        )
+        for task in tasks
+    ]
+
+
+def expand_scaffold(scaffold: BatchScaffoldResponse) -> BatchStarterCodeResponse:
+    """Compatibility adapter: the v2 scaffold in the original BatchStarterCodeResponse shape"""
+    return BatchStarterCodeResponse(
+        tasks=starter_codes(scaffold.files, scaffold.tasks),
+        total_tasks=scaffold.total_tasks,
+        generation_time=scaffold.generation_time
+    )
+
+
+def _scaffold_tasks(filename: str, code: str, instructions: List[str], todos: List[List[str]]) -> List[ScaffoldTask]:
+    """Per-task records for one generated file, with the lines each task's TODOs landed on"""
+    locator = TodoLocator(code)
+    results = []
+    for task_instructions, task_todos in zip(instructions, todos):
+        lines = locator.locate(task_todos)
+        results.append(ScaffoldTask(
+            filename=filename,
+            instructions=task_instructions,
+            todos=task_todos,
+            todo_lines=TodoLineRange(start_line=lines[0], end_line=lines[1]) if lines else None,
+            concept_examples=None
+        ))
+    return results
+
 # Agent responsible for generating boilerplate code templates
 class CodegenAgent:
 
@@ -54,14 +114,139 @@ class CodegenAgent:
         self.client = get_anthropic_client(model="claude-sonnet-4-20250514")
         self.max_retries = 3
 
+    def generate_batch(self, tasks: List[BoilerPlateCodeSchema], on_file=None) -> BatchScaffoldResponse:
+        """
+        Generate starter code for a batch of tasks, one model call per file.
+
+        Returns the v2 shape: each file's code once, and per-task records that
+        reference it (expand_scaffold gives the original per-task shape).
+        on_file(filename, code, file_tasks, completed_tasks, total_tasks) is
+        called after each file is generated, so callers can expose partial results.
+        """
+        start_time = time.time()
+
+        # Group tasks by filename and track class structure
+        files_map = {}
+
+        for task in tasks:
+            filename = task.filename
+            class_name = getattr(task, 'class_name', None)
+
+            if filename not in files_map:
+                files_map[filename] = {
+                    'tasks': [],
+                    'class_structure': {},
+                    'template_variables': set(),
+                    'method_signatures_by_class': {}  # Track methods per class
+                }
+
+            # Add task to file
+            files_map[filename]['tasks'].append(task)
+
+            # Track template variables
+            if hasattr(task, 'template_variables') and task.template_variables:
+                files_map[filename]['template_variables'].update(task.template_variables)
+
+            # Track method signatures per class
+            if hasattr(task, 'method_signatures') and task.method_signatures and class_name:
+                if class_name not in files_map[filename]['method_signatures_by_class']:
+                    files_map[filename]['method_signatures_by_class'][class_name] = set()
+                files_map[filename]['method_signatures_by_class'][class_name].update(task.method_signatures)
+
+            # Track class membership
+            if class_name:
+                if class_name not in files_map[filename]['class_structure']:
+                    files_map[filename]['class_structure'][class_name] = []
+                files_map[filename]['class_structure'][class_name].append(task)
+
+        logger.info("Tasks organized into %d files", len(files_map))
+        if payload_logging_enabled(logger):
+            for filename, file_data in files_map.items():
+                logger.debug(
+                    "  %s: %d tasks, classes=%s", filename, len(file_data['tasks']),
+                    list(file_data['class_structure'].keys())
+                )
+
+        # Validate class-task distribution before generation
+        for filename, file_data in files_map.items():
+            class_structure = file_data['class_structure']
+            if class_structure:
+                # Check for imbalanced distribution
+                tasks_per_class = {cls: len(tasks) for cls, tasks in class_structure.items()}
+                max_tasks = max(tasks_per_class.values())
+                min_tasks = min(tasks_per_class.values())
+
+                if max_tasks > min_tasks * 3:
+                    logger.warning(f"⚠️  {filename}: Imbalanced task distribution across classes")
+                    for cls, count in tasks_per_class.items():
+                        logger.warning(f"    {cls}: {count} tasks")
+
+                # Check for empty classes
+                for cls, task_list in class_structure.items():
+                    if len(task_list) == 0:
+                        logger.error(f"❌ {filename}: Class '{cls}' has no tasks assigned!")
+                        raise ValueError(f"Class '{cls}' in {filename} has no tasks. Each class must have at least one task.")
+
+        # Generate scaffolding per file
+        files = {}
+        all_results = []
+
+        for filename, file_data in files_map.items():
+            file_tasks = file_data['tasks']
+            class_structure = file_data['class_structure'] if file_data['class_structure'] else None
+            template_vars = list(file_data['template_variables']) if file_data['template_variables'] else None
+            # Convert method signatures from sets to lists per class
+            method_sigs_by_class = {cls: list(methods) for cls, methods in file_data['method_signatures_by_class'].items()} if file_data['method_signatures_by_class'] else None
+
+            logger.info("Generating code for %s (%d tasks)", filename, len(file_tasks))
+            if payload_logging_enabled(logger):
+                logger.debug(
+                    "  classes=%s template_vars=%s method_signatures=%s",
+                    list(class_structure.keys()) if class_structure else None,
+                    template_vars, method_sigs_by_class
+                )
+
+            # Generate for this file only
+            code, file_results = self.generate_file_scaffolding(
+                filename=filename,
+                tasks=file_tasks,
+                class_structure=class_structure,
+                template_variables=template_vars,
+                method_signatures_by_class=method_sigs_by_class
+            )
+
+            files[filename] = code
+            all_results.extend(file_results)
+            logger.info("Generated %d tasks for %s", len(file_results), filename)
+            if on_file:
+                on_file(filename, code, file_results, len(all_results), len(tasks))
+
+        elapsed_time = time.time() - start_time
+        logger.info("Total generation completed in %.2f seconds", elapsed_time)
+
+        if payload_logging_enabled(logger):
+            for idx, result in enumerate(all_results):
+                logger.debug(
+                    "  Task %d: %d todos, file: %s, lines: %s", idx, len(result.todos), result.filename,
+                    result.todo_lines and f"{result.todo_lines.start_line}-{result.todo_lines.end_line}"
+                )
+
+        return BatchScaffoldResponse(
+            files=files,
+            tasks=all_results,
+            total_tasks=len(all_results),
+            generation_time=f"{elapsed_time:.2f}s"
+        )
+
     def generate_file_scaffolding(self, filename: str,
                                tasks: List[BoilerPlateCodeSchema],
                                class_structure: dict = None,
                                template_variables: list = None,
-                               method_signatures_by_class: dict = None) -> List[StarterCode]:
+                               method_signatures_by_class: dict = None) -> Tuple[str, List[ScaffoldTask]]:
         """
         Generate scaffolding for ONE complete file.
         Handles both code files and data files appropriately.
+        Returns the file's code and one record per task.
         """
         if not tasks:
             raise ValueError(f"No tasks provided for {filename}")
@@ -104,16 +289,17 @@ class CodegenAgent:
 
         # Use different prompt for non-code files vs code files
         from utils.agent_prompts import get_file_codegen_prompt, get_non_code_file_prompt
-        if is_non_code_file:
-            prompt = get_non_code_file_prompt(tasks_dict_list, filename)
-        else:
-            prompt = get_file_codegen_prompt(
-                tasks_dict_list,
-                filename,
-                class_structure=class_structure,
-                template_variables=template_variables,
-                method_signatures_by_class=method_signatures_by_class
-            )
+        with span("prompt.build", agent="codegen", filename=filename):
+            if is_non_code_file:
+                prompt = get_non_code_file_prompt(tasks_dict_list, filename)
+            else:
+                prompt = get_file_codegen_prompt(
+                    tasks_dict_list,
+                    filename,
+                    class_structure=class_structure,
+                    template_variables=template_variables,
+                    method_signatures_by_class=method_signatures_by_class
+                )
 
         # Smart token allocation for new compact format
         # Data files need MORE tokens than code files (XML/JSON content is verbose)
@@ -132,7 +318,7 @@ class CodegenAgent:
                 estimated_tokens += len(class_structure) * per_class
             max_tokens = min(estimated_tokens, 8000)
 
-        logger.info(f"Using {max_tokens} tokens for {len(tasks)} tasks in {filename}")
+        logger.info("Using %d tokens for %d tasks in %s", max_tokens, len(tasks), filename)
 
         # ADD THIS: Extra instruction for complex files
         if len(tasks) > 5 or (class_structure and len(class_structure) > 2):
@@ -141,26 +327,39 @@ class CodegenAgent:
         last_error = None
         for attempt in range(self.max_retries):
             try:
-                logger.info(f"File codegen for {filename}, attempt {attempt + 1}/{self.max_retries}")
+                logger.info("File codegen for %s, attempt %d/%d", filename, attempt + 1, self.max_retries)
 
                 response_text = self.client.generate_response(prompt, max_tokens=max_tokens)
 
-                # Log response for debugging
-                logger.info(f"AI response preview (first 500 chars): {response_text[:500]}")
-                logger.info(f"AI response last 200 chars: {response_text[-200:]}")
-                logger.info(f"Total response length: {len(response_text)} characters")
+                if payload_logging_enabled(logger):
+                    logger.debug(
+                        "AI response (%d chars) head: %.500s ... tail: %s",
+                        len(response_text), response_text, response_text[-200:]
+                    )
 
                 data = extract_json_from_response(response_text)
-                logger.info(f"Extracted keys: {list(data.keys())}")
 
                 # New format: {"code_snippet": "...", "task_todos": {"1": [...], "2": [...]}}
                 if "code_snippet" in data and "task_todos" in data:
                     code = data["code_snippet"]
                     task_todos = data["task_todos"]
+                    language = tasks_dict_list[0].get('programming_language')
+
+                    # One scan of the extracted code serves both structural checks
+                    with span("schema.validate", agent="codegen", filename=filename):
+                        structure = scan_code(code, language)
+                        malformed = find_malformed_code(structure, language)
+                    if malformed:
+                        logger.error(f"Malformed code for {filename}: {malformed}")
+                        raise ValueError(f"Generated code is malformed: {malformed}")
 
                     # Validate no class duplication
                     if class_structure:
-                        if not validate_no_duplication(code, list(class_structure.keys())):
+                        with span("schema.validate", agent="codegen", filename=filename):
+                            no_duplication = validate_no_duplication(
+                                code, list(class_structure.keys()), language, structure=structure
+                            )
+                        if not no_duplication:
                             # Log the problematic code for debugging
                             logger.error("=" * 80)
                             logger.error("DUPLICATION DETECTED - Dumping code_snippet for analysis:")
@@ -179,8 +378,8 @@ class CodegenAgent:
                     }
                     min_todos, max_todos = todo_ranges.get(experience_level, (3, 5))
 
-                    # Expand into N task objects
-                    results = []
+                    # One record per task; the code is returned once for the file
+                    instructions, all_todos = [], []
                     for i, task in enumerate(tasks, 1):
                         todos = task_todos.get(str(i), [])
 
@@ -193,16 +392,12 @@ class CodegenAgent:
                         elif len(todos) > max_todos:
                             logger.warning(f"⚠️  Task {i} has {len(todos)} TODOs, expected {min_todos}-{max_todos} for {experience_level} level")
 
-                        results.append(StarterCode(
-                            code_snippet=code,  # Same for all
-                            instructions=f"Task {i}: {task.task_description}",
-                            todos=todos,
-                            concept_examples=None,
-                            filename=filename
-                        ))
+                        instructions.append(f"Task {i}: {task.task_description}")
+                        all_todos.append(todos)
 
-                    logger.info(f"Expanded to {len(results)} tasks")
-                    return results
+                    results = _scaffold_tasks(filename, code, instructions, all_todos)
+                    logger.info("Expanded to %d tasks", len(results))
+                    return code, results
 
                 raise ValueError("Missing code_snippet or task_todos")
 
@@ -218,7 +413,7 @@ class CodegenAgent:
         # Fallback: Generate basic scaffolding manually
         return self._generate_fallback_scaffolding(filename, tasks, tasks_dict_list)
 
-    def _generate_fallback_scaffolding(self, filename: str, tasks, tasks_dict_list) -> List[StarterCode]:
+    def _generate_fallback_scaffolding(self, filename: str, tasks, tasks_dict_list) -> Tuple[str, List[ScaffoldTask]]:
         """
         Generate basic scaffolding when AI generation fails
         """
@@ -242,18 +437,14 @@ class CodegenAgent:
         code_snippet = "\n".join(code_lines)
 
         # Create results with basic TODOs
-        results = []
-        for i in range(len(tasks)):
-            results.append(StarterCode(
-                code_snippet=code_snippet,
-                instructions=f"Task {i+1}: {tasks_dict_list[i]['task_description']}",
-                todos=[f"Implement {tasks_dict_list[i]['task_description']}"],
-                concept_examples=None,
-                filename=filename
-            ))
+        results = _scaffold_tasks(
+            filename, code_snippet,
+            [f"Task {i+1}: {tasks_dict_list[i]['task_description']}" for i in range(len(tasks))],
+            [[f"Implement {tasks_dict_list[i]['task_description']}"] for i in range(len(tasks))]
+        )
 
         logger.info(f"Fallback scaffolding generated with {len(results)} tasks")
-        return results
+        return code_snippet, results
 
 
 codegen_agent = None
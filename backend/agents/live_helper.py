@@ -7,6 +7,8 @@ from pyd_models.schemas import HintResponseSchema, HintSchema
 from services import get_anthropic_client
 from utils.agent_prompts import get_helper_prompt
 from utils.json_parser import extract_json_from_response
+from utils.tracing import span
+from utils.logging_config import payload_logging_enabled
 
 logger = logging.getLogger(__name__)
 
@@ -24,62 +26,43 @@ class LiveHelperAgent:
         Retries up to max_retries times if JSON parsing fails.
         NEW: Can analyze test results to help debug test cases when code is correct.
         """
-        # Log test results info with detailed data
         if inputData.test_results:
-            logger.info("=" * 80)
-            logger.info(f"📊 TEST RESULTS RECEIVED: {len(inputData.test_results)} tests")
-
-            # Correct test filtering logic
-            passed = [t for t in inputData.test_results if t.get('passed') == True]
             failed = [t for t in inputData.test_results if t.get('passed') == False]
+            logger.info(
+                "Hint request with %d test results (%d failed)",
+                len(inputData.test_results), len(failed)
+            )
+            if payload_logging_enabled(logger):
+                # First 2 failed tests in detail
+                for test in failed[:2]:
+                    logger.debug(
+                        "  Failed test %s: function=%s input=%s expected=%s actual=%s error=%s",
+                        test.get('test_name', 'Unknown'), test.get('function_name', 'N/A'),
+                        test.get('input_data', 'N/A'), test.get('expected_output', 'N/A'),
+                        test.get('actual_output', 'N/A'), test.get('error')
+                    )
 
-            logger.info(f"  ✓ Passed: {len(passed)}, ✗ Failed: {len(failed)}")
-
-            # Log first 2 failed tests in detail
-            if failed:
-                logger.info("\n  FAILED TEST DETAILS:")
-                for idx, test in enumerate(failed[:2], 1):
-                    logger.info(f"    Test {idx}: {test.get('test_name', 'Unknown')}")
-                    logger.info(f"      Function: {test.get('function_name', 'N/A')}")
-                    logger.info(f"      Input: {test.get('input_data', 'N/A')}")
-                    logger.info(f"      Expected: {test.get('expected_output', 'N/A')}")
-                    logger.info(f"      Actual: {test.get('actual_output', 'N/A')}")
-                    if test.get('error'):
-                        logger.info(f"      Error: {test.get('error')}")
-            logger.info("=" * 80)
-        else:
-            logger.info("📊 No test results provided")
+        with span("prompt.build", agent="helper"):
+            prompt = get_helper_prompt(
+                task_description=inputData.task_description,
+                concepts=inputData.concepts,
+                student_code=inputData.student_code,
+                question=inputData.question,
+                previous_hints=inputData.previous_hints,
+                help_count=inputData.help_count,
+                known_language=inputData.known_language,
+                target_language=inputData.target_language,
+                experience_level=inputData.experience_level,
+                test_results=inputData.test_results  # NEW: Pass test results for analysis
+            )
 
-        prompt = get_helper_prompt(
-            task_description=inputData.task_description,
-            concepts=inputData.concepts,
-            student_code=inputData.student_code,
-            question=inputData.question,
-            previous_hints=inputData.previous_hints,
-            help_count=inputData.help_count,
-            known_language=inputData.known_language,
-            target_language=inputData.target_language,
-            experience_level=inputData.experience_level,
-            test_results=inputData.test_results  # NEW: Pass test results for analysis
-        )
-
-        # Log if test results section is in prompt
-        if inputData.test_results:
-            if "TEST RESULTS:" in prompt:
-                logger.info("✅ Test results section FOUND in prompt")
-                # Log how many characters the test section is
-                test_section_start = prompt.find("TEST RESULTS:")
-                test_section_end = prompt.find("Student's Question:", test_section_start)
-                if test_section_start != -1 and test_section_end != -1:
-                    section_length = test_section_end - test_section_start
-                    logger.info(f"   Test results section length: {section_length} chars")
-            else:
-                logger.warning("❌ Test results were provided but NOT FOUND in prompt!")
+        if inputData.test_results and "TEST RESULTS:" not in prompt:
+            logger.warning("Test results were provided but NOT FOUND in prompt!")
 
         last_error = None
         for attempt in range(self.max_retries):
             try:
-                logger.info(f"Live Helper Agent attempt {attempt + 1}/{self.max_retries}")
+                logger.info("Live Helper Agent attempt %d/%d", attempt + 1, self.max_retries)
                 response_text = self.client.generate_response(prompt, max_tokens=1000)
                 
                 data = extract_json_from_response(response_text)
@@ -92,17 +75,12 @@ class LiveHelperAgent:
                 if "example_code" not in data:
                     data["example_code"] = None
 
-                logger.info(f"Successfully generated hint on attempt {attempt + 1}")
-
-                # Log the hint for debugging (especially for test results cases)
-                if inputData.test_results:
-                    logger.info("=" * 80)
-                    logger.info("🎯 GENERATED HINT (with test results):")
-                    logger.info(f"   Hint Type: {data.get('hint_type', 'N/A')}")
-                    logger.info(f"   Hint Preview: {data.get('hint', '')[:200]}...")
-                    logger.info("=" * 80)
+                logger.info("Generated hint on attempt %d", attempt + 1)
+                if payload_logging_enabled(logger):
+                    logger.debug("Hint (%s): %.200s", data.get('hint_type', 'N/A'), data.get('hint', ''))
 
-                return HintSchema(**data)
+                with span("schema.build", agent="helper"):
+                    return HintSchema(**data)
                 
             except (ValueError, KeyError) as e:
                 last_error = e
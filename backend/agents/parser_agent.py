@@ -9,6 +9,9 @@ from pyd_models.schemas import AssignmentSchema, TaskBreakdownSchema, TestCase
 from services import get_anthropic_client
 from utils.agent_prompts import get_parser_prompt, get_test_generation_prompt
 from utils.json_parser import extract_json_from_response, validate_task_breakdown
+from utils.template_extractor import extract_template_structure
+from utils.tracing import span
+from utils.logging_config import payload_logging_enabled
 
 logger = logging.getLogger(__name__)
 
@@ -34,10 +37,7 @@ class ParserAgent:
         """
         try:
             filename = file_data.get('filename', 'unknown')
-            logger.info("=" * 80)
-            logger.info(f"STARTING TEST GENERATION FOR FILE: {filename}")
-            logger.info(f"Target Language: {target_language}")
-            logger.info("=" * 80)
+            logger.info("Starting test generation for %s (%s)", filename, target_language)
 
             # Convert file_data to dict if it's a FileSchema object
             if hasattr(file_data, 'model_dump'):  # Pydantic v2
@@ -52,11 +52,11 @@ class ParserAgent:
             # Try to generate test cases with retries
             for attempt in range(self.max_retries):
                 try:
-                    logger.info(f"Test generation for {filename}: attempt {attempt + 1}/{self.max_retries}")
+                    logger.info("Test generation for %s: attempt %d/%d", filename, attempt + 1, self.max_retries)
                     response_text = self.client.generate_response(prompt, max_tokens=2500)
 
-                    logger.info(f"Received response from AI for {filename} (length: {len(response_text)} chars)")
-                    logger.debug(f"Response preview: {response_text[:500]}")
+                    if payload_logging_enabled(logger):
+                        logger.debug("Response preview for %s: %.500s", filename, response_text)
 
                     # Extract JSON array from response
                     test_data = extract_json_from_response(response_text)
@@ -79,9 +79,7 @@ class ParserAgent:
                             logger.warning(f"Skipping invalid test case {idx}: {e} - Data: {test}")
                             continue
 
-                    logger.info("=" * 80)
-                    logger.info(f"✓ Successfully generated {len(test_cases)} test cases for {filename}")
-                    logger.info("=" * 80)
+                    logger.info("Generated %d test cases for %s", len(test_cases), filename)
                     return test_cases
 
                 except (ValueError, KeyError, json.JSONDecodeError) as e:
@@ -110,70 +108,42 @@ class ParserAgent:
         Parse assignment with retry logic for robust JSON extraction.
         Retries up to max_retries times if JSON parsing fails.
         """
-        prompt = get_parser_prompt(
-            assignment_text=inputData.assignment_text,
-            target_language=inputData.target_language,
-            known_language=inputData.known_language,
-            experience_level=inputData.experience_level
-        )
+        # Pull class/method/variable names out of code snippets locally so the
+        # model doesn't have to rediscover them
+        with span("prompt.build", agent="parser"):
+            template_facts = extract_template_structure(inputData.assignment_text, inputData.target_language)
+
+            prompt = get_parser_prompt(
+                assignment_text=inputData.assignment_text,
+                target_language=inputData.target_language,
+                known_language=inputData.known_language,
+                experience_level=inputData.experience_level,
+                template_facts=template_facts
+            )
 
         last_error = None
         task_breakdown_result = None
 
         for attempt in range(self.max_retries):
             try:
-                logger.info(f"Parser Agent attempt {attempt + 1}/{self.max_retries}")
+                logger.info("Parser Agent attempt %d/%d", attempt + 1, self.max_retries)
                 response_text = self.client.generate_response(prompt, max_tokens=3000)
 
-                # Log response for debugging
-                logger.info(f"AI response preview (first 500 chars): {response_text[:500]}")
+                if payload_logging_enabled(logger):
+                    logger.debug("AI response preview: %.500s", response_text)
 
                 data = extract_json_from_response(response_text)
 
-                # Log parsed data keys
-                logger.info(f"Parsed JSON keys: {list(data.keys()) if isinstance(data, dict) else 'not a dict'}")
-
-                # Log template structure detection
-                template_structure = data.get('template_structure', {})
-                if template_structure and template_structure.get('has_template'):
-                    logger.info("=" * 80)
-                    logger.info("📋 TEMPLATE STRUCTURE DETECTED:")
-                    logger.info(f"  Has Template: {template_structure.get('has_template')}")
-                    logger.info(f"  Class Names: {template_structure.get('class_names', [])}")
-                    logger.info(f"  Variable Names: {template_structure.get('variable_names', [])}")
-                    logger.info(f"  Global Method Signatures: {template_structure.get('method_signatures', [])}")
-                    logger.info("=" * 80)
-
-                # Log detected files and classes with methods
-                files_list = data.get('files', [])
-                logger.info("=" * 80)
-                logger.info(f"📁 DETECTED {len(files_list)} FILE(S):")
-                for file_idx, file_data in enumerate(files_list, 1):
-                    filename = file_data.get('filename', 'unknown')
-                    logger.info(f"\n  FILE {file_idx}: {filename}")
-                    logger.info(f"    Purpose: {file_data.get('purpose', 'N/A')}")
-
-                    # Check if file has classes
-                    classes = file_data.get('classes')
-                    tasks = file_data.get('tasks')
-
-                    if classes is not None and len(classes) > 0:
-                        logger.info(f"    Classes: {len(classes)} detected")
-                        for class_idx, cls in enumerate(classes, 1):
-                            class_name = cls.get('class_name', 'Unknown')
-                            method_sigs = cls.get('method_signatures', [])
-                            logger.info(f"      CLASS {class_idx}: {class_name}")
-                            logger.info(f"        Purpose: {cls.get('purpose', 'N/A')}")
-                            logger.info(f"        Method Signatures: {method_sigs}")
-                            logger.info(f"        Tasks: {len(cls.get('tasks', []))}")
-                    elif tasks is not None and len(tasks) > 0:
-                        # Simple file with tasks (could be code file or data file)
-                        logger.info(f"    Tasks: {len(tasks)}")
-                logger.info("=" * 80)
-
-                validate_task_breakdown(data)
-
-                logger.info(f"Successfully parsed assignment on attempt {attempt + 1}")
+                if template_facts['has_template'] and isinstance(data, dict):
+                    self._apply_template_facts(data, template_facts)
+
+                if payload_logging_enabled(logger) and isinstance(data, dict):
+                    self._log_breakdown(data)
+
+                with span("schema.validate", agent="parser"):
+                    validate_task_breakdown(data)
+
+                logger.info("Parsed assignment on attempt %d", attempt + 1)
                 task_breakdown_result = data
                 break
 
@@ -208,7 +178,57 @@ class ParserAgent:
         else:
             logger.warning("No files found, initializing with empty tests")
 
-        return TaskBreakdownSchema(**task_breakdown_result)
+        # Validated straight from the parsed dict; the endpoint serializes the model as is
+        with span("schema.build", agent="parser"):
+            return TaskBreakdownSchema.model_validate(task_breakdown_result)
+
+    def _log_breakdown(self, data: dict):
+        """Debug dump of the detected template, files, classes and method signatures"""
+        template_structure = data.get('template_structure') or {}
+        if template_structure.get('has_template'):
+            logger.debug(
+                "Template structure: classes=%s variables=%s global_methods=%s",
+                template_structure.get('class_names', []),
+                template_structure.get('variable_names', []),
+                template_structure.get('method_signatures', [])
+            )
+
+        files_list = data.get('files', [])
+        logger.debug("Detected %d file(s)", len(files_list))
+        for file_data in files_list:
+            classes = file_data.get('classes') or []
+            logger.debug(
+                "  %s (%s): %d classes, %d tasks", file_data.get('filename', 'unknown'),
+                file_data.get('purpose', 'N/A'), len(classes), len(file_data.get('tasks') or [])
+            )
+            for cls in classes:
+                logger.debug(
+                    "    class %s: %d tasks, methods=%s", cls.get('class_name', 'Unknown'),
+                    len(cls.get('tasks', [])), cls.get('method_signatures', [])
+                )
+
+    def _apply_template_facts(self, data: dict, template_facts: dict):
+        """
+        Overwrite the model's template_structure with the deterministic one and
+        fill in per-class method signatures for classes the pre-pass found.
+        """
+        data['template_structure'] = {
+            'has_template': True,
+            'class_names': template_facts['class_names'],
+            'variable_names': template_facts['variable_names'],
+            'method_signatures': template_facts['method_signatures']
+        }
+
+        methods_by_class = template_facts['methods_by_class']
+        for file_data in data.get('files') or []:
+            if not isinstance(file_data, dict):
+                continue
+            for class_data in file_data.get('classes') or []:
+                if not isinstance(class_data, dict):
+                    continue
+                methods = methods_by_class.get(class_data.get('class_name'))
+                if methods:
+                    class_data['method_signatures'] = methods
 
     def generate_tests_from_code(self, code: str, language: str, filename: str, assignment_description: str = None) -> List[TestCase]:
         """
@@ -224,11 +244,7 @@ class ParserAgent:
             List of TestCase objects
         """
         try:
-            logger.info("=" * 80)
-            logger.info(f"GENERATING TESTS FROM USER CODE: {filename}")
-            logger.info(f"Language: {language}")
-            logger.info(f"Code length: {len(code)} chars")
-            logger.info("=" * 80)
+            logger.info("Generating tests from user code: %s (%s, %d chars)", filename, language, len(code))
 
             # Build context from code and assignment
             if assignment_description:
@@ -248,10 +264,11 @@ class ParserAgent:
             # Try to generate test cases with retries
             for attempt in range(self.max_retries):
                 try:
-                    logger.info(f"Test generation attempt {attempt + 1}/{self.max_retries}")
+                    logger.info("Test generation attempt %d/%d", attempt + 1, self.max_retries)
                     response_text = self.client.generate_response(prompt, max_tokens=2500)
 
-                    logger.info(f"Received response (length: {len(response_text)} chars)")
+                    if payload_logging_enabled(logger):
+                        logger.debug("Response preview: %.500s", response_text)
 
                     # Extract JSON array from response
                     test_data = extract_json_from_response(response_text)
@@ -274,9 +291,7 @@ class ParserAgent:
                             logger.warning(f"Skipping invalid test case {idx}: {e}")
                             continue
 
-                    logger.info("=" * 80)
-                    logger.info(f"✓ Successfully generated {len(test_cases)} test cases from user code")
-                    logger.info("=" * 80)
+                    logger.info("Generated %d test cases from user code", len(test_cases))
                     return test_cases
 
                 except (ValueError, KeyError, json.JSONDecodeError) as e:
@@ -0,0 +1,148 @@
+"""
+Micro-benchmark for the structural code scanner.
+
+Times the checks CodegenAgent and AnthropicClient run on generated code -
+class duplication, namespace duplication and methods outside classes -
+done the previous way (a fresh IGNORECASE regex per class name, line
+re-search on a duplicate, a line-split brace heuristic) against one
+utils.code_scanner.scan_code pass, on 20 KB snippets.
+
+Usage (from backend/):
+    python -m benchmarks.bench_code_scanner
+    python -m benchmarks.bench_code_scanner --iterations 500 --json scanner.json
+"""
+
+import argparse
+import json
+import logging
+import re
+import sys
+import time
+
+from agents.codegen_agent import validate_no_duplication
+from utils.code_scanner import scan_code
+
+SNIPPET_BYTES = 20 * 1024
+
+CSHARP_CLASS = '''    // ===== Task {i}: {name} =====
+    public class {name}
+    {{
+        private string label = "{label}";
+        // TODO: Track the current price
+        // TODO: Notify listeners when it changes
+        public void Adjust(int amount)
+        {{
+            if (amount > 0) {{ label = label + amount; }}
+        }}
+    }}
+'''
+PYTHON_CLASS = '''class {name}:
+    """A {name} with a price; class docs mention class Other"""
+
+    def adjust(self, amount):
+        # TODO: Track the current price
+        # TODO: Notify listeners when it changes
+        if amount > 0:
+            self.label = {{"amount": amount}}
+
+'''
+
+
+def _snippet(template: str, header: str = '', footer: str = '', duplicate: bool = False, label: str = 'price'):
+    """Repeat template with distinct class names up to SNIPPET_BYTES; returns (code, class_names)"""
+    parts, names, size = [header], [], len(header) + len(footer)
+    while size < SNIPPET_BYTES:
+        name = f"Agent{len(names)}"
+        part = template.format(i=len(names) + 1, name=name, label=label.format(name=name))
+        parts.append(part)
+        names.append(name)
+        size += len(part)
+    if duplicate:
+        parts.append(template.format(i=len(names) + 1, name=names[0], label=label.format(name=names[0])))
+    parts.append(footer)
+    return ''.join(parts), names
+
+
+def _previous_duplication(code_snippet: str, class_names: list) -> bool:
+    """The previous validate_no_duplication"""
+    for class_name in class_names:
+        pattern = rf'\b(?:public\s+|private\s+|protected\s+)?class\s+{re.escape(class_name)}\b'
+        count = len(re.findall(pattern, code_snippet, re.IGNORECASE))
+        if count > 1:
+            lines = code_snippet.split('\n')
+            for line in lines:
+                re.search(pattern, line, re.IGNORECASE)
+            return False
+    return code_snippet.count("namespace ConsoleApp1") <= 1
+
+
+def _previous_outside_class(response_text: str) -> bool:
+    """The previous AnthropicClient line-split heuristic"""
+    class_depth = 0
+    for line in response_text.split('\n'):
+        if 'public class' in line or 'class ' in line:
+            class_depth += line.count('{') - line.count('}')
+        elif class_depth == 0 and ('public void' in line or 'private void' in line):
+            return True
+    return False
+
+
+def _previous(code: str, class_names: list, language: str):
+    return _previous_duplication(code, class_names), _previous_outside_class(code)
+
+
+def _scanner(code: str, class_names: list, language: str):
+    return validate_no_duplication(code, class_names, language), bool(scan_code(code).methods_outside_class)
+
+
+def _time_per_call(fn, case, iterations: int) -> float:
+    fn(*case)  # Warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(*case)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Structural code scanner micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls timed per case")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    # Duplicate/missing-class warnings would flood the output
+    logging.getLogger("agents.codegen_agent").setLevel(logging.CRITICAL)
+
+    namespace = ("namespace ConsoleApp1\n{\n", "}\n")
+    cases = {
+        "csharp (clean)": (*_snippet(CSHARP_CLASS, *namespace), "csharp"),
+        "csharp (duplicate class)": (*_snippet(CSHARP_CLASS, *namespace, duplicate=True), "csharp"),
+        # The previous check also counted declarations inside string literals
+        "csharp (class in a string)": (*_snippet(CSHARP_CLASS, *namespace, label="class {name} {{"), "csharp"),
+        "python (clean)": (*_snippet(PYTHON_CLASS), "python"),
+    }
+
+    results = {}
+    header = (f"{'case':28} {'bytes':>7} {'classes':>8} {'previous us':>12} {'scanner us':>11} {'speedup':>8}"
+              f"  {'previous valid':>14} {'scanner valid':>13}")
+    print(header)
+    print("-" * len(header))
+    for name, case in cases.items():
+        code, class_names, _ = case
+        previous = _time_per_call(_previous, case, args.iterations)
+        scanner = _time_per_call(_scanner, case, args.iterations)
+        previous_valid, scanner_valid = _previous(*case)[0], _scanner(*case)[0]
+        results[name] = {
+            "bytes": len(code), "classes": len(class_names), "previous_us": previous, "scanner_us": scanner,
+            "previous_valid": previous_valid, "scanner_valid": scanner_valid
+        }
+        print(f"{name:28} {len(code):7d} {len(class_names):8d} {previous:12.1f} {scanner:11.1f} "
+              f"{previous / scanner:7.1f}x  {str(previous_valid):>14} {str(scanner_valid):>13}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {"iterations": args.iterations}, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,157 @@
+"""
+Micro-benchmark for response compression.
+
+Compresses real-sized responses - a task breakdown, a starter-code batch in
+the original shape (every task carries its file's code) and the same batch
+as a v2 scaffold - with each encoding middleware/compression.py can use, at
+a few levels, and reports the CPU-vs-bytes trade-off: compressed size and
+ratio, compression and decompression CPU, and the time to deliver the body
+over a slow student connection. The generated files are this repo's own
+source, so ratios reflect real code rather than repeated filler.
+
+br and zstd are measured when the brotli and zstandard packages are installed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_compression
+    python -m benchmarks.bench_compression --bandwidth-kbps 1000 --json compression.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+from agents.codegen_agent import expand_scaffold
+from config import COMPRESSION_LEVELS
+from middleware.compression import ENCODERS
+from pyd_models.schemas import BatchScaffoldResponse, BatchStarterCodeResponse, TaskBreakdownSchema
+from utils.serialization import model_response
+
+FILE_CODE_BYTES = 20 * 1024
+TASKS_PER_FILE = 4
+SOURCE_FILES = ("agents/codegen_agent.py", "services/job_store.py", "utils/code_scanner.py")
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 5, 11), "zstd": (1, 6, 19)}
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _source(path: str) -> str:
+    with open(os.path.join(BACKEND_DIR, path)) as f:
+        return f.read()[:FILE_CODE_BYTES]
+
+
+def scaffold() -> BatchScaffoldResponse:
+    files = {os.path.basename(path): _source(path) for path in SOURCE_FILES}
+    tasks = []
+    for filename, code in files.items():
+        lines = code.split("\n")
+        for t in range(TASKS_PER_FILE):
+            start = 1 + t * len(lines) // TASKS_PER_FILE
+            tasks.append({
+                "filename": filename,
+                "instructions": f"Task {len(tasks) + 1}: {lines[start - 1].strip() or 'Implement the next step'}",
+                "todos": [line.strip() for line in lines[start:start + 40] if line.strip().startswith("#")][:4],
+                "todo_lines": {"start_line": start, "end_line": start + 40},
+            })
+    return BatchScaffoldResponse.model_validate({
+        "files": files, "tasks": tasks, "total_tasks": len(tasks), "generation_time": "42.0s"
+    })
+
+
+def task_breakdown() -> TaskBreakdownSchema:
+    with open(os.path.join(BACKEND_DIR, "..", "README.md")) as f:
+        sentences = [s.strip() for s in f.read().replace("\n", " ").split(". ") if len(s.strip()) > 40]
+    files = []
+    for f in range(4):
+        classes = []
+        for c in range(3):
+            tasks = []
+            for t in range(5):
+                n = (f * 15 + c * 5 + t) * 3
+                tasks.append({
+                    "id": c * 5 + t + 1,
+                    "title": sentences[n % len(sentences)][:60],
+                    "description": ". ".join(sentences[(n + k) % len(sentences)] for k in range(1, 3)),
+                    "dependencies": list(range(max(1, c * 5 + t - 1), c * 5 + t + 1)),
+                    "estimated_time": f"{15 + 5 * t} minutes",
+                    "concepts": ["classes", "loops", "events"][: 1 + t % 3],
+                })
+            classes.append({"class_name": f"Class{f}_{c}", "purpose": sentences[(f + c) % len(sentences)],
+                            "tasks": tasks, "method_signatures": ["update_price(p)", "notify()"]})
+        files.append({"filename": f"file{f}.py", "purpose": sentences[f % len(sentences)], "classes": classes,
+                      "tests": []})
+    return TaskBreakdownSchema.model_validate({
+        "overview": sentences[0], "total_estimated_time": "6 hours", "files": files
+    })
+
+
+def _decompressor(encoding: str):
+    if encoding == "gzip":
+        return gzip.decompress
+    if encoding == "br":
+        import brotli
+        return brotli.decompress
+    import zstandard
+    return lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+def _cpu_per_call(fn, iterations: int) -> float:
+    fn()  # Warm up
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Response compression micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=20, help="Compressions timed per case")
+    parser.add_argument("--bandwidth-kbps", type=float, default=750, help="Client link speed for transfer times")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    v2 = scaffold()
+    bodies = {
+        "task breakdown": model_response(task_breakdown(), TaskBreakdownSchema).body,
+        "starter code batch": model_response(expand_scaffold(v2), BatchStarterCodeResponse).body,
+        "scaffold (v2)": model_response(v2, BatchScaffoldResponse).body,
+    }
+    bytes_per_ms = args.bandwidth_kbps * 1000 / 8 / 1000
+
+    results = {}
+    header = (f"{'response':20} {'encoding':10} {'bytes':>8} {'ratio':>6} {'compress us':>12} {'decompress us':>14}"
+              f" {'transfer ms':>12}")
+    print(f"Encoders available: {', '.join(ENCODERS)}; link {args.bandwidth_kbps:.0f} kbps; * = configured level")
+    print(header)
+    print("-" * len(header))
+    for name, body in bodies.items():
+        results[name] = {"identity": {"bytes": len(body), "transfer_ms": len(body) / bytes_per_ms}}
+        print(f"{name:20} {'identity':10} {len(body):8d} {1:6.1f} {0:12.0f} {0:14.0f} "
+              f"{len(body) / bytes_per_ms:12.0f}")
+        for encoding, factory in ENCODERS.items():
+            decompress = _decompressor(encoding)
+            for level in LEVELS[encoding]:
+                compressed = factory(level)(body, True)
+                assert decompress(compressed) == body
+                compress_us = _cpu_per_call(lambda: factory(level)(body, True), args.iterations)
+                decompress_us = _cpu_per_call(lambda: decompress(compressed), args.iterations)
+                transfer_ms = compress_us / 1000 + len(compressed) / bytes_per_ms
+                label = f"{encoding}-{level}" + ("*" if COMPRESSION_LEVELS.get(encoding) == level else "")
+                results[name][label.rstrip("*")] = {
+                    "bytes": len(compressed), "ratio": len(body) / len(compressed), "compress_us": compress_us,
+                    "decompress_us": decompress_us, "transfer_ms": transfer_ms
+                }
+                print(f"{'':20} {label:10} {len(compressed):8d} {len(body) / len(compressed):6.1f} "
+                      f"{compress_us:12.0f} {decompress_us:14.0f} {transfer_ms:12.0f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {"iterations": args.iterations, "bandwidth_kbps": args.bandwidth_kbps,
+                                  "levels": COMPRESSION_LEVELS}, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark for the content safety scanner.
+
+Times utils.security.find_malicious_patterns against the previous check
+(lowercase the whole text, then one substring test per blocked pattern) and
+against a single case-insensitive alternation regex, on maximum-size
+assignment text and code: clean, with a match at the end, and non-ASCII.
+Before timing, checks that text whose length changes when case-folded gets
+the same matches and offsets as any other text.
+
+Usage (from backend/):
+    python -m benchmarks.bench_security
+    python -m benchmarks.bench_security --iterations 500 --json security.json
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+
+from config import BLOCKED_PATTERNS, MAX_ASSIGNMENT_TEXT_LENGTH, MAX_CODE_LENGTH
+from utils.security import find_malicious_patterns
+
+ASSIGNMENT_LINE = "Each hotel adjusts its price every round and notifies the Travel Agents of changes. "
+CODE_LINE = "    total = compute_total(items, discount=0.1)  # Apply the discount\n"
+
+
+def _fill(line: str, length: int, tail: str = '') -> str:
+    body = (line * (length // len(line) + 1))[:length - len(tail)]
+    return body + tail
+
+
+_ALTERNATION = re.compile('|'.join(re.escape(pattern) for pattern in BLOCKED_PATTERNS), re.IGNORECASE)
+
+
+def _substring_scan(text: str):
+    """The previous implementation: lowercased copy plus one test per pattern"""
+    text_lower = text.lower()
+    return [pattern for pattern in BLOCKED_PATTERNS if pattern.lower() in text_lower]
+
+
+def _alternation_scan(text: str):
+    return [(match.start(), match.group()) for match in _ALTERNATION.finditer(text)]
+
+
+# (text, expected find_malicious_patterns result)
+CONSISTENCY_CASES = [
+    ("os.\u017fystem(x)", [(0, "os.system")]),
+    ("\u0130 os.\u017fystem(x)", [(2, "os.system")]),
+    ("\u00df OS.SYSTEM(1); drop table t", [(2, "os.system"), (16, "DROP TABLE")]),
+]
+
+
+def _check_consistency() -> list:
+    failures = []
+    for text, expected in CONSISTENCY_CASES:
+        try:
+            found = find_malicious_patterns(text)
+        except Exception as e:
+            found = f"{type(e).__name__}: {e}"
+        if found != expected:
+            failures.append(f"{text!r}: expected {expected}, got {found}")
+    return failures
+
+
+def _time_per_call(fn, text: str, iterations: int) -> float:
+    fn(text)  # Warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(text)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Content safety scanner micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls timed per case")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    failures = _check_consistency()
+    for failure in failures:
+        print(f"MISMATCH: {failure}", file=sys.stderr)
+    if failures:
+        return 1
+
+    cases = {
+        "assignment text (clean)": _fill(ASSIGNMENT_LINE, MAX_ASSIGNMENT_TEXT_LENGTH),
+        "assignment text (match at end)": _fill(ASSIGNMENT_LINE, MAX_ASSIGNMENT_TEXT_LENGTH, "DROP TABLE x"),
+        "code (clean)": _fill(CODE_LINE, MAX_CODE_LENGTH),
+        "code (match at end)": _fill(CODE_LINE, MAX_CODE_LENGTH, "os.system('ls')"),
+        "code (non-ASCII)": _fill(CODE_LINE.replace("discount", "r\u00e9duction"), MAX_CODE_LENGTH),
+        "code (length-changing case)": _fill(CODE_LINE.replace("discount", "\u0130ndirim"), MAX_CODE_LENGTH),
+    }
+
+    results = {}
+    header = f"{'case':32} {'chars':>8} {'previous us':>12} {'alternation us':>15} {'scanner us':>11}"
+    print(header)
+    print("-" * len(header))
+    for name, text in cases.items():
+        previous = _time_per_call(_substring_scan, text, args.iterations)
+        alternation = _time_per_call(_alternation_scan, text, args.iterations)
+        scanner = _time_per_call(find_malicious_patterns, text, args.iterations)
+        results[name] = {
+            "chars": len(text), "previous_us": previous, "alternation_us": alternation, "scanner_us": scanner
+        }
+        print(f"{name:32} {len(text):8d} {previous:12.1f} {alternation:15.1f} {scanner:11.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {"iterations": args.iterations}, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
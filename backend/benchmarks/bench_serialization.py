@@ -0,0 +1,198 @@
+"""
+Micro-benchmark for response serialization.
+
+Measures the CPU time to turn a handler's result into response bytes for
+the large responses - a task breakdown, a starter-code batch whose tasks
+each carry their file's full code, a /run-code result with test results -
+three ways: the previous path (FastAPI's response_model validation and
+dump, then JSONResponse's json.dumps), the same with ORJSONResponse (the
+app's default response class), and utils.serialization.model_response (one
+cached TypeAdapter dump_json, used by the hot endpoints). The same batch in
+the v2 /generate-scaffold shape (each file's code once) shows the payload
+size and the client's JSON.parse cost (json.loads here) dropping with it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --iterations 500 --json serialization.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("TRACE_EXPORTER", "none")
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from main import app
+from pyd_models.schemas import (
+    BatchScaffoldResponse, BatchStarterCodeResponse, CodeExecutionResult, TaskBreakdownSchema
+)
+from utils.serialization import model_response
+
+FILE_CODE_BYTES = 20 * 1024
+
+CODE_LINE = "        total = ComputeTotal(items, discount);  // TODO: apply the \"early bird\" discount\n"
+
+
+def _task(file_index: int, task_id: int) -> dict:
+    return {
+        "id": task_id,
+        "title": f"Implement step {task_id} of file {file_index}",
+        "description": "Update the price from the booking rules and notify every travel agent. " * 3,
+        "dependencies": list(range(max(1, task_id - 2), task_id)),
+        "estimated_time": "30 minutes",
+        "concepts": ["classes", "loops", "events"],
+        "template_variables": ["price", "agents"],
+    }
+
+
+def task_breakdown() -> dict:
+    files = []
+    for f in range(4):
+        files.append({
+            "filename": f"File{f}.cs",
+            "purpose": "Pricing and booking logic for one part of the hotel system",
+            "classes": [
+                {
+                    "class_name": f"Class{f}_{c}",
+                    "purpose": "Tracks prices and notifies agents",
+                    "tasks": [_task(f, c * 5 + t + 1) for t in range(5)],
+                    "method_signatures": ["UpdatePrice(int p)", "Notify()"],
+                }
+                for c in range(3)
+            ],
+            "tests": [],
+        })
+    return {
+        "overview": "Build a hotel booking system with pricing rules and order processing.",
+        "total_estimated_time": "6 hours",
+        "template_structure": {"has_template": True, "variable_names": ["price"], "class_names": ["Hotel"],
+                               "method_signatures": ["UpdatePrice(int p)"]},
+        "files": files,
+    }
+
+
+def starter_code_batch() -> dict:
+    code = (CODE_LINE * (FILE_CODE_BYTES // len(CODE_LINE) + 1))[:FILE_CODE_BYTES]
+    tasks = [
+        {
+            # generate_file_scaffolding gives every task of a file the whole file's code
+            "code_snippet": code,
+            "instructions": "Fill in the TODOs in order; each builds on the previous one.",
+            "todos": [f"Step {t}: apply the pricing rule" for t in range(4)],
+            "concept_examples": {"events": "event Action<int> PriceChanged;"},
+            "filename": f"File{t % 3}.cs",
+        }
+        for t in range(12)
+    ]
+    return {"tasks": tasks, "total_tasks": len(tasks), "generation_time": "42.0s"}
+
+
+def scaffold() -> dict:
+    """starter_code_batch() in the v2 shape"""
+    batch = starter_code_batch()
+    files = {task["filename"]: task["code_snippet"] for task in batch["tasks"]}
+    tasks = [
+        dict({key: value for key, value in task.items() if key != "code_snippet"},
+             todo_lines={"start_line": 10 * t + 1, "end_line": 10 * t + 4})
+        for t, task in enumerate(batch["tasks"])
+    ]
+    return dict(batch, files=files, tasks=tasks)
+
+
+def run_code_result() -> dict:
+    return {
+        "success": True, "output": "All tests ran\n" * 20, "error": "", "exit_code": 0,
+        "execution_time": "0.41s", "wall_time_ms": 410.5, "cpu_time_ms": 380.2, "peak_memory_kb": 20480,
+        "test_results": [
+            {
+                "test_name": f"test_add_{i}", "function_name": "add", "passed": i % 5 != 0,
+                "input_data": f"[{i}, {i + 1}]", "expected_output": str(2 * i + 1),
+                "actual_output": str(2 * i + 1), "wall_time_ms": 1.5, "cpu_time_ms": 1.2, "peak_memory_kb": 9000,
+            }
+            for i in range(40)
+        ],
+        "tests_passed": 32, "tests_failed": 8, "tests_skipped": 0,
+    }
+
+
+def _response_field(path: str):
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == path:
+            return route.response_field
+    raise LookupError(path)
+
+
+async def _fastapi_body(field, content, response_class) -> bytes:
+    """What FastAPI does with a returned model: validate, dump to Python, encode"""
+    return response_class(await serialize_response(field=field, response_content=content)).body
+
+
+def _cpu_per_call(fn, iterations: int) -> float:
+    fn()  # Warm up (also builds the cached TypeAdapter)
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Response serialization micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=200, help="Responses serialized per case")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    # (endpoint, schema, what the handler has, whether the previous handler built the model itself)
+    cases = {
+        "task breakdown": ("/parse-assignment", TaskBreakdownSchema,
+                           TaskBreakdownSchema.model_validate(task_breakdown()), False),
+        "starter code batch": ("/generate-starter-code-batch", BatchStarterCodeResponse,
+                               BatchStarterCodeResponse.model_validate(starter_code_batch()), False),
+        "scaffold (v2)": ("/generate-scaffold", BatchScaffoldResponse,
+                          BatchScaffoldResponse.model_validate(scaffold()), False),
+        "run-code with tests": ("/run-code", CodeExecutionResult, run_code_result(), True),
+    }
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    header = (f"{'case':22} {'bytes':>7} {'json us':>9} {'orjson us':>10} {'adapter us':>11} {'speedup':>8}"
+              f"  {'parse us':>9} {'same':>5}")
+    print(header)
+    print("-" * len(header))
+    for name, (path, schema, value, build) in cases.items():
+        field = _response_field(path)
+
+        def previous(response_class=JSONResponse):
+            content = schema(**value) if build else value
+            return loop.run_until_complete(_fastapi_body(field, content, response_class))
+
+        def adapter():
+            return model_response(value, schema).body
+
+        body = adapter()
+        same = json.loads(previous()) == json.loads(body)
+        json_us = _cpu_per_call(previous, args.iterations)
+        orjson_us = _cpu_per_call(lambda: previous(ORJSONResponse), args.iterations)
+        adapter_us = _cpu_per_call(adapter, args.iterations)
+        parse_us = _cpu_per_call(lambda: json.loads(body), args.iterations)
+        results[name] = {
+            "bytes": len(body), "json_us": json_us, "orjson_us": orjson_us, "adapter_us": adapter_us,
+            "parse_us": parse_us, "same": same
+        }
+        print(f"{name:22} {len(body):7d} {json_us:9.1f} {orjson_us:10.1f} {adapter_us:11.1f} "
+              f"{json_us / adapter_us:7.1f}x  {parse_us:9.1f} {str(same):>5}")
+    loop.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {"iterations": args.iterations}, "results": results}, f, indent=2)
+    return 0 if all(result["same"] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,111 @@
+"""
+Cold-start benchmark for the backend.
+
+Imports main in fresh interpreters under `python -X importtime`, reports the
+median import time and the modules that cost the most, and fails if startup
+regresses or if a module meant to be imported lazily (the anthropic SDK,
+pdfplumber, requests) is pulled in at import time again.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --json startup.json
+    python -m benchmarks.bench_startup --baseline startup.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use by the services; none of these may load with main
+LAZY_MODULES = ["anthropic", "pdfplumber", "requests"]
+
+
+def _import_times(module: str) -> dict:
+    """Cumulative import time in microseconds per top-level package, from one fresh interpreter"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+        # Keep startup side effects (log queue, trace file) out of the measurement's way
+        env=dict(os.environ, TRACE_EXPORTER="none", PYTHONDONTWRITEBYTECODE="1")
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        # A package's own line includes everything its import pulled in
+        if "." not in name:
+            times[name] = int(cumulative)
+    return times
+
+
+def _check_regressions(result: dict, args) -> list:
+    failures = [f"{name} is imported at startup" for name in result["lazy_modules_imported"]]
+    if args.max_ms is not None and result["median_ms"] > args.max_ms:
+        failures.append(f"startup {result['median_ms']:.0f}ms > {args.max_ms}ms")
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)["results"]
+        limit = base["median_ms"] * (1 + args.tolerance)
+        if result["median_ms"] > limit:
+            failures.append(
+                f"startup {result['median_ms']:.0f}ms exceeds baseline "
+                f"{base['median_ms']:.0f}ms by more than {args.tolerance:.0%}"
+            )
+    return failures
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Cold-start (import time) benchmark for the Scaffy backend")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time")
+    parser.add_argument("--module", default="main", help="Module to import")
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages to list")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Fail if startup regresses against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression vs baseline")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median import time exceeds this")
+    args = parser.parse_args()
+
+    _import_times(args.module)  # Warm the bytecode and filesystem caches
+    runs = [_import_times(args.module) for _ in range(args.runs)]
+
+    totals = [run[args.module] / 1000 for run in runs]
+    packages = {name: statistics.median(run.get(name, 0) for run in runs) / 1000
+                for name in runs[0] if name != args.module}
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    result = {
+        "median_ms": statistics.median(totals),
+        "min_ms": min(totals),
+        "max_ms": max(totals),
+        "packages_ms": dict(slowest),
+        "lazy_modules_imported": [name for name in LAZY_MODULES if name in runs[0]],
+    }
+
+    print(f"import {args.module}: median {result['median_ms']:.0f}ms "
+          f"(min {result['min_ms']:.0f}ms, max {result['max_ms']:.0f}ms, {args.runs} runs)")
+    print(f"{'package':32} {'cumulative ms':>14}")
+    print("-" * 47)
+    for name, ms in slowest:
+        print(f"{name:32} {ms:14.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": {"runs": args.runs, "module": args.module}, "results": result}, f, indent=2)
+
+    failures = _check_regressions(result, args)
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
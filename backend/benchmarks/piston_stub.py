@@ -0,0 +1,50 @@
+"""
+Local stand-in for the Piston /execute API.
+Answers every execution with a canned result after a simulated latency, so
+/run-code can be benchmarked without a real sandbox.
+"""
+
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(latency_seconds: float):
+    class PistonHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if latency_seconds:
+                time.sleep(latency_seconds)
+
+            source = payload.get("files", [{}])[0].get("content", "")
+            body = json.dumps({
+                "language": payload.get("language"),
+                "version": "0.0.0-stub",
+                "run": {
+                    "stdout": "3\n",
+                    "stderr": "",
+                    "code": 0,
+                    "signal": None,
+                    "output": "3\n",
+                    "time": 0.01 + len(source) / 1e7
+                }
+            }).encode()
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PistonHandler
+
+
+def serve(port_queue, latency_seconds: float = 0.0):
+    """Run the stub server, reporting the bound port through port_queue"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency_seconds))
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
@@ -0,0 +1,117 @@
+"""
+Recorded model responses used by the offline benchmark stub.
+Each agent gets a well-formed response plus truncated and malformed variants
+so the JSON repair paths and agent retry loops are exercised as in production.
+"""
+
+import json
+
+
+def _parser_response() -> str:
+    files = []
+    task_id = 1
+    for file_idx in range(3):
+        classes = []
+        for class_idx in range(2):
+            tasks = []
+            for _ in range(3):
+                tasks.append({
+                    "id": task_id,
+                    "title": f"Implement step {task_id}",
+                    "description": f"Implement the logic for step {task_id}, handling edge cases and invalid input.",
+                    "dependencies": [task_id - 1] if task_id > 1 else [],
+                    "estimated_time": "30 min",
+                    "concepts": ["loops", "conditionals", "classes"]
+                })
+                task_id += 1
+            classes.append({
+                "class_name": f"Class{file_idx}{class_idx}",
+                "purpose": "Models part of the assignment domain",
+                "method_signatures": [f"Method{class_idx}A()", f"Method{class_idx}B(int value)"],
+                "tasks": tasks
+            })
+        files.append({
+            "filename": f"File{file_idx}.java",
+            "purpose": "Holds related classes",
+            "classes": classes,
+            "tasks": None
+        })
+
+    return json.dumps({
+        "overview": "Build a small hotel booking system. Students implement pricing and ordering.",
+        "total_estimated_time": "9 hours",
+        "template_structure": {
+            "has_template": True,
+            "variable_names": ["price", "rooms"],
+            "class_names": ["Class00", "Class01"],
+            "method_signatures": []
+        },
+        "files": files
+    }, indent=2)
+
+
+def _codegen_response() -> str:
+    lines = ["public class Hotel {", "    private int price;", ""]
+    for i in range(1, 121):
+        lines.extend([
+            f"    // ===== Task {i % 10 + 1}: step {i} =====",
+            f"    public int Step{i}(int value) {{",
+            "        // TODO: Validate the input value",
+            "        // TODO: Apply the pricing rule",
+            "        // TODO: Return the updated value",
+            "        return 0;",
+            "    }",
+            ""
+        ])
+    lines.append("}")
+    return json.dumps({
+        "code_snippet": "\n".join(lines),
+        "task_todos": {
+            str(i): ["Validate the input value", "Apply the pricing rule", "Return the updated value"]
+            for i in range(1, 31)
+        }
+    })
+
+
+def _hint_response() -> str:
+    return json.dumps({
+        "hint": "Think about what happens when the list is empty. " * 8,
+        "hint_type": "conceptual",
+        "example_code": "if not items:\n    return 0"
+    })
+
+
+def _tests_response() -> str:
+    return json.dumps([
+        {
+            "test_name": f"test_case_{i}",
+            "function_name": "add",
+            "input_data": f"{i}, {i + 1}",
+            "expected_output": str(2 * i + 1),
+            "description": f"Adds {i} and {i + 1}",
+            "test_type": "normal" if i < 6 else "edge"
+        }
+        for i in range(10)
+    ])
+
+
+def _truncate(response: str, fraction: float = 0.85) -> str:
+    return response[:int(len(response) * fraction)]
+
+
+def _variants(response: str, malformed: str) -> dict:
+    return {
+        "ok": response,
+        # Cut mid-string, as when the model hits max_tokens
+        "truncated": _truncate(response),
+        # Unparseable: forces the agent's retry loop
+        "malformed": malformed,
+    }
+
+
+RECORDED_RESPONSES = {
+    "parser": _variants(_parser_response(), "Here is the breakdown: overview - build a hotel system; files: Hotel.java"),
+    "codegen": _variants(_codegen_response(), "I'll generate the file now.\n\npublic class Hotel { }"),
+    "hint": _variants(_hint_response(), "Sure! Try checking the empty case first."),
+    "tests": _variants(_tests_response(), "Tests: add(1, 2) should return 3"),
+}
@@ -0,0 +1,256 @@
+"""
+Offline replay benchmark for the backend's own overhead.
+
+Swaps get_anthropic_client for a recorded-response stub, points the code
+runner at a local Piston stand-in, and drives the API in-process at a fixed
+concurrency. Reports throughput, p50/p95/p99 latency and CPU per request.
+
+Usage (from backend/):
+    python -m benchmarks.run_benchmarks --requests 50 --concurrency 8
+    python -m benchmarks.run_benchmarks --json results.json
+    python -m benchmarks.run_benchmarks --baseline results.json --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+ENDPOINTS = [
+    "/parse-assignment",
+    "/generate-starter-code-batch",
+    "/generate-scaffold",
+    "/get-hint",
+    "/generate-tests",
+    "/run-code",
+    "/run-code (memo hit)",
+]
+
+ASSIGNMENT_TEXT = (
+    "Build a hotel booking system with pricing rules and order processing.\n\n"
+    "```\n"
+    "public class Hotel {\n"
+    "    private int price;\n"
+    "    public void UpdatePrice(int p) {\n"
+    "        // TODO\n"
+    "    }\n"
+    "}\n"
+    "class TravelAgent {\n"
+    "    void CreateOrder() { }\n"
+    "}\n"
+    "```\n\n"
+) + "Each hotel adjusts its price every round and notifies travel agents. " * 40
+
+STUDENT_CODE = "def add(a, b):\n    # adds two numbers\n    return a + b\n\n" * 20
+
+
+def _path(endpoint: str) -> str:
+    """Route a scenario posts to (a scenario is a route plus an optional label)"""
+    return endpoint.split(" ", 1)[0]
+
+
+def _payload(endpoint: str, i: int) -> dict:
+    if endpoint == "/parse-assignment":
+        return {
+            "assignment_text": ASSIGNMENT_TEXT,
+            "target_language": "java",
+            "known_language": "python",
+            "experience_level": "intermediate"
+        }
+    if endpoint in ("/generate-starter-code-batch", "/generate-scaffold"):
+        return {"tasks": [
+            {
+                "task_description": f"Implement step {i}",
+                "programming_language": "java",
+                "concepts": ["classes", "loops"],
+                "experience_level": "intermediate",
+                "filename": f"File{i % 2}.java",
+                "class_name": f"Class{i % 3}",
+                "method_signatures": [f"Step{i}(int value)"]
+            }
+            for i in range(10)
+        ]}
+    if endpoint == "/get-hint":
+        return {
+            "task_description": "Implement add",
+            "concepts": ["functions"],
+            "student_code": STUDENT_CODE,
+            "question": "Why does my test fail?",
+            "previous_hints": ["Check the return value"],
+            "help_count": 2,
+            "target_language": "python",
+            "experience_level": "intermediate",
+            "test_results": [
+                {"test_name": f"t{i}", "function_name": "add", "passed": i % 2 == 0,
+                 "input_data": "1, 2", "expected_output": "3", "actual_output": "4"}
+                for i in range(6)
+            ]
+        }
+    if endpoint == "/generate-tests":
+        return {"code": STUDENT_CODE, "language": "python", "filename": "main.py"}
+    if endpoint in ("/run-code", "/run-code (memo hit)"):
+        # Distinct code per request so /run-code measures real runs rather
+        # than the run memo; the memo-hit scenario repeats the same program
+        code = STUDENT_CODE if endpoint.endswith("(memo hit)") else f"{STUDENT_CODE}# request {i}\n"
+        return {
+            "code": code,
+            "language": "python",
+            "test_cases": [
+                {"test_name": f"t{i}", "function_name": "add", "input_data": f"{i}, 1",
+                 "expected_output": "3", "description": "adds", "test_type": "normal"}
+                for i in range(5)
+            ]
+        }
+    raise ValueError(endpoint)
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def _bench_endpoint(client, endpoint: str, requests: int, concurrency: int, first: int = 0) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(i: int):
+        async with semaphore:
+            # A distinct client IP per request keeps the rate limiter in the path without tripping it
+            headers = {"X-Forwarded-For": f"10.0.{i // 250}.{i % 250}"}
+            start = time.perf_counter()
+            response = await client.post(_path(endpoint), json=_payload(endpoint, first + i), headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput_rps": requests / wall if wall else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "cpu_ms_per_request": cpu * 1000 / requests,
+    }
+
+
+async def _run(args) -> dict:
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for endpoint in args.endpoints:
+            # Warm-up so one-time imports and singletons don't skew the numbers
+            warmup = min(3, args.requests)
+            await _bench_endpoint(client, endpoint, warmup, 1)
+            results[endpoint] = await _bench_endpoint(client, endpoint, args.requests, args.concurrency, first=warmup)
+    return results
+
+
+def _print_table(results: dict):
+    header = f"{'endpoint':32} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cpu ms/req':>11}  statuses"
+    print(header)
+    print("-" * len(header))
+    for endpoint, r in results.items():
+        print(f"{endpoint:32} {r['throughput_rps']:8.1f} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} "
+              f"{r['p99_ms']:9.2f} {r['cpu_ms_per_request']:11.3f}  {r['statuses']}")
+
+
+def _check_regressions(results: dict, args) -> list:
+    failures = []
+    for endpoint, r in results.items():
+        if args.max_p95_ms is not None and r["p95_ms"] > args.max_p95_ms:
+            failures.append(f"{endpoint}: p95 {r['p95_ms']:.2f}ms > {args.max_p95_ms}ms")
+        if args.max_cpu_ms is not None and r["cpu_ms_per_request"] > args.max_cpu_ms:
+            failures.append(f"{endpoint}: cpu {r['cpu_ms_per_request']:.3f}ms/req > {args.max_cpu_ms}ms")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        for endpoint, r in results.items():
+            base = baseline.get(endpoint)
+            if not base:
+                continue
+            limit = base["cpu_ms_per_request"] * (1 + args.tolerance)
+            if r["cpu_ms_per_request"] > limit:
+                failures.append(
+                    f"{endpoint}: cpu {r['cpu_ms_per_request']:.3f}ms/req exceeds baseline "
+                    f"{base['cpu_ms_per_request']:.3f}ms by more than {args.tolerance:.0%}"
+                )
+    return failures
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline replay benchmark for the Scaffy backend")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent in-flight requests")
+    parser.add_argument("--model-latency-ms", type=float, default=0.0, help="Simulated model latency")
+    parser.add_argument("--piston-latency-ms", type=float, default=0.0, help="Simulated Piston latency")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--log-level", default="WARNING", help="Backend log level during the run")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Fail if CPU/request regresses against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression vs baseline")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if any endpoint's p95 exceeds this")
+    parser.add_argument("--max-cpu-ms", type=float, help="Fail if any endpoint's CPU/request exceeds this")
+    args = parser.parse_args()
+
+    # Local Piston stand-in in its own process so its CPU isn't counted
+    port_queue = multiprocessing.Queue()
+    from benchmarks.piston_stub import serve
+    piston = multiprocessing.Process(
+        target=serve, args=(port_queue, args.piston_latency_ms / 1000), daemon=True
+    )
+    piston.start()
+    os.environ["PISTON_API_URL"] = f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+
+    from benchmarks.stub_client import install_stub
+    install_stub(latency_seconds=args.model_latency_ms / 1000)
+
+    logging.getLogger().setLevel(args.log_level)
+    import main  # noqa: F401 - imported after the stub is installed
+    logging.getLogger().setLevel(args.log_level)
+
+    try:
+        results = asyncio.run(_run(args))
+    finally:
+        piston.terminate()
+
+    _print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "config": {
+                    "requests": args.requests,
+                    "concurrency": args.concurrency,
+                    "model_latency_ms": args.model_latency_ms,
+                    "piston_latency_ms": args.piston_latency_ms,
+                },
+                "results": results
+            }, f, indent=2)
+
+    failures = _check_regressions(results, args)
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,69 @@
+"""
+Recorded-response stand-in for AnthropicClient.
+Serves responses from recorded_responses.py with a configurable simulated
+latency, cycling through well-formed, truncated and malformed variants.
+"""
+
+import itertools
+import threading
+import time
+
+from benchmarks.recorded_responses import RECORDED_RESPONSES
+
+# Prompt prefixes used to tell which agent is calling (see utils/agent_prompts.py)
+PROMPT_KINDS = [
+    ("Parse this assignment", "parser"),
+    ("Generate scaffolding code for", "codegen"),
+    ("Generate MINIMAL starter content", "codegen"),
+    ("You are a live coding assistant", "hint"),
+    ("You are a test case generator", "tests"),
+]
+
+# Default mix: mostly good responses, with the occasional truncated or malformed one
+DEFAULT_SEQUENCE = ["ok", "ok", "ok", "truncated", "ok", "ok", "malformed", "ok"]
+
+
+class StubAnthropicClient:
+    """Drop-in replacement for AnthropicClient that never touches the network"""
+
+    def __init__(self, model: str, latency_seconds: float = 0.0, sequence=None):
+        self.model = model
+        self.latency_seconds = latency_seconds
+        self._sequence = itertools.cycle(sequence or DEFAULT_SEQUENCE)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _kind_for(self, prompt: str) -> str:
+        for prefix, kind in PROMPT_KINDS:
+            if prompt.startswith(prefix):
+                return kind
+        return "hint"
+
+    def generate_response(self, prompt: str, max_tokens: int = 4000, model: str = None) -> str:
+        with self._lock:
+            variant = next(self._sequence)
+            self.calls += 1
+        if self.latency_seconds:
+            # Blocking sleep, like the real synchronous SDK call
+            time.sleep(self.latency_seconds)
+        return RECORDED_RESPONSES[self._kind_for(prompt)][variant]
+
+
+def install_stub(latency_seconds: float = 0.0, sequence=None):
+    """
+    Swap get_anthropic_client for one that hands out stub clients.
+    Must run before main (and therefore the agents) is imported.
+    """
+    import services
+    import services.anthropic_client as anthropic_client
+
+    instances = {}
+
+    def get_stub_client(model: str = "claude-sonnet-4-20250514"):
+        if model not in instances:
+            instances[model] = StubAnthropicClient(model, latency_seconds, sequence)
+        return instances[model]
+
+    anthropic_client.get_anthropic_client = get_stub_client
+    services.get_anthropic_client = get_stub_client
+    return instances
@@ -2,6 +2,9 @@
 Security and configuration settings for the Scaffy backend
 """
 
+import os
+import tempfile
+
 # ============================================
 # SIZE LIMITS
 # ============================================
@@ -12,14 +15,57 @@ MAX_CODE_LENGTH = 100_000  # ~100KB (reasonable for most assignments)
 MAX_HINT_QUESTION_LENGTH = 3_000  # For hint questions
 
 # File upload limits (in bytes)
-MAX_PDF_SIZE = 7 * 1024 * 1024  # 7MB for PDFs
+MAX_PDF_SIZE = 10 * 1024 * 1024  # 10MB for PDFs (the upload form checks the same size)
 MAX_TOTAL_FILES_SIZE = 20 * 1024 * 1024  # 20MB total for all files in a request
 
+# Request body limits (in bytes), enforced by middleware/body_limit.py while the
+# body streams in, before it is parsed. JSON may spend up to 6 bytes on one
+# character (\uXXXX escapes), so character limits are scaled by that.
+JSON_BYTES_PER_CHAR = 6
+MAX_REQUEST_BODY_BYTES = {
+    "/parse-assignment": MAX_ASSIGNMENT_TEXT_LENGTH * JSON_BYTES_PER_CHAR + 64 * 1024,
+    "/jobs/parse-assignment": MAX_ASSIGNMENT_TEXT_LENGTH * JSON_BYTES_PER_CHAR + 64 * 1024,
+    "/get-hint": (MAX_CODE_LENGTH + MAX_HINT_QUESTION_LENGTH) * JSON_BYTES_PER_CHAR + 256 * 1024,  # + hints, test results
+    "/run-code": MAX_CODE_LENGTH * JSON_BYTES_PER_CHAR + 256 * 1024,  # + test cases
+    "/generate-tests": (MAX_CODE_LENGTH + MAX_ASSIGNMENT_TEXT_LENGTH) * JSON_BYTES_PER_CHAR + 64 * 1024,
+    "/extract-pdf-text": MAX_PDF_SIZE + 64 * 1024,  # + multipart framing
+}
+MAX_REQUEST_BODY_DEFAULT = 1024 * 1024  # 1MB for every other route
+
 # Number limits
 MAX_TEST_CASES_PER_FILE = 20  # Maximum test cases per file
 MAX_FILES_PER_ASSIGNMENT = 10  # Maximum files in a multi-file assignment
 MAX_TASKS_PER_ASSIGNMENT = 30  # Maximum tasks to prevent abuse
 
+# ============================================
+# IDEMPOTENCY
+# ============================================
+
+# POSTs to these routes with an Idempotency-Key header run once; duplicates
+# share the first request's response (see middleware/idempotency.py)
+IDEMPOTENT_ROUTES = (
+    "/parse-assignment", "/generate-starter-code-batch", "/generate-scaffold", "/generate-tests", "/get-hint"
+)
+IDEMPOTENCY_TTL_SECONDS = 300  # Finished responses are replayed for 5 minutes
+IDEMPOTENCY_MAX_ENTRIES = 1000
+IDEMPOTENCY_MAX_RESPONSE_BYTES = 2 * 1024 * 1024  # Larger responses are not kept for replay
+
+# ============================================
+# RESPONSE COMPRESSION
+# ============================================
+
+# Responses at least this large are compressed with the best encoding the
+# client accepts (see middleware/compression.py). br and zstd need the brotli
+# and zstandard packages; gzip is always available.
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_ENCODINGS = ("zstd", "br", "gzip")  # Server preference when the client accepts several
+# Levels trade CPU for bytes: gzip 1-9, br 0-11, zstd 1-22
+COMPRESSION_LEVELS = {
+    "gzip": int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+    "br": int(os.getenv("COMPRESSION_BROTLI_LEVEL", "5")),
+    "zstd": int(os.getenv("COMPRESSION_ZSTD_LEVEL", "6")),
+}
+
 # ============================================
 # RATE LIMITING
 # ============================================
@@ -59,6 +105,14 @@ REQUIRED_ENV_VARS = [
     'ANTHROPIC_API_KEY',
 ]
 
+# ============================================
+# MODEL CALLS
+# ============================================
+
+# A response cut off at max_tokens is resumed with follow-up calls that prefill
+# the partial output, instead of being regenerated from scratch; 0 disables
+MODEL_MAX_CONTINUATIONS = int(os.getenv("MODEL_MAX_CONTINUATIONS", "2"))
+
 # ============================================
 # TIMEOUT SETTINGS
 # ============================================
@@ -72,4 +126,125 @@ PDF_PROCESSING_TIMEOUT = 30  # Max time for PDF processing
 # ============================================
 
 LOG_SENSITIVE_DATA = False  # Never log API keys or user code in production
-LOG_LEVEL = 'INFO'  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # text, json
+LOG_QUEUE_SIZE = 10000  # Records buffered for the background log writer before new ones are dropped
+
+# Per-module overrides on top of LOG_LEVEL, e.g. LOG_MODULE_LEVELS="agents=DEBUG,services.code_runner=WARNING"
+LOG_MODULE_LEVELS = {
+    "httpx": "WARNING",
+    "httpcore": "WARNING",
+    "pdfminer": "WARNING",
+}
+LOG_MODULE_LEVELS.update(
+    dict(item.split("=", 1) for item in os.getenv("LOG_MODULE_LEVELS", "").split(",") if "=" in item)
+)
+
+# Fraction of requests whose verbose debug payloads (prompt/response previews,
+# per-file breakdowns, failed test dumps) are logged when DEBUG is enabled
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+# ============================================
+# DATA DIRECTORY
+# ============================================
+
+# Server-private state (PDF cache, job database, traces). Created 0700 with
+# 0600 files (utils/storage.py) and kept out of the shared temp dir, where
+# sandboxed code - another local user - could read or plant files
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.expanduser("~"), ".scaffy"))
+
+# ============================================
+# PDF EXTRACTION CACHE
+# ============================================
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(DATA_DIR, "pdf_cache"))
+PDF_CACHE_MAX_ENTRIES = 500  # Max distinct PDFs kept (LRU evicted beyond this)
+PDF_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Max total extracted text kept (~64MB)
+PDF_CACHE_TTL_SECONDS = 7 * 24 * 3600  # Cached extractions expire after a week
+PDF_UPLOAD_CHUNK_SIZE = 64 * 1024  # Bytes read per chunk while streaming uploads
+
+# ============================================
+# OCR FALLBACK (image-only PDFs)
+# ============================================
+
+OCR_ENABLED = os.getenv("OCR_ENABLED", "true").lower() == "true"  # Requires pytesseract + tesseract binary
+OCR_MAX_WORKERS = 2  # Size of the OCR process pool
+OCR_MAX_PAGES_PER_DOCUMENT = 15  # Only the first N empty pages of a document are OCR'd
+OCR_DOCUMENT_TIMEOUT = PDF_PROCESSING_TIMEOUT  # Deadline for OCR of one document (seconds)
+OCR_RESOLUTION = 200  # DPI used when rasterizing pages for OCR
+OCR_LANGUAGE = "eng"  # Tesseract language pack
+
+# ============================================
+# CODE EXECUTION BACKEND
+# ============================================
+
+# "piston" sends code to the Piston API; "local" compiles and runs it on this
+# host (only use inside a sandboxed container). Languages without a local
+# toolchain always fall back to Piston.
+CODE_EXECUTION_BACKEND = os.getenv("CODE_EXECUTION_BACKEND", "piston").lower()
+# Unprivileged account local runs, compilers and pool workers execute as; the
+# server must start as root to switch to it. "" runs them as the server's own
+# user, which lets student code read the server's environment (development only)
+LOCAL_EXECUTION_USER = os.getenv("LOCAL_EXECUTION_USER", "nobody")
+LOCAL_EXECUTION_MEMORY_MB = 512  # Address-space limit per local run
+LOCAL_EXECUTION_MAX_PROCESSES = 64  # Processes and threads per local run (JVM/Mono need threads)
+LOCAL_EXECUTION_MAX_CONCURRENT_RUNS = int(os.getenv("LOCAL_EXECUTION_MAX_CONCURRENT_RUNS", "8"))
+
+# Test runs for one request go out concurrently; cap in-flight Piston calls
+# (the public API is rate limited)
+PISTON_MAX_CONCURRENT_RUNS = int(os.getenv("PISTON_MAX_CONCURRENT_RUNS", "4"))
+
+# Warm Python/Node workers for the local backend (interpreter startup happens ahead
+# of the run); each worker runs one job and is replaced
+INTERPRETER_POOL_ENABLED = os.getenv("INTERPRETER_POOL_ENABLED", "true").lower() == "true"
+INTERPRETER_POOL_SIZE = int(os.getenv("INTERPRETER_POOL_SIZE", "2"))  # Workers per language
+INTERPRETER_POOL_STARTUP_TIMEOUT = 10  # Seconds to wait for a new worker to report ready
+
+# Sandboxed runs execute artifacts from here, so it stays outside DATA_DIR (0711:
+# they can reach an artifact by its key but not list the others)
+COMPILE_CACHE_DIR = os.getenv("COMPILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "scaffy_compile_cache"))
+COMPILE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Compiled classes/binaries kept on disk (LRU)
+COMPILE_TIMEOUT = 30  # Max time for a single compiler invocation
+
+# Repeat runs of unchanged deterministic code are answered from memory
+RUN_MEMO_ENABLED = os.getenv("RUN_MEMO_ENABLED", "true").lower() == "true"
+RUN_MEMO_MAX_ENTRIES = 1000  # Results kept (LRU evicted beyond this)
+RUN_MEMO_TTL_SECONDS = 300  # Memoized results expire after 5 minutes
+
+# Python/JS test reruns only execute tests whose reachable functions changed
+TEST_IMPACT_ENABLED = os.getenv("TEST_IMPACT_ENABLED", "true").lower() == "true"
+TEST_IMPACT_MAX_ENTRIES = 5000  # Individual test results kept (LRU evicted beyond this)
+TEST_IMPACT_TTL_SECONDS = 1800  # Reusable for 30 minutes
+
+# ============================================
+# TRACING & METRICS
+# ============================================
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file")  # file, console, otel; "none" turns tracing off
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(DATA_DIR, "traces.jsonl"))
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))  # Rotated to TRACE_FILE.1 beyond this
+TRACE_QUEUE_MAX_SPANS = 10000  # Spans waiting for the exporter; newer spans are dropped beyond this
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # Serve /metrics
+
+# ============================================
+# STARTUP
+# ============================================
+
+# Heavy SDKs (anthropic, pdfplumber) are imported on first use, not at import
+# time. "preload" imports them in a background thread once the server is up,
+# "eager" imports them before the first request is served, "lazy" leaves them
+# to the first request that needs them
+STARTUP_MODE = os.getenv("STARTUP_MODE", "preload")
+STARTUP_PRELOAD_MODULES = ("anthropic", "pdfplumber")
+
+# ============================================
+# BACKGROUND JOBS
+# ============================================
+
+# /jobs/* runs long generations on a bounded worker pool and returns a job id
+# at once; clients poll GET /jobs/{id}. Results are kept in memory and in
+# SQLite, so a client that reconnects gets the finished result back
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "4"))  # Generations running at once
+JOB_MAX_PENDING = 50  # Queued + running jobs before new ones are refused (503)
+JOB_TTL_SECONDS = 3600  # Finished jobs stay fetchable (and deduplicate repeats) for an hour
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
@@ -1,14 +1,18 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+import importlib
 import os
+import threading
 import time
 import uvicorn
 import logging
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (queue-backed, text or JSON, per-module levels from config)
+from utils.logging_config import configure_logging, payload_logging_enabled
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Import security utilities
@@ -22,7 +26,8 @@ from utils.security import (
     check_malicious_content,
     sanitize_filename
 )
-from config import MAX_PDF_SIZE, MAX_TOTAL_FILES_SIZE
+from config import MAX_PDF_SIZE, MAX_TOTAL_FILES_SIZE, METRICS_ENABLED, STARTUP_MODE, STARTUP_PRELOAD_MODULES
+from utils.metrics import metrics
 
 from pyd_models.schemas import (
     AssignmentSchema,
@@ -36,33 +41,96 @@ from pyd_models.schemas import (
     ConceptExampleResponse,
     BatchBoilerPlateCodeSchema,
     BatchStarterCodeResponse,
+    BatchScaffoldResponse,
     GenerateTestsRequest,
     GenerateTestsResponse,
     FeedbackRequest,
-    FeedbackResponse
+    FeedbackResponse,
+    JobStatusResponse
 )
 
 # Import agents and services
-from agents.parser_agent import ParserAgent
-from agents.codegen_agent import CodegenAgent
-from agents.live_helper import LiveHelperAgent
-from agents.concept_example import ConceptExampleAgent
+from agents.parser_agent import get_parser_agent
+from agents.codegen_agent import get_batch_codegen_agent, expand_scaffold, starter_codes
+from agents.live_helper import get_live_helper_agent
+from agents.concept_example import get_concept_example_agent
 from services.code_runner import get_code_runner
+from utils.cancellation import cancel_on_disconnect, ClientDisconnected
 from services.pdf_extractor import get_pdf_extractor
 from services.resend_email_service import get_resend_email_service
+from services.job_runner import get_job_runner, JobQueueFull
+from services.job_store import get_job_store
+from utils.serialization import DefaultJSONResponse, model_response
 
 load_dotenv()
 
+
+def _preload_modules():
+    """Import the heavy SDKs the services load lazily, so the first request doesn't pay for them"""
+    start = time.perf_counter()
+    for name in STARTUP_PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
+    logger.info(f"Preloaded {', '.join(STARTUP_PRELOAD_MODULES)} in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the agents at startup and, depending on STARTUP_MODE, preload heavy SDKs"""
+    get_parser_agent()
+    get_batch_codegen_agent()
+    get_live_helper_agent()
+    get_concept_example_agent()
+    # Opening the job store marks jobs a previous process left unfinished as failed
+    get_job_runner()
+
+    if STARTUP_MODE == "eager":
+        _preload_modules()
+    elif STARTUP_MODE == "preload":
+        threading.Thread(target=_preload_modules, name="scaffy-preload", daemon=True).start()
+    yield
+    get_job_runner().shutdown()
+
+
 app = FastAPI(
     title="Scaffy Backend",
     description="AI-powered tool that breaks down programming assignments into manageable tasks",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=DefaultJSONResponse
 )
 
+# Plain ASGI, innermost: requests repeating an Idempotency-Key share the first
+# one's response instead of calling the model again
+from middleware.idempotency import IdempotencyMiddleware
+app.add_middleware(IdempotencyMiddleware)
+
+# Plain ASGI, wraps the idempotency layer so it only ever buffers bodies within
+# limits: rejects oversized bodies (413) before FastAPI reads and parses them;
+# the middlewares below still log, trace and rate limit them
+from middleware.body_limit import BodyLimitMiddleware
+app.add_middleware(BodyLimitMiddleware)
+
+# Plain ASGI, outside the idempotency layer so stored responses stay
+# uncompressed and each replay is encoded for the client asking; inside
+# tracing so request spans include the compression time
+from middleware.compression import CompressionMiddleware
+app.add_middleware(CompressionMiddleware)
+
 # Import and add rate limiting middleware
 from middleware.rate_limiter import rate_limit_middleware
 app.middleware("http")(rate_limit_middleware)
 
+# Tracing is added after rate limiting so it wraps it
+from middleware.tracing import tracing_middleware
+app.middleware("http")(tracing_middleware)
+
+# Request context is outermost so every log line in the request carries its id
+from middleware.request_context import request_context_middleware
+app.middleware("http")(request_context_middleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -74,10 +142,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-parser_agent = ParserAgent()
-codegen_agent = CodegenAgent()
-helper_agent = LiveHelperAgent()
-concept_example_agent = ConceptExampleAgent()
+# Plain ASGI, added last so it is outermost and sees the server's own receive
+# channel; lets /run-code cancel executions when the client goes away
+from middleware.disconnect import DisconnectWatchMiddleware
+app.add_middleware(DisconnectWatchMiddleware)
 
 @app.get("/")
 async def root():
@@ -108,6 +176,17 @@ async def health_check():
         }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint: request, stage, token and JSON-recovery metrics"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 # ============================================
 # AGENT 1: ASSIGNMENT PARSER
 # ============================================
@@ -120,18 +199,17 @@ async def parse_assignment(assignment: AssignmentSchema):
     Agent 1 analyzes the assignment and creates a structured breakdown.
     """
     try:
-        # Log the received assignment for debugging
-        logger.info("=" * 80)
-        logger.info("RECEIVED ASSIGNMENT REQUEST:")
-        logger.info(f"Assignment Text: {assignment.assignment_text[:200]}..." if len(assignment.assignment_text) > 200 else f"Assignment Text: {assignment.assignment_text}")
-        logger.info(f"Target Language: {assignment.target_language}")
-        logger.info(f"Known Language: {assignment.known_language}")
-        logger.info(f"Experience Level: {assignment.experience_level}")
-        logger.info("=" * 80)
+        logger.info(
+            "Parsing assignment: %d chars, target=%s, known=%s, level=%s",
+            len(assignment.assignment_text), assignment.target_language,
+            assignment.known_language, assignment.experience_level
+        )
+        if payload_logging_enabled(logger):
+            logger.debug("Assignment text preview: %.200s", assignment.assignment_text)
         
         # Call Agent 1 to parse the assignment
-        result = parser_agent.parse_assignment(assignment)
-        return result
+        result = get_parser_agent().parse_assignment(assignment)
+        return model_response(result, TaskBreakdownSchema)
     
     except Exception as e:
         raise HTTPException(
@@ -150,139 +228,121 @@ async def generate_starter_code_bacth(request: BatchBoilerPlateCodeSchema):
     Generate starter code - now processes files separately for better quality
     """
     try:
-        import time
-        start_time = time.time()
-
-        logger.info("=" * 80)
-        logger.info("BATCH CODE GENERATION REQUEST")
-        logger.info(f"Number of tasks: {len(request.tasks)}")
-
-        # Group tasks by filename and track class structure
-        files_map = {}
-
-        for task in request.tasks:
-            filename = task.filename
-            class_name = getattr(task, 'class_name', None)
-
-            if filename not in files_map:
-                files_map[filename] = {
-                    'tasks': [],
-                    'class_structure': {},
-                    'template_variables': set(),
-                    'method_signatures_by_class': {}  # Track methods per class
-                }
-
-            # Add task to file
-            files_map[filename]['tasks'].append(task)
-
-            # Track template variables
-            if hasattr(task, 'template_variables') and task.template_variables:
-                files_map[filename]['template_variables'].update(task.template_variables)
-
-            # Track method signatures per class
-            if hasattr(task, 'method_signatures') and task.method_signatures and class_name:
-                if class_name not in files_map[filename]['method_signatures_by_class']:
-                    files_map[filename]['method_signatures_by_class'][class_name] = set()
-                files_map[filename]['method_signatures_by_class'][class_name].update(task.method_signatures)
-
-            # Track class membership
-            if class_name:
-                if class_name not in files_map[filename]['class_structure']:
-                    files_map[filename]['class_structure'][class_name] = []
-                files_map[filename]['class_structure'][class_name].append(task)
-
-        logger.info(f"Tasks organized into {len(files_map)} files")
-        for filename, file_data in files_map.items():
-            logger.info(f"  - {filename}: {len(file_data['tasks'])} tasks")
-            if file_data['class_structure']:
-                logger.info(f"    Classes: {', '.join(file_data['class_structure'].keys())}")
-
-        # Validate class-task distribution before generation
-        for filename, file_data in files_map.items():
-            class_structure = file_data['class_structure']
-            if class_structure:
-                # Check for imbalanced distribution
-                tasks_per_class = {cls: len(tasks) for cls, tasks in class_structure.items()}
-                max_tasks = max(tasks_per_class.values())
-                min_tasks = min(tasks_per_class.values())
-
-                if max_tasks > min_tasks * 3:
-                    logger.warning(f"⚠️  {filename}: Imbalanced task distribution across classes")
-                    for cls, count in tasks_per_class.items():
-                        logger.warning(f"    {cls}: {count} tasks")
-
-                # Check for empty classes
-                for cls, task_list in class_structure.items():
-                    if len(task_list) == 0:
-                        logger.error(f"❌ {filename}: Class '{cls}' has no tasks assigned!")
-                        raise ValueError(f"Class '{cls}' in {filename} has no tasks. Each class must have at least one task.")
-
-        # Generate scaffolding per file
-        all_results = []
-
-        for filename, file_data in files_map.items():
-            file_tasks = file_data['tasks']
-            class_structure = file_data['class_structure'] if file_data['class_structure'] else None
-            template_vars = list(file_data['template_variables']) if file_data['template_variables'] else None
-            # Convert method signatures from sets to lists per class
-            method_sigs_by_class = {cls: list(methods) for cls, methods in file_data['method_signatures_by_class'].items()} if file_data['method_signatures_by_class'] else None
-
-            logger.info("=" * 80)
-            logger.info(f"🔧 GENERATING CODE FOR: {filename}")
-            logger.info(f"  Total Tasks: {len(file_tasks)}")
-            if class_structure:
-                logger.info(f"  Classes detected: {', '.join(class_structure.keys())}")
-            if template_vars:
-                logger.info(f"  Template variables to preserve: {template_vars}")
-            if method_sigs_by_class:
-                logger.info("  📋 METHOD SIGNATURES TO PRESERVE:")
-                for cls, methods in method_sigs_by_class.items():
-                    logger.info(f"    {cls}: {methods}")
-            else:
-                logger.info("  ⚠️  NO METHOD SIGNATURES DETECTED - will generate new methods")
-            logger.info("=" * 80)
-
-            # Generate for this file only
-            file_results = codegen_agent.generate_file_scaffolding(
-                filename=filename,
-                tasks=file_tasks,
-                class_structure=class_structure,
-                template_variables=template_vars,
-                method_signatures_by_class=method_sigs_by_class
-            )
+        logger.info("Batch code generation request: %d tasks", len(request.tasks))
+        scaffold = get_batch_codegen_agent().generate_batch(request.tasks)
+        return model_response(expand_scaffold(scaffold), BatchStarterCodeResponse)
 
-            all_results.extend(file_results)
-            logger.info(f"Successfully generated {len(file_results)} tasks for {filename}")
+    except Exception as e:
+        logger.error(f"Failed to generate starter code batch: {e}", exc_info=True)
+        raise _starter_code_error(e)
 
-        elapsed_time = time.time() - start_time
-        logger.info(f"Total generation completed in {elapsed_time:.2f} seconds")
 
-        logger.info("=" * 80)
-        logger.info("RETURNING TO FRONTEND:")
-        for idx, result in enumerate(all_results):
-            logger.info(f"Task {idx}: {len(result.todos)} todos, file: {result.filename}")
-        logger.info("=" * 80)
+@app.post("/generate-scaffold", response_model=BatchScaffoldResponse)
+async def generate_scaffold(request: BatchBoilerPlateCodeSchema):
+    """
+    Same generation as /generate-starter-code-batch, in the v2 shape: each file's
+    code once in `files`, and per-task records that reference it with the lines
+    their TODOs are on, instead of the whole file repeated in every task
+    """
+    try:
+        logger.info("Scaffold generation request: %d tasks", len(request.tasks))
+        return model_response(get_batch_codegen_agent().generate_batch(request.tasks), BatchScaffoldResponse)
 
-        return BatchStarterCodeResponse(
-            tasks=all_results,
-            total_tasks=len(all_results),
-            generation_time=f"{elapsed_time:.2f}s"
+    except Exception as e:
+        logger.error(f"Failed to generate scaffold: {e}", exc_info=True)
+        raise _starter_code_error(e)
+
+
+def _starter_code_error(e: Exception) -> HTTPException:
+    error_str = str(e).lower()
+    if "rate limit" in error_str or "overloaded" in error_str or "529" in error_str:
+        return HTTPException(
+            status_code=503,
+            detail="The AI service is temporarily overloaded. Please try again in a few moments."
         )
+    return HTTPException(
+        status_code=500,
+        detail=f"Failed to generate starter code batch: {str(e)}"
+    )
 
-    except Exception as e:
-        error_str = str(e).lower()
-        logger.error(f"Failed to generate starter code batch: {e}", exc_info=True)
 
-        if "rate limit" in error_str or "overloaded" in error_str or "529" in error_str:
-            raise HTTPException(
-                status_code=503,
-                detail="The AI service is temporarily overloaded. Please try again in a few moments."
-            )
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to generate starter code batch: {str(e)}"
-            )
+# ============================================
+# BACKGROUND JOBS
+# ============================================
+
+def _submit_job(kind: str, payload: dict, work) -> Response:
+    """Queue work (or attach to the identical job) and describe the job"""
+    try:
+        job, _ = get_job_runner().submit(kind, payload, work)
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy with other generations. Please try again in a few moments."
+        )
+    # 202 while the job is queued or running; a repeat of a finished job gets its result at once
+    return model_response(job, JobStatusResponse,
+                          status_code=202 if job['status'] in ('queued', 'running') else 200,
+                          headers={"Location": f"/jobs/{job['job_id']}"})
+
+
+@app.post("/jobs/parse-assignment", response_model=JobStatusResponse, status_code=202)
+async def start_parse_assignment_job(assignment: AssignmentSchema):
+    """
+    Start /parse-assignment as a background job and return its id at once.
+    Poll GET /jobs/{job_id} for the result.
+    """
+    def work(report):
+        try:
+            return get_parser_agent().parse_assignment(assignment)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to parse assignment: {str(e)}")
+
+    return _submit_job("parse-assignment", assignment.model_dump(), work)
+
+
+@app.post("/jobs/generate-starter-code-batch", response_model=JobStatusResponse, status_code=202)
+async def start_starter_code_batch_job(request: BatchBoilerPlateCodeSchema):
+    """
+    Start /generate-starter-code-batch as a background job and return its id at once.
+    Each file's starter code appears in the job's partial results as soon as it is generated.
+    """
+    def work(report):
+        def on_file(filename, code, file_tasks, completed, total):
+            report(filename, starter_codes({filename: code}, file_tasks), completed, total)
+
+        try:
+            return expand_scaffold(get_batch_codegen_agent().generate_batch(request.tasks, on_file=on_file))
+        except Exception as e:
+            raise _starter_code_error(e)
+
+    return _submit_job("generate-starter-code-batch", request.model_dump(), work)
+
+
+@app.post("/jobs/generate-scaffold", response_model=JobStatusResponse, status_code=202)
+async def start_scaffold_job(request: BatchBoilerPlateCodeSchema):
+    """
+    Start /generate-scaffold as a background job and return its id at once.
+    Each finished file appears in the job's partial results as {code, tasks}.
+    """
+    def work(report):
+        def on_file(filename, code, file_tasks, completed, total):
+            report(filename, {"code": code, "tasks": file_tasks}, completed, total)
+
+        try:
+            return get_batch_codegen_agent().generate_batch(request.tasks, on_file=on_file)
+        except Exception as e:
+            raise _starter_code_error(e)
+
+    return _submit_job("generate-scaffold", request.model_dump(), work)
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Status, progress, partial results and - once finished - the result or error of a job"""
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return model_response(job, JobStatusResponse)
 
 
 # ============================================
@@ -304,7 +364,7 @@ async def get_hint(request: HintResponseSchema):
     """
     try:
         # Call Agent 3 to get a hint
-        result = helper_agent.provide_hint(request)
+        result = get_live_helper_agent().provide_hint(request)
         return result
     
     except Exception as e:
@@ -324,9 +384,9 @@ async def get_concept_example(request: ConceptExampleRequest):
         logger.info(f"Generating on-demand example for concept: {request.concept} in {request.programming_language}")
         
         # Call the concept example agent
-        result = concept_example_agent.generate_example(request)
+        result = get_concept_example_agent().generate_example(request)
         
-        logger.info(f"Successfully generated {result.example_type} example for {request.concept}")
+        logger.info("Generated %s example for %s", result.example_type, request.concept)
         return result
     
     except Exception as e:
@@ -341,7 +401,7 @@ async def get_concept_example(request: ConceptExampleRequest):
 # ============================================
 
 @app.post("/run-code", response_model=CodeExecutionResult)
-async def run_code(request: CodeExecutionRequest):
+async def run_code(request: CodeExecutionRequest, http_request: Request):
     """
     Execute student code and return results
 
@@ -350,33 +410,36 @@ async def run_code(request: CodeExecutionRequest):
     - Output capture
     - Error handling
     - Optional test case execution
+    - Cancellation of outstanding runs if the client disconnects
     """
     try:
-        logger.info(f"Executing {request.language} code ({len(request.code)} characters)")
+        logger.info("Executing %s code (%d characters)", request.language, len(request.code))
 
         code_runner = get_code_runner()
 
         # If test cases are provided, run them
         if request.test_cases and len(request.test_cases) > 0:
-            logger.info(f"Running with {len(request.test_cases)} test cases")
-            # Convert TestCase objects to dicts
-            test_cases_dicts = []
-            for tc in request.test_cases:
-                if hasattr(tc, 'model_dump'):  # Pydantic v2
-                    test_cases_dicts.append(tc.model_dump())
-                elif hasattr(tc, 'dict'):  # Pydantic v1
-                    test_cases_dicts.append(tc.dict())
-                else:
-                    test_cases_dicts.append(tc)
-
-            result = code_runner.run_with_tests(request.code, request.language, test_cases_dicts)
+            logger.info("Running with %d test cases", len(request.test_cases))
+            # The runner keys and caches tests by their fields, so it takes plain dicts
+            test_cases_dicts = [tc.model_dump() for tc in request.test_cases]
+
+            execution = code_runner.run_with_tests(request.code, request.language, test_cases_dicts,
+                                                   deterministic=request.deterministic)
         else:
             # Pass stdin if provided, otherwise use default test values
-            result = code_runner.run_code(request.code, request.language, stdin=request.stdin)
+            execution = code_runner.run_code(request.code, request.language, stdin=request.stdin,
+                                             deterministic=request.deterministic)
+
+        try:
+            result = await cancel_on_disconnect(http_request, execution)
+        except ClientDisconnected:
+            # Nobody is listening; 499 only shows up in access logs and metrics
+            return Response(status_code=499)
 
-        logger.info(f"Execution completed: success={result['success']}, exit_code={result['exit_code']}")
+        logger.info("Execution completed: success=%s, exit_code=%s", result['success'], result['exit_code'])
 
-        return CodeExecutionResult(**result)
+        # Validated and encoded in one pass, rather than built here and checked again by FastAPI
+        return model_response(result, CodeExecutionResult)
 
     except Exception as e:
         logger.error(f"Code execution error: {e}")
@@ -391,7 +454,7 @@ async def run_code(request: CodeExecutionRequest):
 # ============================================
 
 @app.post("/extract-pdf-text", response_model=PDFExtractionResult)
-async def extract_pdf_text(file: UploadFile = File(...)):
+async def extract_pdf_text(file: UploadFile = File(...), structured: bool = False):
     """
     Extract text from uploaded PDF file
     
@@ -399,12 +462,13 @@ async def extract_pdf_text(file: UploadFile = File(...)):
     - File validation (PDF only, max 10MB)
     - Multi-page extraction
     - Error handling for corrupted/invalid PDFs
+    - structured=true keeps code listings and tables as fenced blocks
     """
     try:
         logger.info(f"Received PDF upload request: {file.filename} ({file.content_type})")
         
         pdf_extractor = get_pdf_extractor()
-        result = await pdf_extractor.extract_text(file)
+        result = await pdf_extractor.extract_text(file, structured=structured)
         
         if result['success']:
             logger.info(f"Successfully extracted text from PDF: {result['page_count']} pages, {len(result['extracted_text'])} characters")
@@ -434,11 +498,13 @@ async def generate_tests(request: GenerateTestsRequest):
     using the same AI model as the initial test generation
     """
     try:
-        logger.info(f"Received test generation request for {request.filename}")
-        logger.info(f"Language: {request.language}, Code length: {len(request.code)} chars")
+        logger.info(
+            "Test generation request for %s: language=%s, %d chars",
+            request.filename, request.language, len(request.code)
+        )
 
         # Generate tests using parser agent
-        test_cases = parser_agent.generate_tests_from_code(
+        test_cases = get_parser_agent().generate_tests_from_code(
             code=request.code,
             language=request.language,
             filename=request.filename,
@@ -0,0 +1,106 @@
+"""Request body limits enforced while the body streams in
+
+FastAPI reads and parses the whole body before any handler-level size check
+runs. This plain ASGI middleware rejects a request with 413 as soon as its
+Content-Length, or the bytes received so far, exceed the route's limit from
+config.MAX_REQUEST_BODY_BYTES, so oversized bodies are never buffered or
+parsed.
+"""
+import json
+import logging
+
+from fastapi import HTTPException
+
+from config import MAX_REQUEST_BODY_BYTES, MAX_REQUEST_BODY_DEFAULT
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _detail(limit: int) -> str:
+    return f"Request size exceeds maximum of {limit / (1024 * 1024):.1f}MB for this endpoint"
+
+
+class RequestBodyTooLarge(HTTPException):
+    """
+    Raised from receive() once the streamed body passes the limit. FastAPI
+    turns other errors while reading the body into a 400, but lets
+    HTTPExceptions through, so this reaches the client as a 413.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=_detail(limit))
+
+
+class BodyLimitMiddleware:
+    def __init__(self, app, limits: dict = MAX_REQUEST_BODY_BYTES, default_limit: int = MAX_REQUEST_BODY_DEFAULT):
+        self.app = app
+        self.limits = limits
+        self.default_limit = default_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        limit = self.limits.get(path, self.default_limit)
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                declared = None
+            if declared is not None and declared > limit:
+                await self._reject(send, path, limit)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    self._count(path)
+                    raise RequestBodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestBodyTooLarge:
+            # Only reaches here if nothing inside turned it into a response
+            if response_started:
+                raise
+            await self._send_413(send, limit)
+
+    def _count(self, path: str):
+        logger.warning("Rejected oversized request body for %s", path)
+        metrics.inc("scaffy_request_body_rejected_total", help_text="Requests rejected for an oversized body",
+                    route=path)
+
+    async def _reject(self, send, path: str, limit: int):
+        self._count(path)
+        await self._send_413(send, limit)
+
+    async def _send_413(self, send, limit: int):
+        body = json.dumps({"detail": _detail(limit)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,202 @@
+"""Response compression negotiated per client
+
+Task breakdowns, scaffolds and job results are large JSON documents full of
+repeated code and prose. Responses of COMPRESSION_MIN_BYTES or more are
+compressed with the encoding the client prefers in its Accept-Encoding -
+zstd and br when the zstandard and brotli packages are installed, gzip
+always - at the level set in config.COMPRESSION_LEVELS. Small bodies,
+already-encoded responses and binary content types pass through untouched.
+
+Plain ASGI: the body is held back only until it reaches the threshold, so a
+streamed response is compressed chunk by chunk rather than buffered.
+"""
+import logging
+import zlib
+from typing import Callable, Dict, Optional
+
+from config import COMPRESSION_MIN_BYTES, COMPRESSION_ENCODINGS, COMPRESSION_LEVELS
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/javascript", b"application/xml", b"image/svg+xml")
+
+
+def _gzip(level: int) -> Callable[[bytes, bool], bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)  # gzip container
+
+    def write(data: bytes, last: bool) -> bytes:
+        return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return write
+
+
+def _brotli(level: int) -> Callable[[bytes, bool], bytes]:
+    compressor = brotli.Compressor(quality=level)
+
+    def write(data: bytes, last: bool) -> bytes:
+        return compressor.process(data) + (compressor.finish() if last else compressor.flush())
+    return write
+
+
+def _zstd(level: int) -> Callable[[bytes, bool], bytes]:
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def write(data: bytes, last: bool) -> bytes:
+        mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if last else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return compressor.compress(data) + compressor.flush(mode)
+    return write
+
+
+# Encoding -> factory(level) for a compressor: write(chunk, last) returns the
+# bytes ready to send, ending the stream when last is True
+ENCODERS: Dict[str, Callable[[int], Callable[[bytes, bool], bytes]]] = {"gzip": _gzip}
+if brotli is not None:
+    ENCODERS["br"] = _brotli
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd
+
+
+def negotiate(accept_encoding: str, available=COMPRESSION_ENCODINGS) -> Optional[str]:
+    """
+    The encoding to use for a client sending accept_encoding, or None.
+
+    The client's q-values win; between equally weighted encodings the first
+    in available does. Encodings without an installed encoder are skipped.
+    """
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name.strip():
+            accepted[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        if encoding not in ENCODERS:
+            continue
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_bytes: int = COMPRESSION_MIN_BYTES, encodings=COMPRESSION_ENCODINGS,
+                 levels: Dict[str, int] = COMPRESSION_LEVELS):
+        self.app = app
+        self.min_bytes = min_bytes
+        self.encodings = tuple(encoding for encoding in encodings if encoding in ENCODERS)
+        self.levels = levels
+
+        missing = [encoding for encoding in encodings if encoding not in ENCODERS]
+        if missing:
+            logger.info("Response compression without %s (package not installed)", ", ".join(missing))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None  # Held back until we know whether to compress
+        pending = []
+        original_size = 0
+        compressed_size = 0
+        write = None  # The compressor, once the body is known to be large enough
+
+        async def compressing_send(message):
+            nonlocal start, original_size, compressed_size, write
+            if message["type"] == "http.response.start":
+                if self._compressible(message):
+                    start = message
+                else:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            original_size += len(body)
+
+            if write is None:
+                pending.append(body)
+                if more_body and original_size < self.min_bytes:
+                    return  # Not enough yet to decide
+                body = b"".join(pending)
+                pending.clear()
+                if original_size < self.min_bytes:
+                    # The whole response is small; send it as is
+                    await send(dict(start, headers=self._vary(start.get("headers", []))))
+                    start = None
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                write = self.encoder(encoding)
+                headers = [(name, value) for name, value in self._vary(start.get("headers", []))
+                           if name.lower() != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                compressed = write(body, not more_body)
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                # Streamed bodies go out without a Content-Length
+                await send(dict(start, headers=headers))
+            else:
+                compressed = write(body, not more_body)
+
+            compressed_size += len(compressed)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            if not more_body:
+                self._count(encoding, original_size, compressed_size)
+
+        await self.app(scope, receive, compressing_send)
+
+    def encoder(self, encoding: str) -> Callable[[bytes, bool], bytes]:
+        """A fresh compressor for one response"""
+        return ENCODERS[encoding](self.levels[encoding])
+
+    def _compressible(self, start) -> bool:
+        if start["status"] < 200 or start["status"] in (204, 304):
+            return False
+        headers = dict(start.get("headers", []))
+        if b"content-encoding" in headers:
+            return False
+        return headers.get(b"content-type", b"").startswith(COMPRESSIBLE_TYPES)
+
+    def _vary(self, headers) -> list:
+        """headers with Vary including Accept-Encoding, since the body depends on it"""
+        vary = [value for name, value in headers if name.lower() == b"vary"]
+        if any(b"accept-encoding" in value.lower() or value.strip() == b"*" for value in vary):
+            return list(headers)
+        return [(name, value) for name, value in headers if name.lower() != b"vary"] + \
+            [(b"vary", b", ".join(vary + [b"Accept-Encoding"]))]
+
+    def _count(self, encoding: str, original_size: int, compressed_size: int):
+        metrics.inc("scaffy_response_compression_total", help_text="Responses compressed, by encoding",
+                    encoding=encoding)
+        metrics.inc("scaffy_response_compression_bytes_total", original_size,
+                    help_text="Response body bytes before and after compression", encoding=encoding, stage="original")
+        metrics.inc("scaffy_response_compression_bytes_total", compressed_size,
+                    help_text="Response body bytes before and after compression", encoding=encoding, stage="compressed")
@@ -0,0 +1,46 @@
+"""Disconnect watcher: tells handlers when the client has gone away
+
+request.is_disconnected() never sees the disconnect behind app.middleware("http")
+middlewares (each one wraps receive), so this plain ASGI middleware has to be
+the outermost layer. Once the request body has been read, it keeps listening
+on the server's receive channel and sets an event in the scope on disconnect
+(see utils.cancellation.cancel_on_disconnect).
+"""
+import asyncio
+
+DISCONNECT_EVENT_KEY = "scaffy.disconnected"
+
+
+class DisconnectWatchMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        disconnected = asyncio.Event()
+        scope[DISCONNECT_EVENT_KEY] = disconnected
+        watcher = None
+
+        async def watch():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        async def watched_receive():
+            nonlocal watcher
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body") and watcher is None:
+                # Body complete: the next message from the server is the disconnect
+                watcher = asyncio.ensure_future(watch())
+            return message
+
+        try:
+            await self.app(scope, watched_receive, send)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
@@ -0,0 +1,180 @@
+"""Idempotency-Key support for the expensive POST endpoints
+
+A POST to one of config.IDEMPOTENT_ROUTES carrying an Idempotency-Key header
+runs once. Duplicates that arrive while it is running wait for its response;
+duplicates that arrive afterwards get the stored response (marked with
+Idempotent-Replayed: true) for IDEMPOTENCY_TTL_SECONDS. Retries and double
+clicks therefore never pay for a second model call. Reusing a key with a
+different body is rejected with 422. 5xx responses are handed to requests
+already waiting but not kept, so a later retry runs again.
+
+Plain ASGI and added innermost: it buffers the (already size-checked) body to
+fingerprint it, and replays the app's own response messages.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from config import (
+    IDEMPOTENT_ROUTES,
+    IDEMPOTENCY_TTL_SECONDS,
+    IDEMPOTENCY_MAX_ENTRIES,
+    IDEMPOTENCY_MAX_RESPONSE_BYTES
+)
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+
+class _Entry:
+    def __init__(self, body_hash: str):
+        self.body_hash = body_hash
+        # Resolves to (status, headers, body), or None if no response was captured
+        self.response = asyncio.get_running_loop().create_future()
+        self.finished_at = None
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, routes=IDEMPOTENT_ROUTES, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS,
+                 max_entries: int = IDEMPOTENCY_MAX_ENTRIES, max_response_bytes: int = IDEMPOTENCY_MAX_RESPONSE_BYTES):
+        self.app = app
+        self.routes = set(routes)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_response_bytes = max_response_bytes
+
+        # (route, key) -> _Entry, oldest first
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        key = dict(scope["headers"]).get(b"idempotency-key")
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        route = scope["path"]
+        if len(key) > MAX_KEY_LENGTH:
+            await self._send_error(send, 400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+            return
+
+        body = await self._read_body(receive)
+        if body is None:
+            return  # Client went away before sending the body
+        body_hash = hashlib.sha256(body).hexdigest()
+
+        self._prune()
+        entry = self._entries.get((route, key))
+        if entry is not None:
+            if entry.body_hash != body_hash:
+                self._count(route, "conflict")
+                await self._send_error(send, 422, "Idempotency-Key was already used with a different request body")
+                return
+            self._count(route, "replayed" if entry.response.done() else "attached")
+            response = await asyncio.shield(entry.response)
+            if response is not None:
+                await self._replay(send, response)
+                return
+            # The first request ended without a response; this one runs instead
+
+        self._count(route, "new")
+        await self._run(scope, receive, send, route, key, body, body_hash)
+
+    async def _run(self, scope, receive, send, route: str, key: bytes, body: bytes, body_hash: str):
+        entry = _Entry(body_hash)
+        self._entries[(route, key)] = entry
+        self._entries.move_to_end((route, key))
+
+        sent_body = False
+
+        async def replay_receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        start = None
+        chunks = []
+        size = 0
+
+        async def capturing_send(message):
+            nonlocal start, size
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body" and start is not None and size <= self.max_response_bytes:
+                chunks.append(message.get("body", b""))
+                size += len(chunks[-1])
+                if not message.get("more_body"):
+                    # Resolve before forwarding, so waiters get it even if this client is gone
+                    self._finish(route, key, entry, (start["status"], start.get("headers", []), b"".join(chunks)))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capturing_send)
+        finally:
+            if not entry.response.done():
+                self._finish(route, key, entry, None)
+
+    def _finish(self, route: str, key: bytes, entry: _Entry, response):
+        if response is not None and len(response[2]) > self.max_response_bytes:
+            response = None
+        entry.response.set_result(response)
+        entry.finished_at = time.time()
+        # Server errors and uncaptured responses aren't kept: a retry should run again
+        if response is None or response[0] >= 500:
+            if self._entries.get((route, key)) is entry:
+                del self._entries[(route, key)]
+
+    def _prune(self):
+        now = time.time()
+        expired = [k for k, entry in self._entries.items()
+                   if entry.finished_at is not None and now - entry.finished_at > self.ttl_seconds]
+        for k in expired:
+            del self._entries[k]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    async def _replay(self, send, response):
+        status, headers, body = response
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": list(headers) + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _send_error(self, send, status: int, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def _count(self, route: str, result: str):
+        if result != "new":
+            logger.info("Idempotency-Key %s request on %s", result, route)
+        metrics.inc("scaffy_idempotency_total", help_text="Requests carrying an Idempotency-Key (new, attached, replayed, conflict)",
+                    route=route, result=result)
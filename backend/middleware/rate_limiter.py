@@ -6,6 +6,7 @@ from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 import logging
 from config import RATE_LIMIT_PER_MINUTE, RATE_LIMIT_PER_HOUR, RATE_LIMIT_PER_DAY
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -91,10 +92,14 @@ class RateLimiter:
 rate_limiter = RateLimiter()
 
 async def rate_limit_middleware(request: Request, call_next):
-    if request.url.path in ["/", "/health", "/docs", "/redoc", "/openapi.json"]:
+    if request.url.path in ["/", "/health", "/metrics", "/docs", "/redoc", "/openapi.json"]:
+        return await call_next(request)
+    # Job polls only read stored state; starting the job was already counted
+    if request.method == "GET" and request.url.path.startswith("/jobs/"):
         return await call_next(request)
     try:
-        await rate_limiter.check_rate_limit(request)
+        with span("rate_limit.check"):
+            await rate_limiter.check_rate_limit(request)
         response = await call_next(request)
         ip = rate_limiter._get_client_ip(request)
         headers = rate_limiter.get_rate_limit_headers(ip)
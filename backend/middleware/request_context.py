@@ -0,0 +1,22 @@
+"""Request context middleware: request id and route for every log line"""
+import re
+import uuid
+from fastapi import Request
+from utils.logging_config import bind_request_context, reset_request_context
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Accept caller-supplied ids only if they are short and log-safe
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+async def request_context_middleware(request: Request, call_next):
+    request_id = request.headers.get(REQUEST_ID_HEADER, "")
+    if not _VALID_REQUEST_ID.match(request_id):
+        request_id = uuid.uuid4().hex
+
+    tokens = bind_request_context(request_id, request.url.path)
+    try:
+        response = await call_next(request)
+        response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+    finally:
+        reset_request_context(tokens)
@@ -0,0 +1,35 @@
+"""Request tracing middleware: one root span per request plus request metrics"""
+from fastapi import Request
+from utils.metrics import metrics
+from utils.tracing import span
+
+UNTRACED_PATHS = ["/metrics", "/health"]
+
+def _route_template(request: Request) -> str:
+    # Label by route template rather than raw path to keep metric cardinality
+    # bounded; paths no route matched (404s, scanners) share one label
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+async def tracing_middleware(request: Request, call_next):
+    if request.url.path in UNTRACED_PATHS:
+        return await call_next(request)
+
+    with span("http.request", **{"http.method": request.method}) as request_span:
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            response.headers["X-Trace-ID"] = request_span.trace_id
+            return response
+        finally:
+            route = _route_template(request)
+            request_span.set_attributes({"http.route": route, "http.status_code": status_code})
+            metrics.inc(
+                "scaffy_http_requests_total", help_text="HTTP requests by route and status",
+                route=route, method=request.method, status=status_code
+            )
+            metrics.observe(
+                "scaffy_http_request_duration_seconds", request_span.duration_seconds,
+                help_text="End-to-end request latency", route=route, method=request.method
+            )
@@ -9,7 +9,9 @@ from .schemas import (
     ConceptExampleRequest,
     ConceptExampleResponse,
     BatchBoilerPlateCodeSchema,
-    BatchStarterCodeResponse
+    BatchStarterCodeResponse,
+    ScaffoldTask,
+    BatchScaffoldResponse
 )
 
 __all__ = [
@@ -23,5 +25,7 @@ __all__ = [
     "ConceptExampleRequest",
     "ConceptExampleResponse",
     "BatchBoilerPlateCodeSchema",
-    "BatchStarterCodeResponse"
+    "BatchStarterCodeResponse",
+    "ScaffoldTask",
+    "BatchScaffoldResponse"
 ]
\ No newline at end of file
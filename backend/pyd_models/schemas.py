@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 
 
 #--------Schema for Agent 1: Parser--------#
@@ -95,6 +95,25 @@ class BatchStarterCodeResponse(BaseModel):
     total_tasks: int
     generation_time: Optional[str] = None
 
+# Output v2 - each file's code once; tasks reference their file
+class TodoLineRange(BaseModel):
+    start_line: int  # 1-based, inclusive
+    end_line: int
+
+class ScaffoldTask(BaseModel):
+    filename: str  # Key into BatchScaffoldResponse.files
+    instructions: str
+    todos: List[str]
+    todo_lines: Optional[TodoLineRange] = None  # Lines of the file holding this task's TODOs, if found
+    concept_examples: Optional[Dict[str, str]] = None
+
+class BatchScaffoldResponse(BaseModel):
+    version: int = 2
+    files: Dict[str, str]  # filename -> complete starter code
+    tasks: List[ScaffoldTask]
+    total_tasks: int
+    generation_time: Optional[str] = None
+
 #--------Schema for Agent 3: Live Helper--------#
 
 #Input
@@ -125,16 +144,22 @@ class CodeExecutionRequest(BaseModel):
     language: str
     stdin: Optional[str] = None  # Optional stdin input for input() calls
     test_cases: Optional[List[TestCase]] = None  # Optional test cases to run
+    deterministic: Optional[bool] = None  # Allow/forbid memoizing the result (default: detected from the code)
 
 # Individual Test Result
 class TestResult(BaseModel):
     test_name: str
     function_name: Optional[str] = None  # Function being tested
     passed: bool
+    skipped: bool = False  # Not run: the code failed the compile/syntax check
+    cached: bool = False  # Reused from an earlier run; nothing it depends on changed
     input_data: str
     expected_output: str
     actual_output: str
     error: Optional[str] = None
+    wall_time_ms: Optional[float] = None  # Duration of the tested call
+    cpu_time_ms: Optional[float] = None
+    peak_memory_kb: Optional[int] = None  # Peak memory of the process that ran the test
 
 #Output
 class CodeExecutionResult(BaseModel):
@@ -143,9 +168,14 @@ class CodeExecutionResult(BaseModel):
     error: str
     exit_code: int
     execution_time: str
+    wall_time_ms: Optional[float] = None  # With tests: total across the test runs
+    cpu_time_ms: Optional[float] = None
+    peak_memory_kb: Optional[int] = None
     test_results: Optional[List[TestResult]] = None
     tests_passed: Optional[int] = None
     tests_failed: Optional[int] = None
+    tests_skipped: Optional[int] = None
+    cached: bool = False  # Repeat of a recent identical run (services/run_memo.py)
 
 
 #--------Schema for PDF Text Extraction--------#
@@ -205,3 +235,18 @@ class FeedbackResponse(BaseModel):
     message: str
 
 
+#--------Schema for Background Jobs--------#
+
+#Output
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str  # "parse-assignment", "generate-starter-code-batch" or "generate-scaffold"
+    status: str  # queued, running, succeeded or failed
+    result: Optional[Dict[str, Any]] = None  # The synchronous endpoint's response, once succeeded
+    partial: Dict[str, Any] = {}  # Results finished so far, e.g. starter code per filename
+    completed: int = 0  # Tasks finished so far
+    total: int = 0
+    error: Optional[str] = None
+    status_code: Optional[int] = None  # HTTP status the synchronous endpoint would have returned
+    created_at: float
+    updated_at: float
@@ -1,20 +1,27 @@
-import anthropic
 import os
 import time
 import logging
-import time
-import logging
 from dotenv import load_dotenv
 
+from config import MODEL_MAX_CONTINUATIONS
+from utils.metrics import metrics
+from utils.tracing import span
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 
+def _sdk():
+    """The anthropic SDK, imported on the first model call rather than at startup"""
+    import anthropic
+    return anthropic
+
+
 class AnthropicClient:
     def __init__(self, model: str = "claude-sonnet-4-20250514"):
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self._client = None
         self.model = model
 
         # Retry configuration
@@ -22,57 +29,50 @@ class AnthropicClient:
         self.base_delay = 1  # Start with 1 second delay
         self.max_delay = 60  # Max 60 seconds between retries
 
+    @property
+    def client(self):
+        """SDK client, created on first use"""
+        if self._client is None:
+            self._client = _sdk().Anthropic(api_key=self.api_key)
+        return self._client
+
     def generate_response(self, prompt: str, max_tokens: int = 4000, model: str = None) -> str:
         """
         Generate response with retry logic and exponential backoff.
         Handles 529 (Overloaded) and other retryable errors.
         """
+        anthropic = _sdk()
         last_exception = None
         
         for attempt in range(self.max_retries):
             try:
                 # Use provided model or fall back to instance default
                 model_to_use = model or self.model
-                logger.info(f"API call attempt {attempt + 1}/{self.max_retries} using model: {model_to_use}")
-
-                response = self.client.messages.create(
-                    model=model_to_use,
-                    max_tokens=max_tokens,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-
-                # Get response text
-                response_text = response.content[0].text
-
-                # Check for truncation or incomplete response
-                if response.stop_reason == "max_tokens":
-                    logger.warning(f"Response truncated (hit max_tokens limit of {max_tokens})")
-                    logger.warning(f"Response length: {len(response_text)} characters")
-                    # Continue anyway, but log the warning
-
-                # Check for obviously incomplete code (methods outside classes)
-                if "// =====" in response_text and "public class" in response_text:
-                    # Quick heuristic: if we see task comments outside class blocks, response is malformed
-                    lines = response_text.split('\n')
-                    class_depth = 0
-                    for line in lines:
-                        if 'public class' in line or 'class ' in line:
-                            class_depth += line.count('{') - line.count('}')
-                        elif class_depth == 0 and ('public void' in line or 'private void' in line):
-                            logger.error("DETECTED MALFORMED CODE: Methods outside class boundaries!")
-                            logger.error(f"This usually means API response was truncated or rate limited")
-
-                            # Treat malformed response as retryable error
-                            if attempt < self.max_retries - 1:
-                                delay = self._calculate_backoff(attempt)
-                                logger.info(f"Retrying due to malformed response in {delay} seconds...")
-                                time.sleep(delay)
-                                continue  # Skip to next retry attempt
-                            else:
-                                raise ValueError("Generated code is malformed - methods outside classes detected after max retries")
-
-                logger.info(f"API call succeeded on attempt {attempt + 1}")
-                return response_text
+                with span("model.attempt", model=model_to_use, attempt=attempt + 1, max_tokens=max_tokens) as attempt_span:
+                    logger.info("API call attempt %d/%d using model: %s", attempt + 1, self.max_retries, model_to_use)
+
+                    response = self.client.messages.create(
+                        model=model_to_use,
+                        max_tokens=max_tokens,
+                        messages=[{"role": "user", "content": prompt}]
+                    )
+
+                    # Get response text
+                    response_text = response.content[0].text
+                    self._record_usage(attempt_span, model_to_use, response)
+
+                    # Check for truncation or incomplete response
+                    if response.stop_reason == "max_tokens":
+                        logger.warning(f"Response truncated (hit max_tokens limit of {max_tokens})")
+                        logger.warning(f"Response length: {len(response_text)} characters")
+                        # Pick up where it stopped rather than regenerating the whole response
+                        response_text = self._continue_response(prompt, response_text, max_tokens, model_to_use)
+
+                    # Generated code arrives inside JSON; codegen_agent checks its
+                    # structure once the code has been extracted
+
+                    logger.info("API call succeeded on attempt %d", attempt + 1)
+                    return response_text
 
             except anthropic.RateLimitError as e:
                 last_exception = e
@@ -112,6 +112,72 @@ class AnthropicClient:
         logger.error(error_msg)
         raise Exception(error_msg)
     
+    def _continue_response(self, prompt: str, partial: str, max_tokens: int, model: str) -> str:
+        """
+        Extend a response that stopped at max_tokens.
+
+        Each follow-up call sends the partial output back as the start of the
+        assistant turn, so the model only generates what is missing, and up to
+        MODEL_MAX_CONTINUATIONS of them are made. Returns whatever was reached:
+        the complete text, or the longest partial one if the continuations run
+        out or fail (json_parser's truncation recovery still applies to it).
+        """
+        anthropic = _sdk()
+        text = partial
+        for continuation in range(1, MODEL_MAX_CONTINUATIONS + 1):
+            # The API rejects a prefill ending in whitespace; the model writes it again
+            text = text.rstrip()
+            with span("model.continuation", model=model, continuation=continuation,
+                      max_tokens=max_tokens, prefill_chars=len(text)) as continuation_span:
+                try:
+                    response = self.client.messages.create(
+                        model=model,
+                        max_tokens=max_tokens,
+                        messages=[
+                            {"role": "user", "content": prompt},
+                            {"role": "assistant", "content": text}
+                        ]
+                    )
+                except anthropic.APIError as e:
+                    logger.warning(f"Continuation {continuation} failed, keeping the truncated response: {e}")
+                    self._count_continuation(model, "failed")
+                    return text
+
+                self._record_usage(continuation_span, model, response)
+                text += ''.join(block.text for block in response.content if getattr(block, 'type', 'text') == 'text')
+
+            if response.stop_reason != "max_tokens":
+                logger.info("Response completed by continuation %d (%d characters)", continuation, len(text))
+                self._count_continuation(model, "completed")
+                return text
+            logger.warning(f"Continuation {continuation} also hit max_tokens ({len(text)} characters so far)")
+            self._count_continuation(model, "truncated")
+
+        if MODEL_MAX_CONTINUATIONS:
+            logger.warning(f"Response still truncated after {MODEL_MAX_CONTINUATIONS} continuations")
+        return text
+
+    def _count_continuation(self, model: str, outcome: str):
+        metrics.inc("scaffy_model_continuations_total",
+                    help_text="Follow-up calls resuming a response cut off at max_tokens",
+                    model=model, outcome=outcome)
+
+    def _record_usage(self, attempt_span, model: str, response):
+        """Attach token usage and stop reason to the attempt span and counters"""
+        usage = getattr(response, 'usage', None)
+        input_tokens = getattr(usage, 'input_tokens', 0) or 0
+        output_tokens = getattr(usage, 'output_tokens', 0) or 0
+        attempt_span.set_attributes({
+            "model.input_tokens": input_tokens,
+            "model.output_tokens": output_tokens,
+            "model.stop_reason": response.stop_reason,
+        })
+        metrics.inc("scaffy_model_calls_total", help_text="Model API calls by stop reason",
+                    model=model, stop_reason=response.stop_reason)
+        metrics.inc("scaffy_model_tokens_total", input_tokens, help_text="Model tokens used",
+                    model=model, direction="input")
+        metrics.inc("scaffy_model_tokens_total", output_tokens, model=model, direction="output")
+
     def _calculate_backoff(self, attempt: int) -> float:
         """
         Calculate exponential backoff delay.
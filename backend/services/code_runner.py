@@ -3,11 +3,19 @@ Code execution service using Piston API
 Runs Python and JavaScript code with interactive input support
 """
 
-import requests
+import asyncio
+import httpx
 import logging
 from typing import Dict, Any, Optional
 import os
 
+from config import CODE_EXECUTION_BACKEND, PISTON_MAX_CONCURRENT_RUNS, RUN_MEMO_ENABLED, TEST_IMPACT_ENABLED
+from services import test_harness
+from services import test_impact
+from services.run_memo import get_run_memo, is_transient, looks_deterministic, normalize_source
+from services.syntax_check import check_syntax
+from utils.tracing import span
+
 logger = logging.getLogger(__name__)
 
 class CodeRunner:
@@ -16,6 +24,23 @@ class CodeRunner:
         self.piston_api_url = os.getenv("PISTON_API_URL", "https://emkc.org/api/v2/piston")
         self.timeout = 30  # 30 second timeout (Piston API limit)
         self.max_output_length = 10000  # Limit output to prevent memory issues
+
+        # Shared async client (created on first use); the semaphore keeps test
+        # runs that go out concurrently within Piston's rate limits
+        self._http: Optional[httpx.AsyncClient] = None
+        self._piston_slots = asyncio.Semaphore(PISTON_MAX_CONCURRENT_RUNS)
+
+        # Optional local backend with a compiled-artifact cache; languages it
+        # has no toolchain for still go to Piston
+        self.local_executor = None
+        if CODE_EXECUTION_BACKEND == "local":
+            from services.local_executor import get_local_executor
+            self.local_executor = get_local_executor()
+
+        # Recent results of deterministic runs, so an unchanged re-run is instant
+        self.run_memo = get_run_memo() if RUN_MEMO_ENABLED else None
+        # Results of individual tests, reused when a rerun didn't touch what they reach
+        self.test_results = test_impact.get_test_result_cache() if TEST_IMPACT_ENABLED else None
         
         # Note: Piston API has hard limits:
         # - 30 second execution timeout
@@ -111,18 +136,22 @@ class CodeRunner:
         
         return code
     
-    def _check_output_match(self, actual_output: str, expected_output: str) -> bool:
+    def _check_output_match(self, actual_output: str, expected_output: str,
+                            wall_time_ms: Optional[float] = None) -> bool:
         """
         Check if actual output matches expected output with support for special patterns.
 
         Patterns:
         - "CONTAINS:word1,word2,word3" → Check if output contains all words/phrases
         - "COUNT:pattern:N" → Check if pattern appears exactly N times
+        - "MAXMS:N" → Check the tested call finished within N milliseconds
+        - "MAXMS:N:expected" → Same, and the rest must match as usual
         - Regular string → Exact match (after stripping whitespace)
 
         Args:
             actual_output: Actual program output
             expected_output: Expected output or pattern
+            wall_time_ms: Duration of the tested call, for MAXMS
 
         Returns:
             True if outputs match, False otherwise
@@ -130,6 +159,21 @@ class CodeRunner:
         expected = expected_output.strip()
         actual = actual_output.strip()
 
+        # Pattern 0: MAXMS performance check
+        if expected.startswith("MAXMS:"):
+            limit, _, rest = expected[6:].partition(":")
+            try:
+                max_ms = float(limit.strip())
+            except ValueError:
+                logger.warning(f"Invalid MAXMS pattern: {expected}")
+                return False
+            if wall_time_ms is None:
+                logger.warning("MAXMS check without timing information; failing the test")
+                return False
+            if wall_time_ms > max_ms:
+                return False
+            return self._check_output_match(actual, rest) if rest.strip() else True
+
         # Pattern 1: CONTAINS check
         if expected.startswith("CONTAINS:"):
             patterns = expected[9:].split(",")  # Remove "CONTAINS:" prefix
@@ -152,18 +196,62 @@ class CodeRunner:
         # Default: Exact match
         return actual == expected
 
-    def run_code(self, code: str, language: str, stdin: Optional[str] = None) -> Dict[str, Any]:
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(timeout=self.timeout + 5)  # Add buffer for timeout
+        return self._http
+
+    async def _memoized(self, memo_key: Optional[str], code: str, compute):
+        """
+        Return the memoized result for memo_key, or await compute() and
+        remember its result unless any run behind it was transient (timeout,
+        service error, cancellation). compute returns (result, runs).
         """
-        Run code using Piston API
+        if memo_key is not None:
+            cached = self.run_memo.get(memo_key, code)
+            if cached is not None:
+                logger.info("Returning memoized run result")
+                return cached
+
+        result, runs = await compute()
+        if memo_key is not None and not any(is_transient(run) for run in [result, *runs]):
+            self.run_memo.put(memo_key, result, code)
+        return result
+
+    async def run_code(self, code: str, language: str, stdin: Optional[str] = None,
+                       harness: Optional[str] = None, deterministic: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Run code using Piston API (or the local backend when enabled)
+
+        Cancelling the awaiting task abandons the Piston request, or kills the
+        local process. Results of deterministic code are memoized briefly
+        (services/run_memo.py); a repeat run returns the same result with
+        cached=True.
         
         Args:
             code: Code to execute
             language: Programming language
             stdin: Optional stdin input (for input() calls). If None, provides default test values.
+            harness: Optional test driver appended to the code. The local backend
+                compiles it separately for Java so the student's classes are reused.
+            deterministic: None to detect from the code whether the run may be
+                memoized; True to memoize regardless, False to never memoize
         
         Returns:
             Dict with success, output, error, exit_code, execution_time
         """
+        memo_key = None
+        if self.run_memo is not None:
+            memo_key = self.run_memo.key(code, language, stdin=stdin, extra=harness or '', deterministic=deterministic)
+
+        async def compute():
+            result = await self._execute(code, language, stdin=stdin, harness=harness)
+            return result, []
+
+        return await self._memoized(memo_key, code, compute)
+
+    async def _execute(self, code: str, language: str, stdin: Optional[str] = None, harness: Optional[str] = None) -> Dict[str, Any]:
+        """Run code once on Piston or the local backend (see run_code)"""
         language = language.lower()
         
         # Map language to Piston API language name
@@ -183,6 +271,12 @@ class CodeRunner:
             # Provide multiple test inputs (one per line) for multiple input() calls
             # Common test values: numbers, strings, yes/no, exit commands
             stdin = "1234\ntest_input\ny\nyes\n1\n0\nx\n"
+
+        if self.local_executor and self.local_executor.supports(language):
+            return await self.local_executor.run(code, language, stdin=stdin, timeout=self.timeout, harness=harness)
+
+        if harness is not None:
+            code = f"{code}\n\n{harness}"
         
         try:
             # Prepare request payload
@@ -198,14 +292,13 @@ class CodeRunner:
                 "run_timeout": self.timeout * 1000  # Convert to milliseconds
             }
             
-            logger.info(f"Executing {language} code via Piston API ({len(code)} characters)")
+            logger.debug("Executing %s code via Piston API (%d characters)", language, len(code))
             
             # Make request to Piston API
-            response = requests.post(
-                f"{self.piston_api_url}/execute",
-                json=payload,
-                timeout=self.timeout + 5  # Add buffer for timeout
-            )
+            async with self._piston_slots:
+                with span("piston.execute", language=piston_language, code_chars=len(code)) as piston_span:
+                    response = await self._client().post(f"{self.piston_api_url}/execute", json=payload)
+                    piston_span.set_attribute("http.status_code", response.status_code)
             
             if response.status_code != 200:
                 logger.error(f"Piston API error: {response.status_code} - {response.text}")
@@ -218,6 +311,19 @@ class CodeRunner:
                 }
             
             result = response.json()
+
+            # Compiled languages: Piston skips the run stage if compilation fails
+            compile_result = result.get("compile") or {}
+            if compile_result.get("code") not in (None, 0) or compile_result.get("signal"):
+                compile_output = compile_result.get("stderr") or compile_result.get("output") or "Compilation failed"
+                return {
+                    "success": False,
+                    "output": "",
+                    "error": compile_output[:self.max_output_length],
+                    "exit_code": int(compile_result.get("code") or 1),
+                    "execution_time": "0.00s",
+                    "compile_error": True
+                }
             
             # Extract output and error
             run_result = result.get("run", {})
@@ -238,17 +344,21 @@ class CodeRunner:
             if isinstance(execution_time, (int, float)):
                 execution_time = f"{execution_time:.2f}s"
             
-            logger.info(f"Execution completed: success={success}, exit_code={exit_code}")
+            logger.debug("Execution completed: success=%s, exit_code=%s", success, exit_code)
             
             return {
                 "success": success,
                 "output": stdout,
                 "error": stderr,
                 "exit_code": exit_code,
-                "execution_time": execution_time
+                "execution_time": execution_time,
+                # Reported by Piston v3+ (milliseconds and bytes)
+                "wall_time_ms": run_result.get("wall_time"),
+                "cpu_time_ms": run_result.get("cpu_time"),
+                "peak_memory_kb": run_result["memory"] // 1024 if run_result.get("memory") else None
             }
             
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             logger.warning(f"Execution timed out after {self.timeout} seconds")
             return {
                 "success": False,
@@ -257,7 +367,7 @@ class CodeRunner:
                 "exit_code": -1,
                 "execution_time": f"> {self.timeout}s"
             }
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Piston API request error: {e}")
             return {
                 "success": False,
@@ -276,27 +386,57 @@ class CodeRunner:
                 "execution_time": "error"
             }
 
-    def run_with_tests(self, code: str, language: str, test_cases: list, inject_timeout: bool = False) -> Dict[str, Any]:
+    async def run_with_tests(self, code: str, language: str, test_cases: list, inject_timeout: bool = False,
+                             deterministic: Optional[bool] = None) -> Dict[str, Any]:
         """
         Run code with test cases and return results
 
+        The code is compile/syntax checked first (services/syntax_check.py, or one
+        real run where no local checker exists); if that fails, every test is
+        reported as skipped with the shared diagnostic and nothing else runs.
+
+        Function tests go through the structured harness (services/test_harness.py):
+        all of them run in one process and each reports its own result record.
+        If the batch doesn't report every test (compile error, crash, timeout),
+        the missing ones are retried one per process. Integration/main tests run
+        the whole program and compare its full stdout. Retries and whole-program
+        runs go out concurrently.
+
+        For Python and JavaScript, harness tests whose reachable functions are
+        unchanged since an earlier run reuse that run's TestResult (marked
+        cached) instead of executing again; see services/test_impact.py.
+
+        Each TestResult carries the wall time, CPU time and peak memory of its
+        call (of the whole program for integration tests); the top-level timing
+        totals the test runs.
+
+        Results are memoized like run_code's, keyed on the code and the test
+        cases; runs with MAXMS tests are never memoized.
+
         Args:
             code: Student's code
             language: Programming language
             test_cases: List of test case dicts with function_name, input_data, expected_output
             inject_timeout: If True, inject timeout handling for long-running programs (default False)
+            deterministic: Whether the run may be memoized (see run_code)
 
         Returns:
-            Dict with test_results, tests_passed, tests_failed, plus regular execution info
+            Dict with test_results, tests_passed, tests_failed, tests_skipped, plus regular execution info
         """
+        memo_key = None
+        if self.run_memo is not None:
+            memo_key = self.run_memo.key(code, language, test_cases=test_cases,
+                                         extra=f"inject_timeout={inject_timeout}", deterministic=deterministic)
+        return await self._memoized(
+            memo_key, code, lambda: self._run_tests(code, language, test_cases, inject_timeout, deterministic)
+        )
+
+    async def _run_tests(self, code: str, language: str, test_cases: list, inject_timeout: bool,
+                         deterministic: Optional[bool]):
+        """Run the tests (see run_with_tests); returns (result, the individual runs behind it)"""
+        runs = []
         try:
-            from pyd_models.schemas import TestResult
-
-            test_results = []
-            tests_passed = 0
-            tests_failed = 0
-
-            logger.info(f"Running {len(test_cases)} test cases for {language} code")
+            logger.info("Running %d test cases for %s code", len(test_cases), language)
             
             # Optionally inject timeout handling for long-running programs
             base_code = code
@@ -304,28 +444,312 @@ class CodeRunner:
                 logger.info("Injecting timeout handling for long-running program testing")
                 base_code = self._inject_timeout_handling(code, language, timeout_seconds=10)
 
-            for test_case in test_cases:
+            # Fail fast: a compile error would otherwise repeat for every test
+            checked, diagnostic = await check_syntax(base_code, language, self.local_executor)
+            program_result = None
+            if not checked:
+                # No local checker: one real run doubles as the check and as the program's own output
+                program_result = await self._execute(base_code, language, stdin="")
+                if self._is_compile_failure(program_result, language):
+                    diagnostic = program_result.get('error') or "Compilation failed"
+            if diagnostic:
+                return self._skipped_result(test_cases, diagnostic), [program_result] if program_result else []
+
+            test_results = [None] * len(test_cases)
+            harness_tests = [
+                (index, test_case) for index, test_case in enumerate(test_cases)
+                if test_harness.supports(language, test_case.get('function_name', ''), base_code)
+            ]
+
+            if harness_tests:
+                # Tests whose reachable functions are unchanged since an earlier run reuse its results
+                impact = self._test_impact(base_code, language, deterministic)
+                reused = self._reusable_results(impact, harness_tests)
+                cached_program = self.test_results.get(impact.program_key()) if impact is not None else None
+                pending = [(i, t) for i, t in harness_tests if i not in reused]
+
+                if pending or cached_program is None:
+                    # With every test reused this still runs the program once for its own output
+                    records, batch_result = await self._run_harness(base_code, language, pending)
+                    if reused and not self._is_clean_batch(batch_result, records, pending):
+                        # Module-level code may have failed; the reused results can't be trusted
+                        logger.info("Partial harness batch failed; rerunning all %d tests", len(harness_tests))
+                        reused, pending = {}, harness_tests
+                        runs.append(batch_result)
+                        records, batch_result = await self._run_harness(base_code, language, pending)
+                    runs.append(batch_result)
+                    run_results = {index: batch_result for index, _ in pending}
+                    missing = [(i, t) for i, t in pending if i not in records]
+                    if missing and len(pending) > 1:
+                        logger.info("Harness batch reported %d/%d tests; retrying the rest one by one",
+                                    len(pending) - len(missing), len(pending))
+                        retries = await asyncio.gather(
+                            *(self._run_harness(base_code, language, [test]) for test in missing)
+                        )
+                        for (index, _), (single, result) in zip(missing, retries):
+                            runs.append(result)
+                            records.update(single)
+                            run_results[index] = result
+                    for index, test_case in pending:
+                        test_results[index] = self._harness_test_result(test_case, records.get(index), run_results[index])
+                    if impact is not None:
+                        self._remember_results(impact, pending, test_results, records, run_results)
+                        if self._is_clean_batch(batch_result, records, pending):
+                            self.test_results.put(impact.program_key(), {
+                                key: batch_result.get(key) for key in ('output', 'error', 'exit_code')
+                            })
+                elif program_result is None:
+                    program_result = cached_program
+
+                for index, result in reused.items():
+                    test_results[index] = result
+
+            # Whole-program tests; identical programs only run once
+            legacy_tests = []
+            for index, test_case in enumerate(test_cases):
+                if test_results[index] is not None:
+                    continue
                 try:
-                    test_name = test_case.get('test_name', 'Unknown Test')
-                    function_name = test_case.get('function_name', '')
-                    input_data = test_case.get('input_data', '')
-                    expected_output = test_case.get('expected_output', '').strip()
-
-                    # Generate test code based on language
-                    if language.lower() == 'python':
-                        test_code = f"{base_code}\n\n# Test execution\nresult = {function_name}({input_data})\nprint(result)"
-                    elif language.lower() in ['javascript', 'js']:
-                        test_code = f"{base_code}\n\n// Test execution\nconst result = {function_name}({input_data});\nconsole.log(result);"
-                    elif language.lower() in ['csharp', 'c#', 'cs']:
-                        # For C#, check if code already has Main method
-                        has_main = 'static void Main' in base_code or 'static async Task Main' in base_code
-
-                        if function_name.lower() == 'main' and has_main:
-                            # Integration test - code already has Main, just run it
-                            test_code = base_code
-                        elif function_name.lower() == 'main' and not has_main:
-                            # Need to add Main method to call the function
-                            test_code = f"""{base_code}
+                    program = self._build_legacy_test(
+                        base_code, language, test_case.get('function_name', ''), test_case.get('input_data', '')
+                    )
+                    legacy_tests.append((index, test_case, program))
+                except Exception as e:
+                    test_results[index] = self._legacy_error_result(test_case, e)
+            programs = list(dict.fromkeys(program for _, _, program in legacy_tests))
+            outputs = await asyncio.gather(
+                *(self._execute(test_code, language, stdin="", harness=harness) for test_code, harness in programs)
+            )
+            outputs = dict(zip(programs, outputs))
+            for index, test_case, program in legacy_tests:
+                test_results[index] = self._legacy_test_result(test_case, outputs[program])
+            runs.extend(outputs.values())
+
+            tests_passed = sum(1 for result in test_results if result.passed)
+            tests_failed = len(test_results) - tests_passed
+
+            # Program output/error come from the check run, else the first test run
+            if program_result is None:
+                program_result = runs[0] if runs else {}
+
+            wall_times = [run['wall_time_ms'] for run in runs if run.get('wall_time_ms') is not None]
+            cpu_times = [run['cpu_time_ms'] for run in runs if run.get('cpu_time_ms') is not None]
+            peaks = [result.peak_memory_kb for result in test_results if result.peak_memory_kb is not None]
+            if wall_times:
+                execution_time = f"{sum(wall_times) / 1000:.2f}s"
+            else:
+                execution_time = runs[0].get('execution_time', '') if runs else ''
+
+            return {
+                "success": tests_passed > 0 and tests_failed == 0,
+                "output": program_result.get('output', ''),
+                "error": program_result.get('error', ''),
+                "exit_code": program_result.get('exit_code', 0),
+                "execution_time": execution_time,
+                "wall_time_ms": sum(wall_times) if wall_times else None,
+                "cpu_time_ms": sum(cpu_times) if cpu_times else None,
+                "peak_memory_kb": max(peaks) if peaks else None,
+                "test_results": test_results,
+                "tests_passed": tests_passed,
+                "tests_failed": tests_failed,
+                "tests_skipped": 0
+            }, runs
+
+        except Exception as e:
+            logger.error(f"Error in run_with_tests: {e}", exc_info=True)
+            return {
+                "success": False,
+                "output": "",
+                "error": f"Test execution error: {str(e)}",
+                "exit_code": -1,
+                "execution_time": "error",
+                "test_results": [],
+                "tests_passed": 0,
+                "tests_failed": len(test_cases)
+            }, runs
+
+    def _test_impact(self, base_code: str, language: str, deterministic: Optional[bool]):
+        """Dependency analysis for reusing test results, or None if results mustn't be reused"""
+        if self.test_results is None or deterministic is False:
+            return None
+        if deterministic is None and not looks_deterministic(normalize_source(base_code, language), language):
+            return None
+        return test_impact.analyze(base_code, language)
+
+    def _reusable_results(self, impact, tests: list) -> dict:
+        """Earlier results (index -> TestResult) for tests nothing they reach has changed for"""
+        from pyd_models.schemas import TestResult
+
+        if impact is None:
+            return {}
+        reused = {}
+        for index, test_case in tests:
+            if str(test_case.get('expected_output', '')).strip().startswith('MAXMS:'):
+                continue  # Timing assertions always run
+            cached = self.test_results.get(impact.test_key(test_case))
+            if cached is not None:
+                reused[index] = TestResult(**dict(cached, cached=True))
+        self.test_results.count("hit", len(reused))
+        self.test_results.count("miss", len(tests) - len(reused))
+        return reused
+
+    def _remember_results(self, impact, tests: list, test_results: list, records: dict, run_results: dict):
+        """Keep test results that came from a completed, non-transient run for later reuse"""
+        for index, test_case in tests:
+            if index not in records or is_transient(run_results[index]):
+                continue
+            if str(test_case.get('expected_output', '')).strip().startswith('MAXMS:'):
+                continue
+            self.test_results.put(impact.test_key(test_case), test_results[index].model_dump())
+
+    def _is_clean_batch(self, result: dict, records: dict, tests: list) -> bool:
+        """True if a harness batch exited normally and reported every test"""
+        return result.get('exit_code') == 0 and all(index in records for index, _ in tests)
+
+    def _is_compile_failure(self, result: dict, language: str) -> bool:
+        """True if a plain run failed before the program started"""
+        if result.get('compile_error'):
+            return True
+        # Interpreted languages report syntax errors at startup, before any output
+        return (language.lower() in ('javascript', 'js', 'python')
+                and result.get('exit_code') not in (0, -1)
+                and not result.get('output')
+                and 'SyntaxError' in (result.get('error') or ''))
+
+    def _skipped_result(self, test_cases: list, diagnostic: str) -> Dict[str, Any]:
+        """Result for code that doesn't compile: every test skipped with the shared diagnostic"""
+        from pyd_models.schemas import TestResult
+
+        test_results = [
+            TestResult(
+                test_name=test_case.get('test_name', 'Unknown Test'),
+                function_name=test_case.get('function_name', ''),
+                passed=False,
+                skipped=True,
+                input_data=test_case.get('input_data', ''),
+                expected_output=test_case.get('expected_output', '').strip(),
+                actual_output='',
+                error=diagnostic
+            )
+            for test_case in test_cases
+        ]
+        return {
+            "success": False,
+            "output": "",
+            "error": diagnostic,
+            "exit_code": 1,
+            "execution_time": "0.00s",
+            "test_results": test_results,
+            "tests_passed": 0,
+            "tests_failed": 0,
+            "tests_skipped": len(test_cases)
+        }
+
+    async def _run_harness(self, base_code: str, language: str, tests: list):
+        """Run tests through the structured harness; returns (records by index, run result)"""
+        nonce = test_harness.new_nonce()
+        runner = test_harness.build_runner(language, base_code, tests, nonce)
+        result = await self._execute(base_code, language, stdin="", harness=runner)
+        records, residual = test_harness.parse_records(result.get('output', ''), nonce)
+        result = dict(result, output=residual)
+        return records, result
+
+    def _harness_test_result(self, test_case: dict, record: Optional[dict], run_result: dict):
+        from pyd_models.schemas import TestResult
+
+        expected_output = test_case.get('expected_output', '').strip()
+        if record is None:
+            # The test never reported: compile error, crash or timeout
+            return TestResult(
+                test_name=test_case.get('test_name', 'Unknown Test'),
+                function_name=test_case.get('function_name', ''),
+                passed=False,
+                input_data=test_case.get('input_data', ''),
+                expected_output=expected_output,
+                actual_output=run_result.get('output', '').strip(),
+                error=run_result.get('error') or "Test did not complete"
+            )
+
+        wall_time_ms = record.get('duration_ms')
+        matched = None
+        if record.get('ok'):
+            matched = next((output for output in test_harness.candidate_outputs(record)
+                            if self._check_output_match(output, expected_output, wall_time_ms)), None)
+        actual_output = matched if matched is not None else test_harness.actual_output(record)
+        return TestResult(
+            test_name=test_case.get('test_name', 'Unknown Test'),
+            function_name=test_case.get('function_name', ''),
+            passed=matched is not None,
+            input_data=test_case.get('input_data', ''),
+            expected_output=expected_output,
+            actual_output=actual_output,
+            error=record.get('exception') if not record.get('ok') else None,
+            wall_time_ms=wall_time_ms,
+            cpu_time_ms=record.get('cpu_ms'),
+            peak_memory_kb=record.get('peak_kb')
+        )
+
+    def _legacy_test_result(self, test_case: dict, result: dict):
+        """Compare a whole-program run's full stdout with the expected output"""
+        from pyd_models.schemas import TestResult
+
+        expected_output = test_case.get('expected_output', '').strip()
+
+        # Get actual output and clean it
+        actual_output = result.get('output', '').strip()
+
+        # Check if test passed (compare outputs with special pattern matching)
+        passed = self._check_output_match(actual_output, expected_output, result.get('wall_time_ms'))
+
+        return TestResult(
+            test_name=test_case.get('test_name', 'Unknown Test'),
+            function_name=test_case.get('function_name', ''),  # Add function name
+            passed=passed,
+            input_data=test_case.get('input_data', ''),
+            expected_output=expected_output,
+            actual_output=actual_output,
+            error=result.get('error') if result.get('error') else None,
+            wall_time_ms=result.get('wall_time_ms'),
+            cpu_time_ms=result.get('cpu_time_ms'),
+            peak_memory_kb=result.get('peak_memory_kb')
+        )
+
+    def _legacy_error_result(self, test_case: dict, error: Exception):
+        from pyd_models.schemas import TestResult
+
+        test_name = test_case.get('test_name', 'Unknown Test')
+        logger.error(f"Error running test case '{test_name}': {error}")
+        return TestResult(
+            test_name=test_name,
+            function_name=test_case.get('function_name') or 'Unknown',  # Add function name
+            passed=False,
+            input_data=test_case.get('input_data', ''),
+            expected_output=test_case.get('expected_output', ''),
+            actual_output='',
+            error=f"Test execution error: {str(error)}"
+        )
+
+    def _build_legacy_test(self, base_code: str, language: str, function_name: str, input_data: str):
+        """
+        Whole-program test code for tests the structured harness can't run
+        (integration/main tests, C# programs with their own Main, other
+        languages). Returns (test_code, harness) for run_code.
+        """
+        harness = None
+        if language.lower() == 'python':
+            test_code = f"{base_code}\n\n# Test execution\nresult = {function_name}({input_data})\nprint(result)"
+        elif language.lower() in ['javascript', 'js']:
+            test_code = f"{base_code}\n\n// Test execution\nconst result = {function_name}({input_data});\nconsole.log(result);"
+        elif language.lower() in ['csharp', 'c#', 'cs']:
+            # For C#, check if code already has Main method
+            has_main = 'static void Main' in base_code or 'static async Task Main' in base_code
+
+            if function_name.lower() == 'main' and has_main:
+                # Integration test - code already has Main, just run it
+                test_code = base_code
+            elif function_name.lower() == 'main' and not has_main:
+                # Need to add Main method to call the function
+                test_code = f"""{base_code}
 
 // Test execution
 class TestRunner {{
@@ -333,31 +757,31 @@ class TestRunner {{
         {function_name}({input_data});
     }}
 }}"""
-                        elif '.' in function_name:
-                            # Method test with namespace/class qualification (e.g., Namespace.ClassName.MethodName or ClassName.MethodName)
-                            parts = function_name.split('.')
-
-                            if len(parts) == 3:
-                                # Namespace.ClassName.MethodName format
-                                namespace_name, class_name, method_name = parts
-                                full_class_name = f"{namespace_name}.{class_name}"
-                            elif len(parts) == 2:
-                                # ClassName.MethodName format
-                                class_name, method_name = parts
-                                full_class_name = class_name
-                            else:
-                                # Fallback for unexpected format
-                                full_class_name = parts[0]
-                                method_name = parts[-1]
-
-                            if has_main:
-                                # Code has Main, need to call method from outside the namespace
-                                # Remove the existing Main and add test Main outside namespace
-                                # This is complex, so for integration tests just run the code
-                                test_code = base_code
-                            else:
-                                # No Main exists, add TestRunner outside the namespace
-                                test_code = f"""{base_code}
+            elif '.' in function_name:
+                # Method test with namespace/class qualification (e.g., Namespace.ClassName.MethodName or ClassName.MethodName)
+                parts = function_name.split('.')
+
+                if len(parts) == 3:
+                    # Namespace.ClassName.MethodName format
+                    namespace_name, class_name, method_name = parts
+                    full_class_name = f"{namespace_name}.{class_name}"
+                elif len(parts) == 2:
+                    # ClassName.MethodName format
+                    class_name, method_name = parts
+                    full_class_name = class_name
+                else:
+                    # Fallback for unexpected format
+                    full_class_name = parts[0]
+                    method_name = parts[-1]
+
+                if has_main:
+                    # Code has Main, need to call method from outside the namespace
+                    # Remove the existing Main and add test Main outside namespace
+                    # This is complex, so for integration tests just run the code
+                    test_code = base_code
+                else:
+                    # No Main exists, add TestRunner outside the namespace
+                    test_code = f"""{base_code}
 
 // Test execution
 class TestRunner {{
@@ -367,14 +791,14 @@ class TestRunner {{
         Console.WriteLine(result);
     }}
 }}"""
-                        else:
-                            # Simple function name without dots
-                            if has_main:
-                                # Already has Main, just run it
-                                test_code = base_code
-                            else:
-                                # Add Main to call the function
-                                test_code = f"""{base_code}
+            else:
+                # Simple function name without dots
+                if has_main:
+                    # Already has Main, just run it
+                    test_code = base_code
+                else:
+                    # Add Main to call the function
+                    test_code = f"""{base_code}
 
 // Test execution
 class TestRunner {{
@@ -383,18 +807,18 @@ class TestRunner {{
         Console.WriteLine(result);
     }}
 }}"""
-                    elif language.lower() in ['java']:
-                        # For Java, handle integration tests vs function tests
-                        if function_name.lower() == 'main':
-                            # Integration test - run the whole program
-                            test_code = base_code
-                        else:
-                            # Function test
-                            if '.' in function_name:
-                                class_name, method_name = function_name.split('.', 1)
-                                test_code = f"""{base_code}
-
-// Test execution
+        elif language.lower() in ['java']:
+            # For Java, handle integration tests vs function tests
+            if function_name.lower() == 'main':
+                # Integration test - run the whole program
+                test_code = base_code
+            else:
+                # Function test: the TestRunner is passed as a separate harness
+                # so a local backend can compile it against cached student classes
+                test_code = base_code
+                if '.' in function_name:
+                    class_name, method_name = function_name.split('.', 1)
+                    harness = f"""// Test execution
 class TestRunner {{
     public static void main(String[] args) {{
         {class_name} instance = new {class_name}();
@@ -402,93 +826,27 @@ class TestRunner {{
         System.out.println(result);
     }}
 }}"""
-                            else:
-                                test_code = f"""{base_code}
-
-// Test execution
+                else:
+                    harness = f"""// Test execution
 class TestRunner {{
     public static void main(String[] args) {{
         var result = {function_name}({input_data});
         System.out.println(result);
     }}
 }}"""
-                    else:
-                        # For other languages, try a generic approach
-                        test_code = f"{base_code}\n\n{function_name}({input_data});"
-
-                    # Run the test
-                    result = self.run_code(test_code, language, stdin="")
-
-                    # Get actual output and clean it
-                    actual_output = result.get('output', '').strip()
-
-                    # Check if test passed (compare outputs with special pattern matching)
-                    passed = self._check_output_match(actual_output, expected_output)
-
-                    if passed:
-                        tests_passed += 1
-                    else:
-                        tests_failed += 1
-
-                    # Create test result
-                    test_result = TestResult(
-                        test_name=test_name,
-                        function_name=function_name,  # Add function name
-                        passed=passed,
-                        input_data=input_data,
-                        expected_output=expected_output,
-                        actual_output=actual_output,
-                        error=result.get('error') if result.get('error') else None
-                    )
-                    test_results.append(test_result)
-
-                except Exception as e:
-                    logger.error(f"Error running test case '{test_name}': {e}")
-                    test_results.append(TestResult(
-                        test_name=test_case.get('test_name', 'Unknown Test'),
-                        function_name=test_case.get('function_name', 'Unknown'),  # Add function name
-                        passed=False,
-                        input_data=test_case.get('input_data', ''),
-                        expected_output=test_case.get('expected_output', ''),
-                        actual_output='',
-                        error=f"Test execution error: {str(e)}"
-                    ))
-                    tests_failed += 1
-
-            # Also run the code normally to get any compilation/syntax errors
-            normal_result = self.run_code(base_code, language, stdin="")
-
-            return {
-                "success": tests_passed > 0 and tests_failed == 0,
-                "output": normal_result.get('output', ''),
-                "error": normal_result.get('error', ''),
-                "exit_code": normal_result.get('exit_code', 0),
-                "execution_time": normal_result.get('execution_time', ''),
-                "test_results": test_results,
-                "tests_passed": tests_passed,
-                "tests_failed": tests_failed
-            }
+        else:
+            # For other languages, try a generic approach
+            test_code = f"{base_code}\n\n{function_name}({input_data});"
 
-        except Exception as e:
-            logger.error(f"Error in run_with_tests: {e}", exc_info=True)
-            return {
-                "success": False,
-                "output": "",
-                "error": f"Test execution error: {str(e)}",
-                "exit_code": -1,
-                "execution_time": "error",
-                "test_results": [],
-                "tests_passed": 0,
-                "tests_failed": len(test_cases)
-            }
+        return test_code, harness
 
-    def run_python(self, code: str, stdin: Optional[str] = None) -> Dict[str, Any]:
+    async def run_python(self, code: str, stdin: Optional[str] = None) -> Dict[str, Any]:
         """Run Python code"""
-        return self.run_code(code, "python", stdin)
+        return await self.run_code(code, "python", stdin)
     
-    def run_javascript(self, code: str, stdin: Optional[str] = None) -> Dict[str, Any]:
+    async def run_javascript(self, code: str, stdin: Optional[str] = None) -> Dict[str, Any]:
         """Run JavaScript code"""
-        return self.run_code(code, "javascript", stdin)
+        return await self.run_code(code, "javascript", stdin)
 
 
 # Singleton instance
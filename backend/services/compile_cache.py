@@ -0,0 +1,207 @@
+"""
+Compiled-artifact cache
+Keeps compiled class files and binaries on disk, keyed on a hash of
+(language, toolchain version, sources), so re-running unchanged code or
+running several tests against the same code never recompiles it.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from config import COMPILE_CACHE_DIR, COMPILE_CACHE_MAX_BYTES
+from utils.metrics import metrics
+from utils.storage import ensure_dir
+
+logger = logging.getLogger(__name__)
+
+
+def compile_cache_key(language: str, toolchain: str, sources: Dict[str, str], extra: str = '') -> str:
+    """Stable key for a compilation: language, toolchain version, sources and build inputs"""
+    digest = hashlib.sha256()
+    for part in (language, toolchain, extra):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    for filename in sorted(sources):
+        digest.update(filename.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(sources[filename].encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class CompileCache:
+    """
+    Size-bounded LRU of build directories.
+
+    Each entry is a directory cache_dir/<key> holding whatever the build
+    produced. Builds happen in a scratch directory that is renamed into place
+    only on success, so a half-written artifact is never served. Concurrent
+    requests for the same key wait for the first build instead of compiling
+    twice. Artifacts handed out with pin=True are not evicted until
+    release() - a program may still be running from them.
+    """
+
+    def __init__(self, cache_dir: str = COMPILE_CACHE_DIR, max_bytes: int = COMPILE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        # key -> size_bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._pins: Dict[str, int] = {}  # key -> runs currently using the artifact
+
+        # Not listable by the sandbox user, but artifacts stay reachable by path
+        ensure_dir(self.cache_dir, 0o711)
+        self._load_index()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _load_index(self):
+        """Rebuild the LRU index from directories on disk (oldest access first)"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                # Leftover scratch dirs from a crashed build
+                if name.startswith('.build-'):
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            entries.append((os.stat(path).st_mtime, name, _dir_size(path)))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+        if entries:
+            logger.info(f"Compile cache loaded {len(entries)} artifacts from {self.cache_dir}")
+        self._evict()
+
+    def get(self, key: str, pin: bool = False) -> Optional[str]:
+        """Return the artifact directory for key, or None"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            path = self._path_for(key)
+            if not os.path.isdir(path):
+                self._forget(key)
+                return None
+            self._entries.move_to_end(key)
+            if pin:
+                self._pin(key)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return path
+
+    def release(self, paths):
+        """Unpin artifact directories returned with pin=True"""
+        with self._lock:
+            for path in paths:
+                key = os.path.basename(path)
+                count = self._pins.get(key, 0) - 1
+                if count > 0:
+                    self._pins[key] = count
+                else:
+                    self._pins.pop(key, None)
+            self._evict()
+
+    def get_or_build(self, key: str, build: Callable[[str], Optional[str]], language: str = '',
+                     pin: bool = False):
+        """
+        Return (artifact_dir, error). On a miss, build(scratch_dir) compiles
+        into scratch_dir and returns None on success or the compiler's error
+        text. Failed builds are not cached. With pin=True the artifact stays
+        on disk until release([artifact_dir]).
+        """
+        path = self.get(key, pin=pin)
+        if path:
+            metrics.inc("scaffy_compile_cache_total", help_text="Compile cache lookups", language=language, result="hit")
+            return path, None
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            # Another request may have finished the same build while we waited
+            path = self.get(key, pin=pin)
+            if path:
+                metrics.inc("scaffy_compile_cache_total", language=language, result="hit")
+                return path, None
+
+            metrics.inc("scaffy_compile_cache_total", language=language, result="miss")
+            scratch = tempfile.mkdtemp(prefix='.build-', dir=self.cache_dir)
+            try:
+                error = build(scratch)
+                if error is not None:
+                    return None, error
+                size = _dir_size(scratch)
+                path = self._path_for(key)
+                try:
+                    os.replace(scratch, path)
+                except OSError:
+                    # Destination exists (built by another process); keep theirs
+                    shutil.rmtree(scratch, ignore_errors=True)
+                with self._lock:
+                    if key not in self._entries:
+                        self._entries[key] = size
+                        self._total_bytes += size
+                    self._entries.move_to_end(key)
+                    if pin:
+                        self._pin(key)
+                    self._evict(keep=key)
+                return path, None
+            finally:
+                if os.path.isdir(scratch):
+                    shutil.rmtree(scratch, ignore_errors=True)
+                with self._lock:
+                    self._build_locks.pop(key, None)
+
+    def _pin(self, key: str):
+        self._pins[key] = self._pins.get(key, 0) + 1
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self, keep: str = None):
+        # Least recently used first, skipping artifacts that are in use
+        candidates = [key for key in self._entries if key != keep and key not in self._pins]
+        for key in candidates:
+            if self._total_bytes <= self.max_bytes:
+                break
+            logger.debug(f"Evicting compiled artifact {key[:12]}")
+            self._forget(key)
+            shutil.rmtree(self._path_for(key), ignore_errors=True)
+
+
+# Singleton instance
+_compile_cache = None
+
+def get_compile_cache() -> CompileCache:
+    """Get or create the compiled-artifact cache"""
+    global _compile_cache
+    if _compile_cache is None:
+        _compile_cache = CompileCache()
+    return _compile_cache
@@ -0,0 +1,299 @@
+"""
+Warm interpreter pool for the local execution backend
+Keeps pre-started Python and Node.js workers (see services/workers/) so short
+test cases skip interpreter startup. Every worker runs exactly one job and is
+then killed and replaced in the background: code from different students
+never shares an interpreter, so nothing one run does to modules, globals or
+prototypes can reach the next. Workers run as the sandbox user under the
+same limits as a cold run.
+"""
+
+import json
+import logging
+import os
+import queue
+import re
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Any, Optional, List
+
+from config import (
+    LOCAL_EXECUTION_MEMORY_MB,
+    INTERPRETER_POOL_SIZE,
+    INTERPRETER_POOL_STARTUP_TIMEOUT
+)
+from services.sandbox import prepare_dir, sandbox_popen_args
+from utils.cancellation import Cancellation
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+WORKERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'workers')
+
+# Code that would behave differently in a worker than as its own `python
+# main.py` / `node main.js` (raw stdin streams, process exit hooks, modules -
+# the Node vm context has no require and only process.argv/env/exit) runs on
+# the cold path. This is about fidelity only; isolation comes from workers
+# being single-use
+POOL_UNSAFE = {
+    'python': re.compile(
+        r'\b(?:threading|multiprocessing|subprocess|asyncio|signal|ctypes|os\.fork|os\._exit|'
+        r'sys\.setrecursionlimit|sys\.modules|builtins|__builtins__|importlib|atexit|faulthandler)\b'
+    ),
+    'javascript': re.compile(
+        r'\b(?:process\.(?!(?:argv|env|exit)\b)|__dirname|__filename|readline|worker_threads|'
+        r'child_process|cluster|globalThis\.\w+\s*=|Object\.prototype|Array\.prototype|require\s*\(|import\b)'
+    ),
+}
+
+
+class _Worker:
+    def __init__(self, process: subprocess.Popen, request_fd: int, response_fd: int, workdir: str,
+                 max_message: int):
+        self.process = process
+        self.request_fd = request_fd
+        self.response_fd = response_fd
+        self.workdir = workdir
+        self.max_message = max_message
+        self._buffer = b''
+
+    def send(self, message: dict):
+        data = (json.dumps(message) + '\n').encode('utf-8')
+        view = memoryview(data)
+        while view:
+            written = os.write(self.request_fd, view)
+            view = view[written:]
+
+    def receive(self, timeout: float) -> Optional[dict]:
+        """Read one JSON line, or None on timeout, worker exit or an oversized message"""
+        deadline = time.monotonic() + timeout
+        while b'\n' not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([self.response_fd], [], [], remaining)
+            if not ready:
+                return None
+            chunk = os.read(self.response_fd, 65536)
+            if not chunk:
+                return None
+            self._buffer += chunk
+            if len(self._buffer) > self.max_message:
+                # The worker truncates output itself; student code writing to the pipe doesn't
+                return None
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def interrupt(self):
+        """Kill the worker's processes; safe from any thread (cleanup is left to kill())"""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def kill(self):
+        self.interrupt()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        for fd in (self.request_fd, self.response_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class InterpreterPool:
+    """Fixed-size pool of warm, single-use workers for one language"""
+
+    def __init__(self, language: str, command: List[str], size: int = INTERPRETER_POOL_SIZE,
+                 max_output: int = 10000):
+        self.language = language
+        self.command = command
+        self.size = size
+        self.max_output = max_output
+        self.healthy = True
+
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        for _ in range(size):
+            self._replace_in_background()
+
+    def _spawn(self) -> Optional[_Worker]:
+        request_read, request_write = os.pipe()
+        response_read, response_write = os.pipe()
+        workdir = tempfile.mkdtemp(prefix=f'scaffy-{self.language}-worker-')
+        env = {}
+        if self.language == 'javascript':
+            env['NODE_OPTIONS'] = f'--max-old-space-size={min(256, LOCAL_EXECUTION_MEMORY_MB)}'
+
+        try:
+            # Workers run as the sandbox user like a cold run (CPU is limited per job)
+            prepare_dir(workdir)
+            argv, kwargs = sandbox_popen_args(
+                self.command + [str(request_read), str(response_write), str(self.max_output)],
+                workdir, address_space=self.language == 'python', env=env
+            )
+            process = subprocess.Popen(
+                argv,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(request_read, response_write),
+                **kwargs
+            )
+        except OSError as e:
+            logger.warning(f"Could not start {self.language} pool worker: {e}")
+            for fd in (request_read, request_write, response_read, response_write):
+                os.close(fd)
+            shutil.rmtree(workdir, ignore_errors=True)
+            return None
+
+        os.close(request_read)
+        os.close(response_write)
+        # Output and error are at most max_output characters each; \uXXXX escapes
+        # of surrogate pairs take 12 bytes per character at worst
+        worker = _Worker(process, request_write, response_read, workdir,
+                         max_message=2 * 12 * self.max_output + 64 * 1024)
+        ready = worker.receive(INTERPRETER_POOL_STARTUP_TIMEOUT)
+        if not ready or not ready.get('ready'):
+            logger.warning(f"{self.language} pool worker failed to start")
+            worker.kill()
+            return None
+        return worker
+
+    def _replace_in_background(self, retired: Optional[_Worker] = None):
+        def start():
+            if retired is not None:
+                retired.kill()
+            worker = self._spawn()
+            self.healthy = worker is not None
+            if worker is not None:
+                self._idle.put(worker)
+        threading.Thread(target=start, name=f'{self.language}-pool-spawn', daemon=True).start()
+
+    def run(self, code: str, stdin: str, timeout: int,
+            cancellation: Optional[Cancellation] = None) -> Optional[Dict[str, Any]]:
+        """
+        Run code on a warm worker. Returns the CodeRunner result dict, or None
+        if no worker was available (the caller falls back to a cold run).
+        Cancelling kills the worker; it is replaced like a crashed one.
+        """
+        try:
+            worker = self._idle.get(timeout=1.0)
+        except queue.Empty:
+            metrics.inc("scaffy_interpreter_pool_total", help_text="Interpreter pool runs",
+                        language=self.language, result="unavailable")
+            return None
+
+        job_lock, job_active = threading.Lock(), [True]
+
+        def abort():
+            # Only while this job runs: afterwards the worker may serve another one
+            with job_lock:
+                if job_active[0]:
+                    worker.interrupt()
+
+        if cancellation is not None:
+            cancellation.on_cancel(abort)
+        try:
+            worker.send({'code': code, 'stdin': stdin or '', 'timeout': timeout})
+            result = worker.receive(timeout + 1)
+        except (OSError, ValueError) as e:
+            logger.warning(f"{self.language} pool worker failed: {e}")
+            result = None
+        with job_lock:
+            job_active[0] = False
+
+        if result is None and cancellation is not None and cancellation.cancelled:
+            worker.kill()
+            self._replace_in_background()
+            metrics.inc("scaffy_interpreter_pool_total", language=self.language, result="cancelled")
+            return {
+                "success": False,
+                "output": "",
+                "error": "Execution cancelled",
+                "exit_code": -1,
+                "execution_time": "cancelled"
+            }
+
+        if result is None:
+            try:
+                worker.process.wait(timeout=0.05)
+            except subprocess.TimeoutExpired:
+                pass
+            timed_out = worker.process.returncode in (None, 124, -signal.SIGXCPU, -signal.SIGKILL)
+            worker.kill()
+            self._replace_in_background()
+            if timed_out:
+                metrics.inc("scaffy_interpreter_pool_total", language=self.language, result="timeout")
+                return {
+                    "success": False,
+                    "output": "",
+                    "error": f"Execution timed out after {timeout} seconds. Your code might have an infinite loop.",
+                    "exit_code": -1,
+                    "execution_time": f"> {timeout}s"
+                }
+            # Crashed (e.g. out of memory): report it like a process that died
+            metrics.inc("scaffy_interpreter_pool_total", language=self.language, result="crash")
+            return {
+                "success": False,
+                "output": "",
+                "error": f"Process exited unexpectedly (code {worker.process.returncode})",
+                "exit_code": worker.process.returncode if worker.process.returncode is not None else -1,
+                "execution_time": "error"
+            }
+
+        # Single use: the worker exits after replying; kill() also takes down
+        # anything the job left running in its session
+        self._replace_in_background(retired=worker)
+
+        metrics.inc("scaffy_interpreter_pool_total", language=self.language, result="ok")
+        return {
+            "success": result['exit_code'] == 0 and not result['error'],
+            "output": result['output'],
+            "error": result['error'],
+            "exit_code": result['exit_code'],
+            "execution_time": f"{result['elapsed']:.2f}s",
+            "wall_time_ms": result['elapsed'] * 1000,
+            "cpu_time_ms": result.get('cpu_ms')
+        }
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+
+def is_poolable(code: str, language: str) -> bool:
+    """True if code runs the same in a warm worker as in its own process"""
+    pattern = POOL_UNSAFE.get(language)
+    return pattern is not None and not pattern.search(code)
+
+
+# Singleton pools, one per language, created on first use
+_pools: Dict[str, Optional[InterpreterPool]] = {}
+_pools_lock = threading.Lock()
+
+def get_interpreter_pool(language: str) -> Optional[InterpreterPool]:
+    """Get or create the warm pool for 'python' or 'javascript' (None if unsupported)"""
+    with _pools_lock:
+        if language not in _pools:
+            if language == 'python':
+                command = [sys.executable, '-I', os.path.join(WORKERS_DIR, 'python_worker.py')]
+            elif language == 'javascript' and shutil.which('node'):
+                command = ['node', os.path.join(WORKERS_DIR, 'node_worker.js')]
+            else:
+                _pools[language] = None
+                return None
+            _pools[language] = InterpreterPool(language, command)
+        return _pools[language]
@@ -0,0 +1,113 @@
+"""
+Background job runner
+Runs /jobs/* generations on a bounded thread pool (the agents make blocking
+SDK calls) and records their progress, partial results and outcome in the
+job store. A request identical to one already queued, running or recently
+finished attaches to that job instead of paying for the generation again.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import JOB_MAX_WORKERS, JOB_MAX_PENDING
+from services.job_store import JobStore, get_job_store
+from utils.metrics import metrics
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are already queued or running"""
+
+
+def _jsonable(value: Any) -> Any:
+    """Pydantic models (or lists and dicts of them) as plain JSON-compatible data"""
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(mode='json')
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    return value
+
+
+def fingerprint(kind: str, payload: Dict[str, Any]) -> str:
+    """Identity of a job request: its kind and canonical JSON body"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f"{kind}\0{canonical}".encode('utf-8')).hexdigest()
+
+
+class JobRunner:
+    def __init__(self, store: Optional[JobStore] = None,
+                 max_workers: int = JOB_MAX_WORKERS, max_pending: int = JOB_MAX_PENDING):
+        self.store = store or get_job_store()
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scaffy-job")
+
+    def submit(self, kind: str, payload: Dict[str, Any], work: Callable) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue work as a job, or attach to the existing job for the same request.
+
+        work(report) runs on a worker thread and returns the result (a pydantic
+        model or dict); report(key, value, completed, total) records a partial
+        result. Errors carrying status_code/detail (HTTPException) keep them.
+        Returns (job, created); raises JobQueueFull if the pool is saturated.
+        """
+        job, created = self.store.create(kind, fingerprint(kind, payload), max_active=self.max_pending)
+        if job is None:
+            metrics.inc("scaffy_jobs_total", help_text="Background jobs by outcome", kind=kind, status="rejected")
+            raise JobQueueFull(f"{self.max_pending} jobs are already queued or running")
+        if not created:
+            logger.info("Attached to existing %s job %s (%s)", kind, job['job_id'], job['status'])
+            metrics.inc("scaffy_jobs_total", help_text="Background jobs by outcome", kind=kind, status="deduplicated")
+            return job, False
+
+        logger.info("Queued %s job %s", kind, job['job_id'])
+        # Carry the request id and trace into the worker thread's logs and spans
+        context = contextvars.copy_context()
+        self._executor.submit(context.run, self._run, job['job_id'], kind, work)
+        return job, True
+
+    def shutdown(self):
+        """Stop taking jobs; queued ones are dropped and show as failed to the next process"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job_id: str, kind: str, work: Callable):
+        self.store.update(job_id, status='running')
+
+        def report(key: str, value: Any, completed: int, total: int):
+            self.store.add_partial(job_id, key, _jsonable(value), completed, total)
+
+        with span("job.run", kind=kind, job_id=job_id) as job_span:
+            try:
+                result = _jsonable(work(report))
+            except Exception as e:
+                status_code = getattr(e, 'status_code', 500)
+                error = getattr(e, 'detail', None) or str(e)
+                logger.error(f"{kind} job {job_id} failed: {error}", exc_info=status_code >= 500)
+                self.store.update(job_id, status='failed', error=error, status_code=status_code)
+                job_span.set_attribute("job.status", "failed")
+                metrics.inc("scaffy_jobs_total", help_text="Background jobs by outcome", kind=kind, status="failed")
+                return
+
+            # The result supersedes the partial pieces
+            self.store.update(job_id, status='succeeded', result=result, partial={}, status_code=200)
+            job_span.set_attribute("job.status", "succeeded")
+            metrics.inc("scaffy_jobs_total", help_text="Background jobs by outcome", kind=kind, status="succeeded")
+            logger.info("%s job %s succeeded", kind, job_id)
+
+
+# Singleton instance
+_job_runner = None
+
+def get_job_runner() -> JobRunner:
+    """Get or create the background job runner"""
+    global _job_runner
+    if _job_runner is None:
+        _job_runner = JobRunner()
+    return _job_runner
@@ -0,0 +1,222 @@
+"""
+Background job store
+Keeps the state of /jobs/* generations - status, partial per-file results,
+the final result or error - in memory while they run and in SQLite once
+created, so jobs can be polled by id, repeats of a request attach to the
+existing job, and finished results survive a restart.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from config import JOB_DB_PATH, JOB_TTL_SECONDS
+from utils.serialization import dumps, loads
+from utils.storage import ensure_parent, open_private
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    # Our own pid in an old record means it was reused after a restart
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists but belongs to another user
+    return True
+
+
+class JobStore:
+    """
+    Job records keyed by id, with a fingerprint index for deduplication.
+
+    Queued and running jobs live in memory (partial results are updated
+    often); every change is also written to SQLite, where other server
+    processes can read it. Finished jobs are read back from SQLite, or kept
+    in memory until they expire if they couldn't be written.
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        try:
+            self._db = self._open(db_path)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Job database unavailable, using memory only: {e}")
+            self._db = None
+
+    def _open(self, db_path: str) -> sqlite3.Connection:
+        # SQLite gives its -wal/-shm files the database file's permissions
+        ensure_parent(db_path)
+        os.close(open_private(db_path, os.O_RDWR | os.O_CREAT))
+        db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+            "status TEXT NOT NULL, updated_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_by_fingerprint ON jobs (fingerprint, updated_at)")
+        db.execute("DELETE FROM jobs WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+
+        # Jobs that were queued or running in a process that has since stopped
+        # will never finish (other live workers' jobs are left alone)
+        interrupted = [
+            job for job in (loads(data) for (data,) in db.execute(
+                "SELECT data FROM jobs WHERE status IN (?, ?)", ACTIVE_STATUSES
+            ))
+            if not _process_alive(job.get('owner_pid'))
+        ]
+        for job in interrupted:
+            job.update(status='failed', status_code=503, updated_at=time.time(),
+                       error="The server restarted before this job finished. Please try again.")
+            self._write(job, db)
+        if interrupted:
+            logger.info(f"Marked {len(interrupted)} interrupted jobs as failed")
+        return db
+
+    def _write(self, job: Dict[str, Any], db: Optional[sqlite3.Connection] = None) -> bool:
+        db = db or self._db
+        if db is None:
+            return False
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, kind, fingerprint, status, updated_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job['job_id'], job['kind'], job['fingerprint'], job['status'], job['updated_at'], dumps(job).decode('utf-8'))
+            )
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist job {job['job_id']}: {e}")
+            return False
+
+    def _read(self, sql: str, params: tuple) -> Optional[Dict[str, Any]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(sql, params).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read job: {e}")
+            return None
+        return loads(row[0]) if row else None
+
+    def _expired(self, job: Dict[str, Any]) -> bool:
+        return job['status'] not in ACTIVE_STATUSES and time.time() - job['updated_at'] > self.ttl_seconds
+
+    def _copy(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        # partial is mutated by the worker while requests read it
+        return dict(job, partial=dict(job['partial']))
+
+    def _prune(self):
+        for job_id in [job_id for job_id, job in self._jobs.items() if self._expired(job)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the job, or None if it doesn't exist or has expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._read("SELECT data FROM jobs WHERE job_id = ?", (job_id,))
+            if job is None or self._expired(job):
+                return None
+            return self._copy(job)
+
+    def find(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """The newest unexpired job for fingerprint that hasn't failed, or None"""
+        with self._lock:
+            return self._find(fingerprint)
+
+    def _find(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        matches = [job for job in self._jobs.values() if job['fingerprint'] == fingerprint and job['status'] != 'failed']
+        if matches:
+            job = max(matches, key=lambda job: job['created_at'])
+        else:
+            job = self._read(
+                "SELECT data FROM jobs WHERE fingerprint = ? AND status != 'failed' "
+                "ORDER BY updated_at DESC LIMIT 1", (fingerprint,)
+            )
+        if job is None or self._expired(job):
+            return None
+        return self._copy(job)
+
+    def create(self, kind: str, fingerprint: str, max_active: Optional[int] = None) -> tuple:
+        """
+        Create a queued job, or attach to the existing one for fingerprint.
+
+        Returns (job, created). Returns (None, False) if max_active jobs are
+        already queued or running.
+        """
+        with self._lock:
+            existing = self._find(fingerprint)
+            if existing is not None:
+                return existing, False
+
+            self._prune()
+            if max_active is not None and \
+                    sum(1 for job in self._jobs.values() if job['status'] in ACTIVE_STATUSES) >= max_active:
+                return None, False
+
+            now = time.time()
+            job = {
+                'job_id': uuid.uuid4().hex,
+                'kind': kind,
+                'fingerprint': fingerprint,
+                'status': 'queued',
+                'result': None,
+                'partial': {},
+                'completed': 0,
+                'total': 0,
+                'error': None,
+                'status_code': None,
+                'owner_pid': os.getpid(),
+                'created_at': now,
+                'updated_at': now,
+            }
+            self._jobs[job['job_id']] = job
+            self._write(job)
+            return self._copy(job), True
+
+    def update(self, job_id: str, **fields):
+        """Set fields on an in-flight job; a finished job is written out and, with a database, dropped from memory"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields, updated_at=time.time())
+            if self._write(job) and job['status'] not in ACTIVE_STATUSES:
+                del self._jobs[job_id]
+
+    def add_partial(self, job_id: str, key: str, value: Any, completed: int, total: int):
+        """Record one piece of a running job's result (e.g. one file) and its progress"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['partial'][key] = value
+            job.update(completed=completed, total=total, updated_at=time.time())
+            self._write(job)
+
+
+# Singleton instance
+_job_store = None
+
+def get_job_store() -> JobStore:
+    """Get or create the job store"""
+    global _job_store
+    if _job_store is None:
+        _job_store = JobStore()
+    return _job_store
@@ -0,0 +1,434 @@
+"""
+Local code execution backend
+Compiles and runs student code on this host instead of Piston. Compiled
+artifacts go through the compile cache, so unchanged code is never rebuilt.
+Compilers and programs run as the unprivileged sandbox user (see
+services/sandbox.py). Meant to run inside a container; enable with
+CODE_EXECUTION_BACKEND=local.
+"""
+
+import logging
+import os
+import re
+import selectors
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List
+
+from config import (
+    LOCAL_EXECUTION_MAX_CONCURRENT_RUNS,
+    COMPILE_TIMEOUT,
+    INTERPRETER_POOL_ENABLED
+)
+from services.compile_cache import get_compile_cache, compile_cache_key
+from services.interpreter_pool import get_interpreter_pool, is_poolable
+from services.sandbox import prepare_dir, sandbox_available, sandbox_popen_args, seal_dir
+from utils.cancellation import Cancellation, run_cancellable
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Canonical language name for every alias CodeRunner accepts
+LANGUAGE_ALIASES = {
+    'python': 'python', 'python3': 'python',
+    'javascript': 'javascript', 'js': 'javascript',
+    'java': 'java',
+    'csharp': 'csharp', 'c#': 'csharp', 'cs': 'csharp',
+    'c': 'c',
+    'c++': 'cpp', 'cpp': 'cpp',
+}
+
+# Command whose first output line identifies each toolchain (part of the cache key)
+TOOLCHAIN_PROBES = {
+    'javascript': ['node', '--version'],
+    'java': ['javac', '-version'],
+    'csharp': ['mcs', '--version'],
+    'c': ['gcc', '--version'],
+    'cpp': ['g++', '--version'],
+}
+
+# Runtimes that reserve large virtual address ranges up front and break under
+# RLIMIT_AS; they get a heap cap on the command line instead
+NO_ADDRESS_LIMIT = {'java', 'csharp', 'javascript'}
+
+JAVA_PACKAGE_RE = re.compile(r'^\s*package\s+([\w.]+)\s*;', re.MULTILINE)
+JAVA_PUBLIC_CLASS_RE = re.compile(r'^\s*public\s+(?:(?:final|abstract)\s+)*(?:class|interface|enum|record)\s+(\w+)', re.MULTILINE)
+JAVA_CLASS_RE = re.compile(r'\b(?:class|interface|enum|record)\s+(\w+)')
+JAVA_MAIN_RE = re.compile(r'\bstatic\s+void\s+main\s*\(')
+
+# Output kept per stream while a program runs (results show the first
+# 10,000 characters); a program printing more than this is stopped
+MAX_OUTPUT_BYTES = 64 * 1024
+
+
+class _AccountedPopen(subprocess.Popen):
+    """Popen that reaps the child with wait4() to keep its CPU usage"""
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        try:
+            pid, status, usage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return self.pid, 0
+        if pid:
+            self.rusage = usage
+        return pid, status
+
+
+def _kill_group(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _feed_stdin(stream, data: bytes):
+    try:
+        if data:
+            stream.write(data)
+    except (BrokenPipeError, OSError):
+        pass  # The program exited (or closed stdin) without reading it all
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+def _collect_output(process: subprocess.Popen, timeout: float, max_bytes: int) -> tuple:
+    """
+    Read stdout and stderr until the process closes both, keeping the server's
+    memory bounded: returns (stdout, stderr, overflowed) as soon as either
+    stream passes max_bytes. Raises TimeoutExpired at the deadline.
+    """
+    deadline = time.monotonic() + timeout
+    buffers = {process.stdout: bytearray(), process.stderr: bytearray()}
+    with selectors.DefaultSelector() as selector:
+        for stream in buffers:
+            selector.register(stream, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(process.args, timeout)
+            for key, _ in selector.select(remaining):
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+                buffer = buffers[key.fileobj]
+                buffer += chunk
+                if len(buffer) > max_bytes:
+                    return bytes(buffers[process.stdout]), bytes(buffers[process.stderr]), True
+    return bytes(buffers[process.stdout]), bytes(buffers[process.stderr]), False
+
+
+def _run_sandboxed(command: List[str], cwd: str, stdin: str, timeout: int, address_space: bool,
+                   cancellation: Optional[Cancellation] = None):
+    """
+    Run command as the sandbox user in its own process group; the whole group
+    is killed on timeout, on cancellation or once it has written more than
+    MAX_OUTPUT_BYTES to stdout or stderr. Returns (exit_code, stdout, stderr,
+    cpu_time_ms).
+    """
+    argv, kwargs = sandbox_popen_args(command, cwd, cpu_seconds=timeout, address_space=address_space)
+    process = _AccountedPopen(
+        argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs
+    )
+    if cancellation is not None:
+        # Once reaped, the pid could belong to someone else: only kill while running
+        cancellation.on_cancel(lambda: process.returncode is None and _kill_group(process.pid))
+    # A separate writer keeps a program that prints before reading stdin from deadlocking
+    threading.Thread(target=_feed_stdin, args=(process.stdin, stdin.encode('utf-8')), daemon=True).start()
+    try:
+        stdout, stderr, overflowed = _collect_output(process, timeout, MAX_OUTPUT_BYTES)
+    except subprocess.TimeoutExpired:
+        _kill_group(process.pid)
+        process.wait()
+        raise
+    finally:
+        for stream in (process.stdout, process.stderr):
+            stream.close()
+    if overflowed:
+        _kill_group(process.pid)
+    process.wait()
+
+    stdout = stdout.decode('utf-8', errors='replace')
+    stderr = stderr.decode('utf-8', errors='replace')
+    if overflowed:
+        stderr += f"\nOutput limit of {MAX_OUTPUT_BYTES // 1024}KB exceeded; the program was stopped."
+    usage = process.rusage
+    cpu_time_ms = (usage.ru_utime + usage.ru_stime) * 1000 if usage else None
+    return process.returncode, stdout, stderr, cpu_time_ms
+
+
+def _java_main_class(source: str) -> str:
+    """Fully qualified name of the class declaring main (or the public class)"""
+    package = JAVA_PACKAGE_RE.search(source)
+    prefix = f"{package.group(1)}." if package else ''
+    main = JAVA_MAIN_RE.search(source)
+    if main:
+        declared = [m for m in JAVA_CLASS_RE.finditer(source, 0, main.start())]
+        if declared:
+            return prefix + declared[-1].group(1)
+    public = JAVA_PUBLIC_CLASS_RE.search(source)
+    return prefix + (public.group(1) if public else 'Main')
+
+
+def _java_filename(source: str) -> str:
+    """javac requires a public top-level class to live in a file of the same name"""
+    public = JAVA_PUBLIC_CLASS_RE.search(source)
+    return f"{public.group(1)}.java" if public else 'Main.java'
+
+
+class LocalExecutor:
+    def __init__(self):
+        self.cache = get_compile_cache()
+        self.max_output_length = 10000
+        # Runs block on their process, so they get their own threads; the
+        # pool size caps how many sandboxed processes run at once
+        self._executor = ThreadPoolExecutor(
+            max_workers=LOCAL_EXECUTION_MAX_CONCURRENT_RUNS, thread_name_prefix='local-exec'
+        )
+        self._toolchains: Dict[str, Optional[str]] = {}
+        self._toolchain_lock = threading.Lock()
+
+    def canonical_language(self, language: str) -> Optional[str]:
+        return LANGUAGE_ALIASES.get(language.lower())
+
+    def toolchain_version(self, language: str) -> Optional[str]:
+        """Version string of the local toolchain, or None if it isn't installed"""
+        with self._toolchain_lock:
+            if language in self._toolchains:
+                return self._toolchains[language]
+
+            if not sandbox_available():
+                version = None
+            elif language == 'python':
+                version = f"python {sys.version.split()[0]}"
+            else:
+                version = None
+                probe = TOOLCHAIN_PROBES.get(language)
+                runtime = {'java': 'java', 'csharp': 'mono'}.get(language)
+                if probe and shutil.which(probe[0]) and (runtime is None or shutil.which(runtime)):
+                    try:
+                        completed = subprocess.run(probe, capture_output=True, text=True, timeout=10)
+                        lines = (completed.stdout or completed.stderr).strip().splitlines()
+                        version = lines[0] if lines else probe[0]
+                    except (OSError, subprocess.SubprocessError) as e:
+                        logger.warning(f"Could not probe {probe[0]}: {e}")
+
+            self._toolchains[language] = version
+            if version:
+                logger.info(f"Local toolchain for {language}: {version}")
+            else:
+                logger.info(f"No local toolchain for {language}; it will run on Piston")
+            return version
+
+    def supports(self, language: str) -> bool:
+        canonical = self.canonical_language(language)
+        return canonical is not None and self.toolchain_version(canonical) is not None
+
+    # ------------------------------------------------------------------
+    # Compilation (cached)
+    # ------------------------------------------------------------------
+
+    def _compile(self, language: str, sources: Dict[str, str], command: List[str],
+                 extra_key: str = '', pinned: Optional[List[str]] = None) -> tuple:
+        """
+        Compile sources with command (run in the build dir); returns
+        (artifact_dir, error). If pinned is a list, the artifact is pinned in
+        the cache and appended to it; the caller releases it after the run.
+        """
+        toolchain = self.toolchain_version(language)
+        key = compile_cache_key(language, toolchain, sources, extra_key + '\0' + ' '.join(command))
+
+        def build(build_dir: str) -> Optional[str]:
+            for filename, content in sources.items():
+                with open(os.path.join(build_dir, filename), 'w', encoding='utf-8') as f:
+                    f.write(content)
+            # Compilers run sandboxed too: source code can make them do a lot of work
+            prepare_dir(build_dir)
+            with span("compile", language=language):
+                try:
+                    exit_code, stdout, stderr, _ = _run_sandboxed(
+                        command, build_dir, "", COMPILE_TIMEOUT, language not in NO_ADDRESS_LIMIT
+                    )
+                except subprocess.TimeoutExpired:
+                    return f"Compilation timed out after {COMPILE_TIMEOUT} seconds"
+                finally:
+                    seal_dir(build_dir)
+            if exit_code != 0:
+                return (stderr or stdout or "Compilation failed")[:self.max_output_length]
+            return None
+
+        artifact, error = self.cache.get_or_build(key, build, language=language, pin=pinned is not None)
+        if artifact and pinned is not None:
+            pinned.append(artifact)
+        return artifact, error
+
+    def compile_java(self, code: str, pinned: Optional[List[str]] = None) -> tuple:
+        """Compile the student's Java classes (cached); returns (class_dir, error)"""
+        filename = _java_filename(code)
+        return self._compile('java', {filename: code}, ['javac', '-encoding', 'UTF-8', '-d', '.', filename],
+                             pinned=pinned)
+
+    def _prepare(self, code: str, language: str, harness: Optional[str], workdir: str, pinned: List[str]):
+        """
+        Return (command to run, error) for the given code, compiling if needed.
+        Artifacts the command runs from are pinned and added to pinned.
+        """
+        if language == 'python':
+            source = code if harness is None else f"{code}\n\n{harness}"
+            path = os.path.join(workdir, 'main.py')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(source)
+            return [sys.executable, '-I', path], None
+
+        if language == 'javascript':
+            source = code if harness is None else f"{code}\n\n{harness}"
+            path = os.path.join(workdir, 'main.js')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(source)
+            return ['node', '--max-old-space-size=256', path], None
+
+        if language in ('c', 'cpp'):
+            source = code if harness is None else f"{code}\n\n{harness}"
+            filename = 'main.c' if language == 'c' else 'main.cpp'
+            compiler = ['gcc', '-O1', '-o', 'program', filename, '-lm'] if language == 'c' \
+                else ['g++', '-O1', '-std=c++17', '-o', 'program', filename]
+            artifact, error = self._compile(language, {filename: source}, compiler, pinned=pinned)
+            if error:
+                return None, error
+            return [os.path.join(artifact, 'program')], None
+
+        if language == 'csharp':
+            # C# classes default to internal, so a separately compiled harness
+            # couldn't see them: key on the full source instead
+            source = code if harness is None else f"{code}\n\n{harness}"
+            artifact, error = self._compile(
+                language, {'Program.cs': source}, ['mcs', '-optimize+', '-out:program.exe', 'Program.cs'],
+                pinned=pinned
+            )
+            if error:
+                return None, error
+            return ['mono', os.path.join(artifact, 'program.exe')], None
+
+        if language == 'java':
+            # Student code and test harness compile separately: every test on
+            # the same code reuses the student's classes and only builds its
+            # small TestRunner against them
+            student_dir, error = self.compile_java(code, pinned=pinned)
+            if error:
+                return None, error
+            if harness is None:
+                return ['java', '-Xmx256m', '-cp', student_dir, _java_main_class(code)], None
+
+            harness_dir, error = self._compile(
+                language, {'TestRunner.java': harness},
+                ['javac', '-encoding', 'UTF-8', '-cp', student_dir, '-d', '.', 'TestRunner.java'],
+                extra_key=os.path.basename(student_dir), pinned=pinned
+            )
+            if error:
+                return None, error
+            classpath = os.pathsep.join([harness_dir, student_dir])
+            return ['java', '-Xmx256m', '-cp', classpath, 'TestRunner'], None
+
+        return None, f"Language '{language}' is not supported by the local backend"
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    async def run(self, code: str, language: str, stdin: str = "", timeout: int = 30,
+                  harness: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Compile (cached) and run code locally.
+
+        Cancelling the awaiting task kills the sandboxed process (or recycles
+        the pool worker running it).
+
+        Returns the same dict shape as CodeRunner.run_code.
+        """
+        return await run_cancellable(
+            self._executor, self._run_blocking, code, language, stdin=stdin, timeout=timeout, harness=harness
+        )
+
+    def _run_blocking(self, code: str, language: str, stdin: str, timeout: int,
+                      harness: Optional[str], cancellation: Cancellation) -> Dict[str, Any]:
+        canonical = self.canonical_language(language)
+
+        if INTERPRETER_POOL_ENABLED and canonical in ('python', 'javascript'):
+            source = code if harness is None else f"{code}\n\n{harness}"
+            pool = get_interpreter_pool(canonical)
+            if pool is not None and pool.healthy and is_poolable(source, canonical):
+                with span("local.execute", language=canonical, code_chars=len(source), pooled=True):
+                    result = pool.run(source, stdin, timeout, cancellation=cancellation)
+                if result is not None:
+                    return result
+
+        workdir = tempfile.mkdtemp(prefix='scaffy-run-')
+        pinned: List[str] = []
+        try:
+            prepare_dir(workdir)
+            with span("local.execute", language=canonical, code_chars=len(code)):
+                # Compilation isn't cancelled: the artifact is cached for the next run
+                command, compile_error = self._prepare(code, canonical, harness, workdir, pinned)
+                if compile_error:
+                    return {
+                        "success": False,
+                        "output": "",
+                        "error": compile_error,
+                        "exit_code": 1,
+                        "execution_time": "0.00s",
+                        "compile_error": True
+                    }
+
+                start = time.perf_counter()
+                try:
+                    exit_code, stdout, stderr, cpu_time_ms = _run_sandboxed(
+                        command, workdir, stdin or "", timeout, canonical not in NO_ADDRESS_LIMIT,
+                        cancellation=cancellation
+                    )
+                except subprocess.TimeoutExpired:
+                    return {
+                        "success": False,
+                        "output": "",
+                        "error": f"Execution timed out after {timeout} seconds. Your code might have an infinite loop.",
+                        "exit_code": -1,
+                        "execution_time": f"> {timeout}s"
+                    }
+                elapsed = time.perf_counter() - start
+
+            stdout = stdout[:self.max_output_length]
+            stderr = stderr[:self.max_output_length]
+            return {
+                "success": exit_code == 0 and not stderr,
+                "output": stdout,
+                "error": stderr,
+                "exit_code": exit_code,
+                "execution_time": f"{elapsed:.2f}s",
+                "wall_time_ms": elapsed * 1000,
+                # ru_maxrss would include the server's own memory (inherited
+                # through fork), so peak memory only comes from the test harness
+                "cpu_time_ms": cpu_time_ms
+            }
+        finally:
+            self.cache.release(pinned)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+# Singleton instance
+_local_executor = None
+
+def get_local_executor() -> LocalExecutor:
+    """Get or create the local execution backend"""
+    global _local_executor
+    if _local_executor is None:
+        _local_executor = LocalExecutor()
+    return _local_executor
@@ -0,0 +1,164 @@
+"""
+OCR fallback for image-only PDF pages
+Rasterizes pages that have no text layer and runs Tesseract on them locally
+in a bounded process pool.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Tuple
+
+from config import (
+    OCR_ENABLED,
+    OCR_MAX_WORKERS,
+    OCR_MAX_PAGES_PER_DOCUMENT,
+    OCR_DOCUMENT_TIMEOUT,
+    OCR_RESOLUTION,
+    OCR_LANGUAGE
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pytesseract
+except ImportError:  # pragma: no cover - optional dependency
+    pytesseract = None
+
+
+def _ocr_page(pdf_path: str, page_index: int, resolution: int, language: str) -> str:
+    """
+    Rasterize and OCR a single page. Runs inside a pool worker process, so it
+    reopens the PDF itself rather than receiving a pickled image.
+    """
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        image = pdf.pages[page_index].to_image(resolution=resolution).original
+    return pytesseract.image_to_string(image, lang=language)
+
+
+def _join_all(processes, timeout: float = 5.0):
+    for process in processes:
+        process.join(timeout)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+
+class OCRService:
+    def __init__(self):
+        self.max_workers = OCR_MAX_WORKERS
+        self.max_pages = OCR_MAX_PAGES_PER_DOCUMENT
+        self.timeout = OCR_DOCUMENT_TIMEOUT
+        self._pool = None
+        self.available = self._check_available()
+
+    def _check_available(self) -> bool:
+        if not OCR_ENABLED:
+            logger.info("OCR fallback disabled by configuration")
+            return False
+        if pytesseract is None:
+            logger.info("pytesseract not installed - OCR fallback unavailable")
+            return False
+        if not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+            logger.info("tesseract binary not found - OCR fallback unavailable")
+            return False
+        return True
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Spawned (not forked) workers so they don't inherit the server's threads
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _recycle_pool(self, pool: ProcessPoolExecutor) -> list:
+        """
+        Kill pool's workers and drop it. Cancelling a future does not stop a
+        page that is already running, so this is the only way to get the CPU
+        back once the deadline has passed. Returns the killed processes.
+        """
+        if self._pool is pool:
+            self._pool = None
+        # ProcessPoolExecutor has no public way to stop running work before Python 3.14
+        processes = list((pool._processes or {}).values())
+        for process in processes:
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        return processes
+
+    async def ocr_pages(self, pdf_path: str, page_indices: List[int]) -> Tuple[Dict[int, str], bool]:
+        """
+        OCR the given (0-based) pages of a PDF.
+
+        At most max_pages pages are processed. If the document deadline passes,
+        the worker pool is terminated and replaced; this only returns once the
+        workers have exited, so pdf_path must stay in place until then.
+
+        Returns:
+            (dict mapping page index to recognized text for the pages that
+            finished, whether every page ran to completion - False when the
+            deadline cut pages off or a worker crashed)
+        """
+        if not self.available or not page_indices:
+            return {}, True
+
+        if len(page_indices) > self.max_pages:
+            logger.warning(f"OCR capped at {self.max_pages} of {len(page_indices)} image-only pages")
+            page_indices = page_indices[:self.max_pages]
+
+        loop = asyncio.get_running_loop()
+        try:
+            pool = self._get_pool()
+            futures = {
+                loop.run_in_executor(pool, _ocr_page, pdf_path, index, OCR_RESOLUTION, OCR_LANGUAGE): index
+                for index in page_indices
+            }
+        except BrokenProcessPool:
+            self._pool = None
+            logger.error("OCR worker pool was broken, recreating on next request")
+            return {}, False
+
+        logger.info(f"Running OCR on {len(futures)} page(s)")
+        done, pending = await asyncio.wait(futures.keys(), timeout=self.timeout)
+        complete = not pending
+
+        if pending:
+            logger.warning(f"OCR deadline of {self.timeout}s reached, dropping {len(pending)} page(s)")
+            for future in pending:
+                future.cancel()
+            processes = self._recycle_pool(pool)
+            # Wait for the workers to exit: they hold pdf_path open
+            await loop.run_in_executor(None, _join_all, processes)
+
+        results = {}
+        for future in done:
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except BrokenProcessPool:
+                # Also seen by a concurrent document whose pool was recycled
+                if self._pool is pool:
+                    self._pool = None
+                complete = False
+                logger.error("OCR worker crashed, pool will be recreated")
+            except Exception as e:
+                logger.warning(f"OCR failed for page {index + 1}: {e}")
+        return results, complete
+
+
+# Singleton instance
+_ocr_service = None
+
+def get_ocr_service() -> OCRService:
+    """Get or create the OCR service"""
+    global _ocr_service
+    if _ocr_service is None:
+        _ocr_service = OCRService()
+    return _ocr_service
@@ -0,0 +1,174 @@
+"""
+PDF extraction cache
+Stores extraction results keyed on the SHA-256 of the uploaded bytes so the
+same handout uploaded by a whole class is only parsed once.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from config import (
+    PDF_CACHE_DIR,
+    PDF_CACHE_MAX_ENTRIES,
+    PDF_CACHE_MAX_BYTES,
+    PDF_CACHE_TTL_SECONDS
+)
+from utils.storage import ensure_dir, open_private
+
+logger = logging.getLogger(__name__)
+
+
+class PDFExtractionCache:
+    """
+    Size-bounded LRU cache with TTL and on-disk persistence.
+
+    Every entry lives in memory and as a JSON file in cache_dir, so cached
+    extractions survive restarts. The LRU index covers both: evicting an
+    entry removes it from memory and from disk.
+    """
+
+    def __init__(self, cache_dir: str = PDF_CACHE_DIR,
+                 max_entries: int = PDF_CACHE_MAX_ENTRIES,
+                 max_bytes: int = PDF_CACHE_MAX_BYTES,
+                 ttl_seconds: int = PDF_CACHE_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (created_at, size_bytes, result dict or None if only on disk)
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        try:
+            ensure_dir(self.cache_dir)
+            self._load_index()
+        except OSError as e:
+            logger.warning(f"PDF cache directory unavailable, using memory only: {e}")
+            self.cache_dir = None
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        """Rebuild the LRU index from files on disk (oldest access first)"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name[:-5], stat.st_size))
+
+        for _, key, size in sorted(files):
+            # created_at is read lazily from the file on first hit
+            self._entries[key] = [None, size, None]
+            self._total_bytes += size
+
+        if files:
+            logger.info(f"PDF cache loaded {len(files)} entries from {self.cache_dir}")
+        self._evict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached extraction result for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            created_at, size, result = entry
+            if result is None:
+                result, created_at = self._read_from_disk(key)
+                if result is None:
+                    self._remove(key)
+                    return None
+                entry[0] = created_at
+                entry[2] = result
+
+            if time.time() - created_at > self.ttl_seconds:
+                logger.debug(f"PDF cache entry expired: {key[:12]}")
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            if self.cache_dir:
+                try:
+                    os.utime(self._path_for(key))
+                except OSError:
+                    pass
+            return dict(result)
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store an extraction result under key"""
+        created_at = time.time()
+        payload = json.dumps({'created_at': created_at, 'result': result}).encode('utf-8')
+        size = len(payload)  # Bytes, as _load_index counts entries found on disk
+
+        if size > self.max_bytes:
+            logger.info(f"PDF extraction too large to cache ({size} bytes)")
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            if self.cache_dir:
+                try:
+                    tmp_path = self._path_for(key) + '.tmp'
+                    with os.fdopen(open_private(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC), 'wb') as f:
+                        f.write(payload)
+                    os.replace(tmp_path, self._path_for(key))
+                except OSError as e:
+                    logger.warning(f"Failed to persist PDF cache entry: {e}")
+
+            self._entries[key] = [created_at, size, dict(result)]
+            self._total_bytes += size
+            self._evict()
+
+    def _read_from_disk(self, key: str):
+        if not self.cache_dir:
+            return None, 0
+        try:
+            with open(self._path_for(key), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data['result'], data['created_at']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Unreadable PDF cache entry {key[:12]}: {e}")
+            return None, 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry[1]
+        if self.cache_dir:
+            try:
+                os.unlink(self._path_for(key))
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            logger.debug(f"Evicting PDF cache entry {key[:12]}")
+            self._remove(key)
+
+
+# Singleton instance
+_pdf_cache = None
+
+def get_pdf_cache() -> PDFExtractionCache:
+    """Get or create the PDF extraction cache"""
+    global _pdf_cache
+    if _pdf_cache is None:
+        _pdf_cache = PDFExtractionCache()
+    return _pdf_cache
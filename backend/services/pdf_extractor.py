@@ -1,21 +1,26 @@
 """
 PDF text extraction service
-Extracts text from PDF files using pdfplumber
+Extracts text from PDF files using pdfplumber, with an OCR fallback for
+pages that have no text layer
 """
 
-import pdfplumber
+import hashlib
 import logging
 import tempfile
 import os
 from typing import Dict, Any
 from fastapi import UploadFile
+from config import MAX_PDF_SIZE, PDF_UPLOAD_CHUNK_SIZE
+from services.pdf_cache import get_pdf_cache
+from services.pdf_layout import extract_structured_text
 
 logger = logging.getLogger(__name__)
 
 class PDFExtractor:
     def __init__(self):
-        self.max_file_size = 10 * 1024 * 1024  # 10MB limit
+        self.max_file_size = MAX_PDF_SIZE  # Also bounds the request body (config.MAX_REQUEST_BODY_BYTES)
         self.allowed_mime_types = ['application/pdf']
+        self.cache = get_pdf_cache()
     
     def validate_file(self, file: UploadFile) -> tuple[bool, str]:
         """
@@ -32,9 +37,15 @@ class PDFExtractor:
         
         return True, ""
     
-    async def extract_text(self, file: UploadFile) -> Dict[str, Any]:
+    async def extract_text(self, file: UploadFile, structured: bool = False) -> Dict[str, Any]:
         """
         Extract text from PDF file
+        
+        Args:
+            file: Uploaded PDF
+            structured: If True, keep code listings and tables as fenced blocks
+                        (see services.pdf_layout) instead of flattening them
+        
         Returns: {
             'success': bool,
             'extracted_text': str,
@@ -55,12 +66,24 @@ class PDFExtractor:
         
         temp_file_path = None
         try:
-            # Read file content and check size
-            file_content = await file.read()
-            file_size = len(file_content)
+            # Stream the upload into a temp file, hashing and size-checking each
+            # chunk as it arrives so the bytes are only walked once
+            hasher = hashlib.sha256()
+            file_size = 0
+            with tempfile.NamedTemporaryFile(mode='wb', suffix='.pdf', delete=False) as temp_file:
+                temp_file_path = temp_file.name
+                while True:
+                    chunk = await file.read(PDF_UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    file_size += len(chunk)
+                    if file_size > self.max_file_size:
+                        break
+                    hasher.update(chunk)
+                    temp_file.write(chunk)
             
             if file_size > self.max_file_size:
-                error_msg = f"File too large. Maximum size is {self.max_file_size / (1024 * 1024):.1f}MB. Got {file_size / (1024 * 1024):.1f}MB"
+                error_msg = f"File too large. Maximum size is {self.max_file_size / (1024 * 1024):.1f}MB"
                 logger.warning(error_msg)
                 return {
                     'success': False,
@@ -79,35 +102,62 @@ class PDFExtractor:
                     'error': error_msg
                 }
             
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(mode='wb', suffix='.pdf', delete=False) as temp_file:
-                temp_file.write(file_content)
-                temp_file_path = temp_file.name
+            # Identical uploads are answered from the cache without touching pdfplumber
+            cache_key = hasher.hexdigest() + ('-structured' if structured else '')
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"PDF cache hit ({cache_key[:12]}): {cached['page_count']} pages")
+                return cached
             
             # Extract text using pdfplumber
-            extracted_text_parts = []
+            page_texts = []
             page_count = 0
             
             try:
+                import pdfplumber  # Imported on first extraction to keep startup fast
+
                 with pdfplumber.open(temp_file_path) as pdf:
                     page_count = len(pdf.pages)
                     logger.info(f"Processing PDF with {page_count} pages")
                     
                     for page_num, page in enumerate(pdf.pages, 1):
                         try:
-                            text = page.extract_text()
-                            if text:
-                                extracted_text_parts.append(text)
+                            if structured:
+                                text = extract_structured_text(page)
+                            else:
+                                text = page.extract_text()
                         except Exception as e:
                             logger.warning(f"Error extracting text from page {page_num}: {str(e)}")
                             # Continue with other pages even if one fails
-                            continue
+                            text = None
+                        page_texts.append(text or '')
+                
+                # Pages without a text layer are likely scans - OCR only those
+                empty_pages = [i for i, text in enumerate(page_texts) if not text.strip()]
+                ocr_attempted = False
+                ocr_complete = True
+                if empty_pages:
+                    # Imported on first scanned page: it loads pytesseract and PIL
+                    from services.ocr_service import get_ocr_service
+                    ocr = get_ocr_service()
+                else:
+                    ocr = None
+                if ocr is not None and ocr.available:
+                    ocr_attempted = True
+                    ocr_texts, ocr_complete = await ocr.ocr_pages(temp_file_path, empty_pages)
+                    for index, text in ocr_texts.items():
+                        page_texts[index] = text.strip()
+                    if ocr_texts:
+                        logger.info(f"OCR recovered text for {len(ocr_texts)} of {len(empty_pages)} image-only pages")
                 
                 # Combine all extracted text
-                extracted_text = '\n\n'.join(extracted_text_parts)
+                extracted_text = '\n\n'.join(text for text in page_texts if text.strip())
                 
                 if not extracted_text or not extracted_text.strip():
-                    error_msg = "No text could be extracted from the PDF. The PDF might be image-based or empty."
+                    if ocr_attempted:
+                        error_msg = "No text could be extracted from the PDF, even with OCR. The PDF might be empty or unreadable."
+                    else:
+                        error_msg = "No text could be extracted from the PDF. The PDF might be image-based or empty."
                     logger.warning(error_msg)
                     return {
                         'success': False,
@@ -118,12 +168,18 @@ class PDFExtractor:
                 
                 logger.info(f"Successfully extracted {len(extracted_text)} characters from {page_count} pages")
                 
-                return {
+                result = {
                     'success': True,
                     'extracted_text': extracted_text,
                     'page_count': page_count,
                     'error': None
                 }
+                if ocr_complete:
+                    self.cache.put(cache_key, result)
+                else:
+                    # A retry with a less busy OCR pool may recover the dropped pages
+                    logger.info("Not caching PDF extraction: OCR did not finish every page")
+                return result
                 
             except Exception as e:
                 # Check if it's a PDF syntax error or corruption
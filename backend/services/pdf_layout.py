@@ -0,0 +1,154 @@
+"""
+Layout-aware PDF page rendering
+Turns a pdfplumber page into text that keeps code listings and tables intact:
+monospace regions become fenced code blocks with their indentation restored,
+and detected tables become fenced, pipe-separated blocks.
+"""
+
+import logging
+import re
+from typing import List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Substrings of font names that indicate a fixed-width (code) font.
+# Embedded fonts often carry a subset prefix like "ABCDEF+CourierNew".
+MONOSPACE_FONT_HINTS = (
+    'mono', 'courier', 'consolas', 'menlo', 'inconsolata', 'monaco',
+    'lucidaconsole', 'sourcecode', 'firacode', 'code', 'fixed',
+    'typewriter', 'cmtt', 'sfmono', 'lmmono'
+)
+
+# A line counts as code when at least this share of its characters are monospace
+CODE_LINE_THRESHOLD = 0.6
+
+
+def is_monospace_font(fontname: str) -> bool:
+    """Check if a PDF font name looks like a fixed-width font"""
+    name = (fontname or '').lower()
+    return any(hint in name for hint in MONOSPACE_FONT_HINTS)
+
+
+def _group_lines(words: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Group words into visual lines by their vertical position"""
+    lines = []
+    for word in sorted(words, key=lambda w: (round(w['top']), w['x0'])):
+        tolerance = max(word.get('size', 10) * 0.4, 2)
+        if lines and abs(lines[-1][0]['top'] - word['top']) <= tolerance:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    for line in lines:
+        line.sort(key=lambda w: w['x0'])
+    return lines
+
+
+def _char_width(lines: List[List[Dict[str, Any]]]) -> float:
+    """Estimate the width of one monospace character across a code block"""
+    total_width = sum(w['x1'] - w['x0'] for line in lines for w in line)
+    total_chars = sum(len(w['text']) for line in lines for w in line)
+    return total_width / total_chars if total_chars else 6.0
+
+
+def _render_code_block(lines: List[List[Dict[str, Any]]]) -> str:
+    """Render monospace lines with their column positions (indentation) restored"""
+    char_width = _char_width(lines)
+    left = min(line[0]['x0'] for line in lines)
+
+    rendered = []
+    previous_bottom = None
+    for line in lines:
+        # Blank lines inside a listing have no words, so recover them from the gap
+        if previous_bottom is not None:
+            line_height = line[0].get('size', 10)
+            blank_lines = int((line[0]['top'] - previous_bottom) / (line_height * 1.2))
+            rendered.extend([''] * min(blank_lines, 2))
+        previous_bottom = max(w['bottom'] for w in line)
+
+        text = ''
+        for word in line:
+            column = int(round((word['x0'] - left) / char_width))
+            if column > len(text):
+                text += ' ' * (column - len(text))
+            elif text:
+                text += ' '
+            text += word['text']
+        rendered.append(text.rstrip())
+    return '```\n' + '\n'.join(rendered) + '\n```'
+
+
+def _render_table(rows: List[List[Any]]) -> str:
+    """Render extracted table rows as a fenced, pipe-separated block"""
+    rendered = []
+    for row in rows:
+        cells = [' '.join(str(cell).split()) if cell is not None else '' for cell in row]
+        rendered.append('| ' + ' | '.join(cells) + ' |')
+    return '```table\n' + '\n'.join(rendered) + '\n```'
+
+
+def extract_structured_text(page) -> str:
+    """
+    Render one pdfplumber page, preserving code listings and tables.
+
+    Prose lines are emitted as plain text, consecutive monospace lines are
+    wrapped in ``` fences with indentation rebuilt from character positions,
+    and tables found by pdfplumber are emitted as ```table fences.
+    """
+    tables = []
+    try:
+        for table in page.find_tables():
+            rows = table.extract()
+            if rows and len(rows) > 1:
+                tables.append((table.bbox, rows))
+    except Exception as e:
+        logger.debug(f"Table detection failed on page: {e}")
+
+    def in_table(word):
+        cx = (word['x0'] + word['x1']) / 2
+        cy = (word['top'] + word['bottom']) / 2
+        return any(x0 <= cx <= x1 and top <= cy <= bottom for (x0, top, x1, bottom), _ in tables)
+
+    words = page.extract_words(extra_attrs=['fontname', 'size'])
+    words = [w for w in words if not in_table(w)]
+
+    # Each block is (top, kind, payload) so tables can be slotted in by position
+    blocks = []
+    code_run = []
+    previous_bottom = None
+
+    def flush_code():
+        if code_run:
+            blocks.append((code_run[0][0]['top'], 'code', list(code_run)))
+            code_run.clear()
+
+    for line in _group_lines(words):
+        char_count = sum(len(w['text']) for w in line)
+        mono_count = sum(len(w['text']) for w in line if is_monospace_font(w.get('fontname')))
+        if char_count and mono_count / char_count >= CODE_LINE_THRESHOLD:
+            code_run.append(line)
+        else:
+            flush_code()
+            top = line[0]['top']
+            # Keep paragraph breaks where the vertical gap is larger than a line
+            gap = top - previous_bottom if previous_bottom is not None else 0
+            text = ' '.join(w['text'] for w in line)
+            blocks.append((top, 'para' if gap > line[0].get('size', 10) else 'text', text))
+        previous_bottom = max(w['bottom'] for w in line)
+    flush_code()
+
+    for bbox, rows in tables:
+        blocks.append((bbox[1], 'table', rows))
+    blocks.sort(key=lambda block: block[0])
+
+    parts = []
+    for _, kind, payload in blocks:
+        if kind == 'code':
+            parts.append('\n' + _render_code_block(payload) + '\n')
+        elif kind == 'table':
+            parts.append('\n' + _render_table(payload) + '\n')
+        elif kind == 'para' and parts:
+            parts.append('\n' + payload)
+        else:
+            parts.append(payload)
+
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(parts)).strip()
@@ -4,7 +4,6 @@ Resend has a free tier: 100 emails/day, 3,000 emails/month
 Sign up at: https://resend.com
 """
 
-import requests
 import logging
 import os
 from dotenv import load_dotenv
@@ -75,6 +74,8 @@ Sent from Scaffi Feedback System
             }
             
             # Send via Resend API
+            import requests
+
             response = requests.post(
                 "https://api.resend.com/emails",
                 headers={
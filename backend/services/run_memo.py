@@ -0,0 +1,292 @@
+"""
+Run-result memo
+Remembers recent /run-code results keyed on (language, normalized source,
+stdin, test cases), so pressing Run again on unchanged code - or code that only
+differs in comments and trailing whitespace - returns at once instead of
+taking a sandbox slot. Only code that looks deterministic is memoized, and a
+result with error text (tracebacks and compiler errors quote source lines) is
+only reused for the exact same source.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import re
+import threading
+import time
+import tokenize
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config import RUN_MEMO_MAX_ENTRIES, RUN_MEMO_TTL_SECONDS
+from services.local_executor import LANGUAGE_ALIASES
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Randomness, clocks, concurrency, process/environment and network APIs; code
+# using any of them may print something different on every run
+NONDETERMINISTIC_PATTERNS = {
+    'python': re.compile(
+        r'^\s*(?:import\s+[\w., ]*\b|from\s+)'
+        r'(?:random|secrets|uuid|time|datetime|threading|multiprocessing|concurrent|asyncio'
+        r'|socket|urllib|requests|http|subprocess)\b'
+        r'|\b(?:hash|id)\s*\(|\bos\.(?:urandom|getpid|environ|getenv|listdir|times)\b',
+        re.MULTILINE
+    ),
+    'javascript': re.compile(
+        r'\bMath\.random\b|\bDate\b|\bperformance\.now\b|\bcrypto\b|\bfetch\s*\(|\bWorker\b|\bsetImmediate\b'
+        r'|\bprocess\.(?:hrtime|pid|uptime|memoryUsage|cpuUsage|env)\b'
+        r'|\brequire\s*\(\s*[\'"](?:node:)?(?:os|fs|net|http|https|child_process|worker_threads)[\'"]'
+    ),
+    'java': re.compile(
+        r'\b(?:Random|SecureRandom|ThreadLocalRandom|UUID|Thread|ExecutorService|Executors|CompletableFuture'
+        r'|LocalDate|LocalTime|LocalDateTime|ZonedDateTime|Instant|Clock|Date|Calendar)\b'
+        r'|\bMath\.random\b|\bparallelStream\b'
+        r'|\bSystem\.(?:currentTimeMillis|nanoTime|identityHashCode|getenv)\b'
+    ),
+    'csharp': re.compile(
+        r'\b(?:Random|Guid|DateTime|DateTimeOffset|Stopwatch|Thread|Task|Parallel|Environment)\b'
+        r'|\bGetHashCode\b'
+    ),
+    'c': re.compile(
+        r'\b(?:s?rand|random|rand_r|drand48|time|clock|gettimeofday|clock_gettime|getpid|fork|pthread_create)\b'
+        r'|%p'
+    ),
+    'cpp': re.compile(
+        r'\b(?:s?rand|random|time|clock|gettimeofday|clock_gettime|getpid|fork|pthread_create'
+        r'|random_device|mt19937(?:_64)?|default_random_engine|chrono|thread|async)\b'
+        r'|%p'
+    ),
+}
+NONDETERMINISTIC_PATTERNS['typescript'] = NONDETERMINISTIC_PATTERNS['javascript']
+
+
+def _strip_python_comments(code: str) -> Optional[str]:
+    """Drop comments using Python's tokenizer; None if the code doesn't tokenize"""
+    lines = code.split('\n')
+    try:
+        comments = [token.start for token in tokenize.generate_tokens(io.StringIO(code).readline)
+                    if token.type == tokenize.COMMENT]
+    except (tokenize.TokenError, SyntaxError):
+        return None
+    for row, col in comments:
+        lines[row - 1] = lines[row - 1][:col]
+    return '\n'.join(lines)
+
+
+def _string_end(code: str, start: int, language: str) -> Optional[int]:
+    """Index just past the string/char literal opening at start, or None if it never closes"""
+    if language in ('java', 'csharp') and code.startswith('"""', start):
+        end = code.find('"""', start + 3)
+        return None if end == -1 else end + 3
+    if language == 'csharp' and start > 0 and code[start - 1] == '@':
+        # Verbatim string: no escapes, "" is a quote
+        i = start + 1
+        while i < len(code):
+            if code[i] == '"':
+                if code.startswith('""', i):
+                    i += 2
+                    continue
+                return i + 1
+            i += 1
+        return None
+    if language == 'cpp' and start > 0 and code[start - 1] == 'R':
+        # Raw string R"delim( ... )delim"
+        paren = code.find('(', start)
+        if paren == -1:
+            return None
+        delimiter = code[start + 1:paren]
+        end = code.find(')' + delimiter + '"', paren)
+        return None if end == -1 else end + len(delimiter) + 2
+
+    quote = code[start]
+    i = start + 1
+    while i < len(code):
+        c = code[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == quote:
+            return i + 1
+        if c == '\n' and quote != '`':
+            return None
+        i += 1
+    return None
+
+
+def _strip_c_comments(code: str, language: str) -> Optional[str]:
+    """Drop // and /* */ comments outside literals; None if the code can't be scanned reliably"""
+    # In JavaScript a '/' may open a regex literal that contains '//' or '/*';
+    # after a bare '/' on a line, comments on that line are left alone
+    regex_literals = language in ('javascript', 'typescript')
+    quotes = '"\'`' if regex_literals else '"\''
+    out = []
+    i, n = 0, len(code)
+    bare_slash = False
+    while i < n:
+        c = code[i]
+        if c == '\n':
+            bare_slash = False
+        elif c == '/' and not bare_slash and code.startswith('//', i):
+            end = code.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        elif c == '/' and not bare_slash and code.startswith('/*', i):
+            end = code.find('*/', i + 2)
+            if end == -1:
+                return None
+            # Keep the line breaks so line numbers in errors still match
+            out.append('\n' * code.count('\n', i, end) or ' ')
+            i = end + 2
+            continue
+        elif c == '/':
+            bare_slash = regex_literals
+        elif c in quotes:
+            end = _string_end(code, i, language)
+            if end is None:
+                return None
+            out.append(code[i:end])
+            i = end
+            continue
+        out.append(c)
+        i += 1
+    return ''.join(out)
+
+
+def normalize_source(code: str, language: str) -> str:
+    """
+    Source with comments, trailing whitespace and trailing blank lines removed.
+
+    Line structure is kept, so line numbers in tracebacks and compiler errors
+    of a memoized result still match the code. If the code can't be scanned
+    reliably (unterminated string, tokenizer error), only whitespace is trimmed.
+    """
+    code = code.replace('\r\n', '\n')
+    canonical = LANGUAGE_ALIASES.get(language.lower(), language.lower())
+    if canonical == 'python':
+        stripped = _strip_python_comments(code)
+    elif canonical in ('javascript', 'typescript', 'java', 'csharp', 'c', 'cpp'):
+        stripped = _strip_c_comments(code, canonical)
+    else:
+        stripped = None
+    if stripped is not None:
+        code = stripped
+    return '\n'.join(line.rstrip() for line in code.split('\n')).rstrip('\n')
+
+
+def looks_deterministic(source: str, language: str) -> bool:
+    """True if normalized source uses none of the language's randomness/time/concurrency APIs"""
+    canonical = LANGUAGE_ALIASES.get(language.lower(), language.lower())
+    pattern = NONDETERMINISTIC_PATTERNS.get(canonical)
+    # Languages without a pattern list are never assumed deterministic
+    return pattern is not None and not pattern.search(source)
+
+
+def is_transient(result: Dict[str, Any]) -> bool:
+    """Timeouts, service errors and cancellations: outcomes a re-run may not repeat"""
+    return result.get('exit_code') == -1 or 'timed out' in (result.get('error') or '')
+
+
+def quotes_source(result: Dict[str, Any]) -> bool:
+    """True if result carries error text, which may quote source lines"""
+    if result.get('error'):
+        return True
+    for test_result in result.get('test_results') or []:
+        error = test_result.get('error') if isinstance(test_result, dict) else getattr(test_result, 'error', None)
+        if error:
+            return True
+    return False
+
+
+def _source_digest(code: str) -> str:
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+class RunMemo:
+    """
+    Size-bounded LRU of run results with a short TTL.
+
+    Entries are the result dicts returned by CodeRunner; a hit returns a copy
+    marked cached=True. Results with error text also remember the exact
+    source they came from and only match that source: a rerun after a
+    comment edit must show its own lines in the traceback.
+    """
+
+    def __init__(self, max_entries: int = RUN_MEMO_MAX_ENTRIES, ttl_seconds: int = RUN_MEMO_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (created_at, result, digest of the raw source or None), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, code: str, language: str, stdin: Optional[str] = None,
+            test_cases: Optional[List[dict]] = None, extra: str = '',
+            deterministic: Optional[bool] = None) -> Optional[str]:
+        """
+        Memo key for a run, or None if it must not be memoized.
+
+        deterministic=None decides from the source (looks_deterministic),
+        True memoizes regardless and False never memoizes. Runs with MAXMS
+        tests are never memoized since they assert on timing.
+        """
+        if deterministic is False:
+            return None
+        if test_cases and any(str(test_case.get('expected_output', '')).strip().startswith('MAXMS:')
+                              for test_case in test_cases):
+            self._count("skipped")
+            return None
+
+        source = normalize_source(code, language)
+        if deterministic is None and not looks_deterministic(source, language):
+            self._count("skipped")
+            return None
+
+        digest = hashlib.sha256()
+        canonical = LANGUAGE_ALIASES.get(language.lower(), language.lower())
+        tests = json.dumps(test_cases, sort_keys=True, default=str) if test_cases is not None else ''
+        for part in (canonical, source, '\0none' if stdin is None else stdin, tests, extra):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str, code: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the memoized result for key (and the raw source code), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is not None and entry[2] is not None and (code is None or _source_digest(code) != entry[2]):
+                entry = None  # Its error text quotes a different version of the source
+            if entry is None:
+                self._count("miss")
+                return None
+            self._entries.move_to_end(key)
+        self._count("hit")
+        return dict(entry[1], cached=True)
+
+    def put(self, key: str, result: Dict[str, Any], code: Optional[str] = None):
+        """Store a run result under key; code is the raw source it ran"""
+        source = _source_digest(code) if code is not None and quotes_source(result) else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time(), dict(result), source)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, result: str):
+        metrics.inc("scaffy_run_memo_total", help_text="Run-result memo lookups (hit, miss, skipped)", result=result)
+
+
+# Singleton instance
+_run_memo = None
+
+def get_run_memo() -> RunMemo:
+    """Get or create the run-result memo"""
+    global _run_memo
+    if _run_memo is None:
+        _run_memo = RunMemo()
+    return _run_memo
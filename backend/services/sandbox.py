@@ -0,0 +1,164 @@
+"""
+Process sandbox for the local execution backend
+Student programs, compilers and warm interpreter workers run as an
+unprivileged account (LOCAL_EXECUTION_USER), in their own session, with a
+stripped environment and rlimits (set by exec'ing through prlimit). Running
+as another user is what keeps them out of the server: they cannot read
+/proc/<server pid>/environ (and so ANTHROPIC_API_KEY), signal it, or write
+to its files - only to their own working directory and world-writable
+places.
+
+Switching users needs the server to start as root (as it does in the
+container). Without that, the local backend is disabled and every language
+falls back to Piston, unless LOCAL_EXECUTION_USER is set to "" to run code as
+the server's own user (local development only).
+"""
+
+import logging
+import math
+import os
+import pwd
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    LOCAL_EXECUTION_USER,
+    LOCAL_EXECUTION_MEMORY_MB,
+    LOCAL_EXECUTION_MAX_PROCESSES,
+    LOCAL_EXECUTION_MAX_CONCURRENT_RUNS,
+    INTERPRETER_POOL_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_FILE_BYTES = 10 * 1024 * 1024  # Largest file a sandboxed process may write
+
+# RLIMIT_NPROC counts every process and thread of the sandbox user, so it is
+# shared by all concurrent runs and pool workers (JVM/Mono need threads)
+MAX_SANDBOX_PROCESSES = LOCAL_EXECUTION_MAX_PROCESSES * (LOCAL_EXECUTION_MAX_CONCURRENT_RUNS + 2 * INTERPRETER_POOL_SIZE)
+
+
+class SandboxUnavailable(Exception):
+    """Code cannot be run as the configured sandbox user"""
+
+
+def _resolve_identity(user: str) -> Optional[Tuple[int, int]]:
+    if _prlimit() is None:
+        raise SandboxUnavailable("prlimit (util-linux) is not installed")
+    if not user:
+        logger.warning("LOCAL_EXECUTION_USER is empty: student code runs as the server's own user "
+                       "and can read its environment. Use this for local development only")
+        return None
+    try:
+        entry = pwd.getpwnam(user)
+    except KeyError:
+        raise SandboxUnavailable(f"sandbox user '{user}' does not exist")
+    if entry.pw_uid == 0:
+        raise SandboxUnavailable(f"sandbox user '{user}' is root")
+    if os.geteuid() != 0:
+        if os.geteuid() == entry.pw_uid:
+            raise SandboxUnavailable(f"the server itself runs as '{user}'")
+        raise SandboxUnavailable(f"the server must start as root to run code as '{user}'")
+    return entry.pw_uid, entry.pw_gid
+
+
+_identity: Optional[Tuple[int, int]] = None
+_identity_error: Optional[str] = None
+_identity_resolved = False
+_identity_lock = threading.Lock()
+
+def get_sandbox_identity() -> Optional[Tuple[int, int]]:
+    """
+    (uid, gid) that sandboxed processes run as, or None to keep the server's
+    user. Raises SandboxUnavailable if the configured user can't be used.
+    """
+    global _identity, _identity_error, _identity_resolved
+    with _identity_lock:
+        if not _identity_resolved:
+            try:
+                _identity = _resolve_identity(LOCAL_EXECUTION_USER)
+            except SandboxUnavailable as e:
+                _identity_error = str(e)
+                logger.warning(f"Local code execution disabled: {e}")
+            _identity_resolved = True
+        if _identity_error:
+            raise SandboxUnavailable(_identity_error)
+        return _identity
+
+
+def sandbox_available() -> bool:
+    try:
+        get_sandbox_identity()
+        return True
+    except SandboxUnavailable:
+        return False
+
+
+def _prlimit() -> Optional[str]:
+    return shutil.which('prlimit')
+
+
+def _limits(cpu_seconds: Optional[float], address_space: bool, identity) -> List[str]:
+    """prlimit options for a sandboxed process"""
+    options = [f'--fsize={MAX_FILE_BYTES}', '--core=0']
+    if cpu_seconds is not None:
+        seconds = math.ceil(cpu_seconds)
+        options.append(f'--cpu={seconds}:{seconds + 1}')
+    if address_space:
+        options.append(f'--as={LOCAL_EXECUTION_MEMORY_MB * 1024 * 1024}')
+    if identity is not None:
+        # Per user: only meaningful once we are no longer the server's user
+        options.append(f'--nproc={MAX_SANDBOX_PROCESSES}')
+    return options
+
+
+def sandbox_popen_args(command: List[str], cwd: str, cpu_seconds: Optional[float] = None,
+                       address_space: bool = False,
+                       env: Optional[Dict[str, str]] = None) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    (argv, keyword arguments) for subprocess.Popen that start command as a
+    sandboxed process in cwd (which must already belong to the sandbox, see
+    prepare_dir). The process leads its own session, so killpg(pid) stops all
+    of it.
+
+    The rlimits are applied by exec'ing through prlimit rather than in a
+    preexec_fn, which is not safe to run in a threaded server; switching
+    user and session is done by Popen itself before exec.
+    """
+    identity = get_sandbox_identity()
+    argv = [_prlimit(), *_limits(cpu_seconds, address_space, identity), '--', *command]
+    kwargs = {
+        'cwd': cwd,
+        'env': {'PATH': os.environ.get('PATH', ''), 'HOME': cwd, 'TMPDIR': cwd, 'LANG': 'C.UTF-8', **(env or {})},
+        'start_new_session': True,
+    }
+    if identity is not None:
+        kwargs.update(user=identity[0], group=identity[1], extra_groups=[])
+    return argv, kwargs
+
+
+def prepare_dir(path: str):
+    """Hand a fresh working directory to the sandbox user"""
+    identity = get_sandbox_identity()
+    if identity is not None:
+        os.chown(path, *identity)
+
+
+def seal_dir(path: str):
+    """
+    Take a directory the sandbox wrote (e.g. a finished build) back: owned by
+    the server, readable but not writable by sandboxed processes, so a later
+    run cannot tamper with an artifact another student will execute.
+    """
+    identity = get_sandbox_identity()
+    for root, dirs, files in os.walk(path):
+        for name in [root] + [os.path.join(root, d) for d in dirs] + [os.path.join(root, f) for f in files]:
+            if os.path.islink(name):
+                if identity is not None:
+                    os.lchown(name, os.geteuid(), os.getegid())
+                continue
+            if identity is not None:
+                os.chown(name, os.geteuid(), os.getegid())
+            mode = os.stat(name).st_mode & 0o7777 & ~0o6022  # No setuid/setgid, no group/other write
+            os.chmod(name, mode | (0o755 if os.path.isdir(name) else 0o444))
@@ -0,0 +1,125 @@
+"""
+Compile/syntax pre-check for test runs
+Checks that student code compiles before any test runs, using Python's own
+compiler or a local toolchain (node --check, javac, mcs, gcc -fsyntax-only)
+when one is installed. Toolchains run sandboxed like a local compile (see
+services/sandbox.py), and are skipped when the sandbox is unavailable. Code
+that fails is reported once instead of producing the same compile error for
+every test.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Optional, Tuple
+
+from config import COMPILE_TIMEOUT
+from services.local_executor import LANGUAGE_ALIASES, NO_ADDRESS_LIMIT, _java_filename, _run_sandboxed
+from services.sandbox import prepare_dir, sandbox_available
+from utils.cancellation import Cancellation, run_cancellable
+from utils.metrics import metrics
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Source file name and checker command per language; java is handled apart
+# (its file name depends on the public class)
+CHECKERS = {
+    'javascript': ('main.js', ['node', '--check', 'main.js']),
+    'csharp': ('Program.cs', ['mcs', '-target:library', '-out:check.dll', 'Program.cs']),
+    'c': ('main.c', ['gcc', '-fsyntax-only', 'main.c']),
+    'cpp': ('main.cpp', ['g++', '-fsyntax-only', '-std=c++17', 'main.cpp']),
+}
+
+
+def _check_python(code: str) -> Optional[str]:
+    try:
+        compile(code, '<student>', 'exec')
+    except SyntaxError as e:
+        # Built from the error itself: a traceback would look '<student>' up
+        # through linecache, and a real file name could quote a server file
+        lines = [f'  File "main.py", line {e.lineno}'] if e.lineno else []
+        if e.lineno and e.text:
+            text = e.text.rstrip('\n')
+            stripped = text.lstrip()
+            lines.append('    ' + stripped)
+            if e.offset:
+                caret = max(0, e.offset - 1 - (len(text) - len(stripped)))
+                lines.append('    ' + ' ' * caret + '^')
+        lines.append(f'{type(e).__name__}: {e.msg}')
+        return '\n'.join(lines)
+    except ValueError as e:
+        return f'{type(e).__name__}: {e}'
+    return None
+
+
+def _run_checker_blocking(command: list, filename: str, code: str, address_space: bool,
+                          cancellation: Optional[Cancellation] = None) -> Optional[str]:
+    """Write code to a scratch dir and run the checker there; returns its diagnostic on failure"""
+    workdir = tempfile.mkdtemp(prefix='scaffy-check-')
+    try:
+        with open(os.path.join(workdir, filename), 'w', encoding='utf-8') as f:
+            f.write(code)
+        # Checkers read student code (#include, etc.), so they run like a compile:
+        # as the sandbox user, with a stripped environment and the usual limits
+        prepare_dir(workdir)
+        try:
+            exit_code, stdout, stderr, _ = _run_sandboxed(
+                command, workdir, "", COMPILE_TIMEOUT, address_space, cancellation=cancellation
+            )
+        except subprocess.TimeoutExpired:
+            return f"Compilation timed out after {COMPILE_TIMEOUT} seconds"
+        if exit_code == 0:
+            return None
+        diagnostic = (stderr or stdout).replace(workdir + os.sep, '')
+        # Drop the checker's own stack frames and version banner (node)
+        lines = [line for line in diagnostic.splitlines()
+                 if not line.startswith('    at ') and not line.startswith('Node.js v')]
+        return '\n'.join(lines).strip() or "Compilation failed"
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def _run_checker(command: list, filename: str, code: str, language: str) -> Optional[str]:
+    return await run_cancellable(
+        None, _run_checker_blocking, command, filename, code, language not in NO_ADDRESS_LIMIT
+    )
+
+
+async def check_syntax(code: str, language: str, local_executor=None) -> Tuple[bool, Optional[str]]:
+    """
+    Check that code compiles.
+
+    Returns (checked, diagnostic): checked is False when no local checker is
+    available for the language (the caller falls back to one real run);
+    diagnostic is the compiler's error output, or None if the code compiles.
+    """
+    canonical = LANGUAGE_ALIASES.get(language.lower())
+
+    with span("code.precheck", language=canonical or language) as check_span:
+        checked = True
+        if canonical == 'python':
+            diagnostic = _check_python(code)
+        elif canonical == 'java' and local_executor is not None and local_executor.supports('java'):
+            # Goes through the compile cache, so the test runs reuse these classes
+            _, diagnostic = await asyncio.to_thread(local_executor.compile_java, code)
+        elif canonical == 'java' and shutil.which('javac') and sandbox_available():
+            filename = _java_filename(code)
+            diagnostic = await _run_checker(['javac', '-encoding', 'UTF-8', '-d', 'classes', filename],
+                                            filename, code, canonical)
+        elif canonical in CHECKERS and shutil.which(CHECKERS[canonical][1][0]) and sandbox_available():
+            filename, command = CHECKERS[canonical]
+            diagnostic = await _run_checker(command, filename, code, canonical)
+        else:
+            checked, diagnostic = False, None
+
+        result = "unchecked" if not checked else "failed" if diagnostic else "ok"
+        check_span.set_attribute("precheck.result", result)
+        metrics.inc("scaffy_precheck_total", help_text="Compile/syntax pre-checks before test runs",
+                    language=canonical or language, result=result)
+        if diagnostic:
+            logger.info("Pre-check failed for %s code; skipping tests", canonical)
+        return checked, diagnostic
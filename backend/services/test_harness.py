@@ -0,0 +1,379 @@
+"""
+Structured test-harness protocol
+Builds per-language test runners that call each test's function inside the
+student's program and write one framed JSON record per test to stdout:
+
+    \\x1e<nonce>\\x1f{"i": 0, "ok": true, "result": "3", "stdout": "", "duration_ms": 0.02,
+                       "cpu_ms": 0.02, "peak_kb": 9216}
+
+The nonce is random per run, so nothing the student prints can forge or
+corrupt a record. Output printed during the call is captured into the
+record, which lets a whole batch of tests run in one process with exact
+per-test results and timings.
+
+peak_kb is the process's resident memory high-water mark (VmHWM), reset
+through /proc/self/clear_refs before each call so it covers that call only.
+It is read from inside the program because the sandbox's own ru_maxrss also
+counts memory inherited from the parent at fork. It is null where /proc
+isn't available.
+"""
+
+import json
+import secrets
+from typing import Dict, List, Optional, Tuple
+
+RECORD_START = '\x1e'
+RECORD_SEP = '\x1f'
+
+# Languages with a structured runner; everything else uses plain stdout matching
+HARNESS_LANGUAGES = {'python', 'javascript', 'js', 'java', 'csharp', 'c#', 'cs'}
+
+
+def new_nonce() -> str:
+    return secrets.token_hex(8)
+
+
+def is_main_test(function_name: str) -> bool:
+    """Integration tests run the whole program and compare its full stdout"""
+    return (function_name or '').lower() == 'main'
+
+
+def _has_csharp_main(code: str) -> bool:
+    return 'static void Main' in code or 'static async Task Main' in code
+
+
+def supports(language: str, function_name: str, code: str) -> bool:
+    """True if this test can run through the structured harness"""
+    language = language.lower()
+    if language not in HARNESS_LANGUAGES or is_main_test(function_name) or not function_name:
+        return False
+    if language in ('csharp', 'c#', 'cs') and _has_csharp_main(code):
+        # A second Main would be ambiguous; these run as whole programs
+        return False
+    if language == 'java' and 'package ' in code and code.lstrip().startswith('package'):
+        # A default-package runner can't see package-private classes
+        return False
+    return True
+
+
+# ----------------------------------------------------------------------
+# Runners
+# ----------------------------------------------------------------------
+
+def _python_runner(tests: List[Tuple[int, dict]], nonce: str) -> str:
+    lines = [
+        "# Test execution",
+        "def __scaffy_peak(reset=False):",
+        "    try:",
+        "        if reset:",
+        "            with open('/proc/self/clear_refs', 'w') as _f:",
+        "                _f.write('5')",
+        "            return None",
+        "        with open('/proc/self/status') as _f:",
+        "            for _line in _f:",
+        "                if _line.startswith('VmHWM:'):",
+        "                    return int(_line.split()[1])",
+        "    except (OSError, ValueError):",
+        "        return None",
+        "def __scaffy_run(__i, __call):",
+        "    import sys as _s, io as _io, json as _j, time as _t, traceback as _tb",
+        "    _buf, _out = _io.StringIO(), _s.stdout",
+        "    _rec = {'i': __i}",
+        "    __scaffy_peak(reset=True)",
+        "    _s.stdout = _buf",
+        "    _start, _cpu = _t.perf_counter(), _t.process_time()",
+        "    try:",
+        "        _rec['result'] = str(__call())",
+        "        _rec['ok'] = True",
+        "    except BaseException as _e:",
+        "        _rec['ok'] = False",
+        "        _rec['exception'] = ''.join(_tb.format_exception_only(type(_e), _e)).strip()",
+        "    finally:",
+        "        _rec['duration_ms'] = (_t.perf_counter() - _start) * 1000",
+        "        _rec['cpu_ms'] = (_t.process_time() - _cpu) * 1000",
+        "        _s.stdout = _out",
+        "    _rec['stdout'] = _buf.getvalue()",
+        "    _rec['peak_kb'] = __scaffy_peak()",
+        f"    _out.write('\\n' + {RECORD_START + nonce + RECORD_SEP!r} + _j.dumps(_rec) + '\\n')",
+        "    _out.flush()",
+    ]
+    for index, test in tests:
+        lines.append(f"__scaffy_run({index}, lambda: {test['function_name']}({test.get('input_data', '')}))")
+    return '\n'.join(lines)
+
+
+def _javascript_runner(tests: List[Tuple[int, dict]], nonce: str) -> str:
+    # The runner require()s fs/util/perf_hooks for its measurements, so JS
+    # tests always take the cold path rather than the warm interpreter pool
+    lines = [
+        "// Test execution",
+        "function __scaffyPeak(reset) {",
+        "  const fs = require('fs');",
+        "  try {",
+        "    if (reset) { fs.writeFileSync('/proc/self/clear_refs', '5'); return null; }",
+        "    const match = /VmHWM:\\s+(\\d+)/.exec(fs.readFileSync('/proc/self/status', 'utf8'));",
+        "    return match ? Number(match[1]) : null;",
+        "  } catch (e) {",
+        "    return null;",
+        "  }",
+        "}",
+        "function __scaffyRun(i, call) {",
+        "  const util = require('util');",
+        "  const { performance } = require('perf_hooks');",
+        "  const proc = require('process');",
+        "  const captured = [];",
+        "  const saved = {};",
+        "  for (const k of ['log', 'info', 'debug']) {",
+        "    saved[k] = console[k];",
+        "    console[k] = (...args) => captured.push(util.format(...args) + '\\n');",
+        "  }",
+        "  const rec = { i };",
+        "  __scaffyPeak(true);",
+        "  const start = performance.now();",
+        "  const cpu = proc.cpuUsage();",
+        "  try {",
+        "    rec.result = util.format(call());",
+        "    rec.ok = true;",
+        "  } catch (e) {",
+        "    rec.ok = false;",
+        "    rec.exception = (e && e.name ? e.name + ': ' + e.message : String(e));",
+        "  } finally {",
+        "    rec.duration_ms = performance.now() - start;",
+        "    const used = proc.cpuUsage(cpu);",
+        "    rec.cpu_ms = (used.user + used.system) / 1000;",
+        "    Object.assign(console, saved);",
+        "  }",
+        "  rec.stdout = captured.join('');",
+        "  rec.peak_kb = __scaffyPeak(false);",
+        f"  console.log('\\n' + {json.dumps(RECORD_START + nonce + RECORD_SEP)} + JSON.stringify(rec));",
+        "}",
+    ]
+    for index, test in tests:
+        lines.append(f"__scaffyRun({index}, () => {test['function_name']}({test.get('input_data', '')}));")
+    return '\n'.join(lines)
+
+
+def _java_runner(tests: List[Tuple[int, dict]], nonce: str) -> str:
+    calls = []
+    for index, test in tests:
+        function_name = test['function_name']
+        input_data = test.get('input_data', '')
+        if '.' in function_name:
+            class_name, method_name = function_name.split('.', 1)
+            expression = f"new {class_name}().{method_name}({input_data})"
+        else:
+            expression = f"{function_name}({input_data})"
+        calls.append(f"        run({index}, () -> {expression});")
+
+    marker = json.dumps(RECORD_START + nonce + RECORD_SEP)
+    return f"""// Test execution
+class TestRunner {{
+    interface Call {{ Object call() throws Throwable; }}
+
+    static String q(String s) {{
+        if (s == null) return "null";
+        StringBuilder b = new StringBuilder("\\"");
+        for (char c : s.toCharArray()) {{
+            if (c == '"' || c == '\\\\') b.append('\\\\').append(c);
+            else if (c == '\\n') b.append("\\\\n");
+            else if (c == '\\r') b.append("\\\\r");
+            else if (c == '\\t') b.append("\\\\t");
+            else if (c < 0x20) b.append(String.format("\\\\u%04x", (int) c));
+            else b.append(c);
+        }}
+        return b.append('"').toString();
+    }}
+
+    static String peakKb(boolean reset) {{
+        try {{
+            if (reset) {{
+                try (java.io.FileWriter w = new java.io.FileWriter("/proc/self/clear_refs")) {{ w.write("5"); }}
+                return null;
+            }}
+            for (String line : java.nio.file.Files.readAllLines(java.nio.file.Paths.get("/proc/self/status"))) {{
+                if (line.startsWith("VmHWM:")) return line.replaceAll("[^0-9]", "");
+            }}
+        }} catch (Exception e) {{ }}
+        return "null";
+    }}
+
+    static void run(int i, Call call) {{
+        java.io.PrintStream out = System.out;
+        java.io.ByteArrayOutputStream buf = new java.io.ByteArrayOutputStream();
+        java.lang.management.ThreadMXBean threads = java.lang.management.ManagementFactory.getThreadMXBean();
+        peakKb(true);
+        System.setOut(new java.io.PrintStream(buf, true));
+        String result = null, exception = null;
+        long start = System.nanoTime();
+        long cpuStart = threads.getCurrentThreadCpuTime();
+        try {{
+            result = String.valueOf(call.call());
+        }} catch (Throwable e) {{
+            exception = e.toString();
+        }} finally {{
+            System.setOut(out);
+        }}
+        double ms = (System.nanoTime() - start) / 1e6;
+        double cpuMs = (threads.getCurrentThreadCpuTime() - cpuStart) / 1e6;
+        out.print("\\n" + {marker} + "{{\\"i\\":" + i + ",\\"ok\\":" + (exception == null)
+            + ",\\"result\\":" + q(result) + ",\\"exception\\":" + q(exception)
+            + ",\\"stdout\\":" + q(buf.toString()) + ",\\"duration_ms\\":" + ms
+            + ",\\"cpu_ms\\":" + cpuMs + ",\\"peak_kb\\":" + peakKb(false) + "}}\\n");
+        out.flush();
+    }}
+
+    public static void main(String[] args) {{
+{chr(10).join(calls)}
+    }}
+}}"""
+
+
+def _csharp_runner(tests: List[Tuple[int, dict]], nonce: str, code: str) -> str:
+    calls = []
+    for index, test in tests:
+        function_name = test['function_name']
+        input_data = test.get('input_data', '')
+        parts = function_name.split('.')
+        if len(parts) >= 2:
+            class_name, method_name = '.'.join(parts[:-1]), parts[-1]
+            expression = f"new {class_name}().{method_name}({input_data})"
+        else:
+            expression = f"{function_name}({input_data})"
+        calls.append(f"        Run({index}, () => {expression});")
+
+    marker = json.dumps(RECORD_START + nonce + RECORD_SEP)
+    # Fully qualified names: using directives can't follow the student's declarations
+    return f"""// Test execution
+class TestRunner {{
+    static string Q(string s) {{
+        if (s == null) return "null";
+        var b = new System.Text.StringBuilder("\\"");
+        foreach (char c in s) {{
+            if (c == '"' || c == '\\\\') b.Append('\\\\').Append(c);
+            else if (c == '\\n') b.Append("\\\\n");
+            else if (c == '\\r') b.Append("\\\\r");
+            else if (c == '\\t') b.Append("\\\\t");
+            else if (c < 0x20) b.Append("\\\\u" + ((int) c).ToString("x4"));
+            else b.Append(c);
+        }}
+        return b.Append('"').ToString();
+    }}
+
+    static string PeakKb(bool reset) {{
+        try {{
+            if (reset) {{
+                System.IO.File.WriteAllText("/proc/self/clear_refs", "5");
+                return null;
+            }}
+            foreach (var line in System.IO.File.ReadAllLines("/proc/self/status")) {{
+                if (line.StartsWith("VmHWM:")) return System.Text.RegularExpressions.Regex.Replace(line, "[^0-9]", "");
+            }}
+        }} catch (System.Exception) {{ }}
+        return "null";
+    }}
+
+    static void Run(int i, System.Func<object> call) {{
+        var output = System.Console.Out;
+        var buf = new System.IO.StringWriter();
+        PeakKb(true);
+        System.Console.SetOut(buf);
+        string result = null, exception = null;
+        var cpuStart = System.Diagnostics.Process.GetCurrentProcess().TotalProcessorTime;
+        var watch = System.Diagnostics.Stopwatch.StartNew();
+        try {{
+            var value = call();
+            result = value == null ? "" : value.ToString();
+        }} catch (System.Exception e) {{
+            exception = e.GetType().Name + ": " + e.Message;
+        }} finally {{
+            watch.Stop();
+            System.Console.SetOut(output);
+        }}
+        var invariant = System.Globalization.CultureInfo.InvariantCulture;
+        string ok = exception == null ? "true" : "false";
+        string ms = watch.Elapsed.TotalMilliseconds.ToString(invariant);
+        string cpuMs = (System.Diagnostics.Process.GetCurrentProcess().TotalProcessorTime - cpuStart).TotalMilliseconds.ToString(invariant);
+        output.Write("\\n" + {marker} + "{{\\"i\\":" + i + ",\\"ok\\":" + ok
+            + ",\\"result\\":" + Q(result) + ",\\"exception\\":" + Q(exception)
+            + ",\\"stdout\\":" + Q(buf.ToString()) + ",\\"duration_ms\\":" + ms
+            + ",\\"cpu_ms\\":" + cpuMs + ",\\"peak_kb\\":" + PeakKb(false) + "}}\\n");
+        output.Flush();
+    }}
+
+    static void Main(string[] args) {{
+{chr(10).join(calls)}
+    }}
+}}"""
+
+
+def build_runner(language: str, code: str, tests: List[Tuple[int, dict]], nonce: str) -> Optional[str]:
+    """
+    Build the test runner for (index, test_case) pairs. The runner is meant
+    to be passed as run_code's harness, after the student's code.
+    """
+    language = language.lower()
+    if language == 'python':
+        return _python_runner(tests, nonce)
+    if language in ('javascript', 'js'):
+        return _javascript_runner(tests, nonce)
+    if language == 'java':
+        return _java_runner(tests, nonce)
+    if language in ('csharp', 'c#', 'cs'):
+        return _csharp_runner(tests, nonce, code)
+    return None
+
+
+# ----------------------------------------------------------------------
+# Records
+# ----------------------------------------------------------------------
+
+def parse_records(stdout: str, nonce: str) -> Tuple[Dict[int, dict], str]:
+    """
+    Split program stdout into harness records (by test index) and whatever
+    the program printed outside of any test.
+    """
+    marker = RECORD_START + nonce + RECORD_SEP
+    records = {}
+    residual = []
+    for line in stdout.split('\n'):
+        position = line.find(marker)
+        if position == -1:
+            residual.append(line)
+            continue
+        if position:
+            residual.append(line[:position])
+        elif residual and residual[-1] == '':
+            # The newline the runner wrote before the record
+            residual.pop()
+        try:
+            record = json.loads(line[position + len(marker):])
+            records[int(record['i'])] = record
+        except (ValueError, KeyError, TypeError):
+            residual.append(line)
+    return records, '\n'.join(residual)
+
+
+def actual_output(record: dict) -> str:
+    """
+    What the old runner compared against: anything printed during the call,
+    followed by the printed return value.
+    """
+    printed = record.get('stdout') or ''
+    if not record.get('ok'):
+        return printed.strip()
+    result = record.get('result')
+    return (printed + ('' if result is None else result)).strip()
+
+
+def candidate_outputs(record: dict) -> List[str]:
+    """
+    Outputs a passing test may have produced, most specific first: the
+    return value on its own (so a debug print doesn't fail a correct
+    function), the old runner's printed output plus return value, then the
+    printed output alone for functions whose return value isn't the point.
+    """
+    printed = (record.get('stdout') or '').strip()
+    result = record.get('result')
+    if not record.get('ok') or result is None:
+        return [printed]
+    return list(dict.fromkeys([result.strip(), actual_output(record), printed]))
@@ -0,0 +1,389 @@
+"""
+Incremental test re-execution
+Maps each test to the top-level functions and classes it can reach, so a
+rerun after editing one function only executes the tests that depend on it;
+the others reuse their result from the previous run.
+
+A test depends on its own test case, the module-level code, and every unit
+(top-level function or class) reachable from the names in its function_name
+and input_data, following references between units. Units that share
+module-level state (a global both of them reference) are linked, since the
+batch runs tests in one process; if the reachable set touches shared state,
+whatever module-level code reaches is included as well. Python is analyzed
+with ast, JavaScript with a lighter scanner; any doubt (dynamic lookups,
+unparsable code) disables reuse for that run.
+"""
+
+import ast
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+
+from config import TEST_IMPACT_MAX_ENTRIES, TEST_IMPACT_TTL_SECONDS
+from services.local_executor import LANGUAGE_ALIASES
+from services.run_memo import _string_end, _strip_c_comments
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+IDENTIFIER = re.compile(r'[A-Za-z_$][\w$]*')
+
+# Code that looks names up dynamically can reach anything
+PYTHON_DYNAMIC = re.compile(r'\b(?:eval|exec|globals|locals|vars|__import__|getattr|setattr|importlib)\b|\bsys\.modules\b')
+JAVASCRIPT_DYNAMIC = re.compile(r'\b(?:eval|Function|globalThis|global|window)\b')
+
+
+class CodeUnits:
+    """Top-level units of a program and the names each one references"""
+
+    def __init__(self):
+        self.hashes: Dict[str, str] = {}  # unit name -> hash of its source
+        self.references: Dict[str, Set[str]] = defaultdict(set)
+        self.module_parts = []  # module-level code, in order
+        self.module_references: Set[str] = set()
+        self.state: Set[str] = set()  # names of module-level state units may share
+
+    def add_unit(self, name: str, source: str, references: Iterable[str]):
+        # A redefinition extends the unit rather than replacing it
+        self.hashes[name] = _digest(self.hashes.get(name, ''), source)
+        self.references[name].update(references)
+
+
+def _digest(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Python
+# ----------------------------------------------------------------------
+
+def _python_names(node: ast.AST) -> Set[str]:
+    return {child.id for child in ast.walk(node) if isinstance(child, ast.Name)}
+
+
+def _python_units(code: str) -> Optional[CodeUnits]:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+
+    units = CodeUnits()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # ast.dump leaves out positions and comments, so moving or
+            # re-commenting a function doesn't count as a change
+            units.add_unit(node.name, ast.dump(node), _python_names(node))
+            if isinstance(node, ast.ClassDef):
+                # Class attributes are shared between everything that uses the class
+                units.state.add(node.name)
+        else:
+            units.module_parts.append(ast.dump(node))
+            units.module_references |= _python_names(node)
+            units.state |= {child.id for child in ast.walk(node)
+                            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store)}
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Global):
+            units.state.update(node.names)
+    return units
+
+
+# ----------------------------------------------------------------------
+# JavaScript
+# ----------------------------------------------------------------------
+
+# A '/' after one of these (or these keywords) starts a regex literal, not a division
+_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_AFTER_WORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                      'throw', 'yield', 'await'}
+
+# First character of a line that continues the previous statement
+_CONTINUATION = set('.,?:)]}&|+-*/%=<>')
+_LINE_START = re.compile(r'[ \t]*([^ \t])')
+
+_JS_FUNCTION = re.compile(r'\s*(?:export\s+(?:default\s+)?)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)\s*\(')
+_JS_CLASS = re.compile(r'\s*(?:export\s+(?:default\s+)?)?class\s+([A-Za-z_$][\w$]*)[^{]*\{')
+_JS_BOUND_FUNCTION = re.compile(
+    r'\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?'
+    r'(?:(function)\b[^(]*\(|(?:\([^()]*\)|[A-Za-z_$][\w$]*)\s*=>\s*)'
+)
+_JS_DECLARATION = re.compile(r'\b(?:const|let|var)\s+(\{[^=;]*\}|\[[^=;]*\]|[A-Za-z_$][\w$]*)')
+_JS_ASSIGNMENT = re.compile(r'(?<![\w$.])([A-Za-z_$][\w$]*)\s*(?:\+\+|--|(?:[-+*/%&|^]|\*\*|<<|>>>?)?=(?![=>]))')
+
+
+def _mask_literals(code: str) -> Optional[str]:
+    """code with the contents of string, template and regex literals blanked (same length)"""
+    out = list(code)
+    i, n = 0, len(code)
+    previous, previous_word = '', ''
+    while i < n:
+        c = code[i]
+        if c in '"\'`':
+            end = _string_end(code, i, 'javascript')
+            if end is None:
+                return None
+            for j in range(i + 1, end - 1):
+                if out[j] != '\n':
+                    out[j] = ' '
+            i, previous, previous_word = end, c, ''
+            continue
+        if c == '/' and (previous in _REGEX_AFTER or previous == '' or previous_word in _REGEX_AFTER_WORDS):
+            j, in_class = i + 1, False
+            while j < n and code[j] != '\n':
+                if code[j] == '\\':
+                    j += 2
+                    continue
+                if code[j] == '[':
+                    in_class = True
+                elif code[j] == ']':
+                    in_class = False
+                elif code[j] == '/' and not in_class:
+                    break
+                j += 1
+            if j >= n or code[j] != '/':
+                return None
+            for k in range(i + 1, j):
+                out[k] = ' '
+            i, previous, previous_word = j + 1, '/', ''
+            continue
+        match = IDENTIFIER.match(code, i)
+        if match and not (i > 0 and (code[i - 1].isalnum() or code[i - 1] in '_$')):
+            previous, previous_word = 'w', match.group()
+            i = match.end()
+            continue
+        if not c.isspace():
+            previous, previous_word = c, ''
+        i += 1
+    return ''.join(out)
+
+
+def _matching(masked: str, start: int) -> int:
+    """Index just past the bracket closing the one at start, or -1"""
+    depth = 0
+    for i in range(start, len(masked)):
+        if masked[i] in '([{':
+            depth += 1
+        elif masked[i] in ')]}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+
+def _top_level_segments(masked: str):
+    """(start, end) of each top-level statement, split at lines that start at bracket depth 0"""
+    starts = [0]
+    depth = 0
+    for i, c in enumerate(masked):
+        if c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+        elif c == '\n' and depth == 0:
+            line = _LINE_START.match(masked, i + 1)
+            if line and line.group(1) not in _CONTINUATION and line.group(1) != '\n':
+                starts.append(i + 1)
+    if depth != 0:
+        return None
+    return list(zip(starts, starts[1:] + [len(masked)]))
+
+
+def _unit_end(masked: str, start: int, end: int) -> Optional[tuple]:
+    """(name, end of the declaration) if the segment declares a function or class"""
+    match = _JS_FUNCTION.match(masked, start, end)
+    if match:
+        params_end = _matching(masked, match.end() - 1)
+        body = masked.find('{', params_end, end) if params_end != -1 else -1
+        close = _matching(masked, body) if body != -1 else -1
+        return (match.group(1), close) if close != -1 else None
+
+    match = _JS_CLASS.match(masked, start, end)
+    if match:
+        close = _matching(masked, match.end() - 1)
+        return (match.group(1), close) if close != -1 else None
+
+    match = _JS_BOUND_FUNCTION.match(masked, start, end)
+    if not match:
+        return None
+    if match.group(2):
+        params_end = _matching(masked, match.end() - 1)
+        body = masked.find('{', params_end, end) if params_end != -1 else -1
+        close = _matching(masked, body) if body != -1 else -1
+        return (match.group(1), close) if close != -1 else None
+    if masked.startswith('{', match.end()):
+        close = _matching(masked, match.end())
+        return (match.group(1), close) if close != -1 else None
+
+    # Expression body: up to the first ';' at depth 0; a ',' there would
+    # declare more names in the same statement, so leave that to module code
+    depth = 0
+    for i in range(match.end(), end):
+        c = masked[i]
+        if c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+        elif depth == 0 and c == ',':
+            return None
+        elif depth == 0 and c == ';':
+            return match.group(1), i
+    return match.group(1), end
+
+
+def _javascript_units(code: str) -> Optional[CodeUnits]:
+    code = _strip_c_comments(code.replace('\r\n', '\n'), 'javascript')
+    masked = _mask_literals(code) if code is not None else None
+    segments = _top_level_segments(masked) if masked is not None else None
+    if segments is None:
+        return None
+
+    units = CodeUnits()
+    for start, end in segments:
+        declared = _unit_end(masked, start, end)
+        if declared is not None:
+            name, unit_end = declared
+            source = code[start:unit_end].strip()
+            units.add_unit(name, source, IDENTIFIER.findall(source))
+            if masked[start:unit_end].lstrip().startswith(('class', 'export class', 'export default class')):
+                units.state.add(name)
+            start = unit_end
+        rest = code[start:end].strip().lstrip(';').strip()
+        if rest:
+            units.module_parts.append(rest)
+            units.module_references.update(IDENTIFIER.findall(rest))
+            for declaration in _JS_DECLARATION.findall(masked[start:end]):
+                units.state.update(IDENTIFIER.findall(declaration))
+
+    # Names assigned without a declaration anywhere are implicit globals
+    declared = {name for declaration in _JS_DECLARATION.findall(masked) for name in IDENTIFIER.findall(declaration)}
+    units.state |= set(_JS_ASSIGNMENT.findall(masked)) - declared
+    return units
+
+
+# ----------------------------------------------------------------------
+# Analysis
+# ----------------------------------------------------------------------
+
+class TestImpact:
+    """Per-test dependency keys for one version of a program"""
+
+    def __init__(self, language: str, units: CodeUnits):
+        self.language = language
+        self.units = units
+        self.module_hash = _digest(*units.module_parts)
+
+        # state name -> units referencing it
+        self._users: Dict[str, Set[str]] = defaultdict(set)
+        for name, references in units.references.items():
+            for reference in references & units.state:
+                self._users[reference].add(name)
+
+    def reachable(self, roots: Iterable[str]) -> Set[str]:
+        """Units reachable from roots through references and shared state"""
+        units = self.units
+        seen: Set[str] = set()
+        pending = [root for root in roots if root in units.hashes or root in units.state]
+        module_added = False
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            pending.extend(reference for reference in units.references.get(name, ())
+                           if reference in units.hashes or reference in units.state)
+            if name in units.state:
+                pending.extend(self._users[name])
+                if not module_added:
+                    # Module-level code may also change this state before the tests run
+                    module_added = True
+                    pending.extend(reference for reference in units.module_references
+                                   if reference in units.hashes or reference in units.state)
+        return {name for name in seen if name in units.hashes}
+
+    def _key(self, kind: str, payload: str, roots: Iterable[str]) -> str:
+        reached = sorted(self.reachable(roots))
+        return _digest(kind, self.language, self.module_hash, payload,
+                       *(f"{name}:{self.units.hashes[name]}" for name in reached))
+
+    def test_key(self, test_case: dict) -> str:
+        """Key that changes whenever anything the test can reach changes"""
+        roots = IDENTIFIER.findall(f"{test_case.get('function_name', '')} {test_case.get('input_data', '')}")
+        return self._key('test', json.dumps(test_case, sort_keys=True, default=str), roots)
+
+    def program_key(self) -> str:
+        """Key for the program's own output (what module-level code prints)"""
+        return self._key('program', '', self.units.module_references)
+
+
+def analyze(code: str, language: str) -> Optional[TestImpact]:
+    """Dependency analysis for code, or None if the language isn't supported or the analysis can't be trusted"""
+    canonical = LANGUAGE_ALIASES.get(language.lower())
+    if canonical == 'python':
+        units = _python_units(code) if not PYTHON_DYNAMIC.search(code) else None
+    elif canonical == 'javascript':
+        units = _javascript_units(code) if not JAVASCRIPT_DYNAMIC.search(code) else None
+    else:
+        return None
+    if units is None:
+        logger.debug("No test impact analysis for this %s code", canonical)
+        return None
+    return TestImpact(canonical, units)
+
+
+class TestResultCache:
+    """
+    Size-bounded LRU of individual test results with a TTL, keyed on
+    TestImpact keys. Values are plain dicts (TestResult fields, or the
+    program's output/error/exit_code).
+    """
+
+    def __init__(self, max_entries: int = TEST_IMPACT_MAX_ENTRIES, ttl_seconds: int = TEST_IMPACT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (created_at, value), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry[1])
+
+    def put(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time(), dict(value))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, result: str, value: int = 1):
+        if value:
+            metrics.inc("scaffy_test_reuse_total", value,
+                        help_text="Tests whose result was reused (hit) or that had to run (miss)", result=result)
+
+
+# Singleton instance
+_test_result_cache = None
+
+def get_test_result_cache() -> TestResultCache:
+    """Get or create the per-test result cache"""
+    global _test_result_cache
+    if _test_result_cache is None:
+        _test_result_cache = TestResultCache()
+    return _test_result_cache
@@ -0,0 +1,169 @@
+/*
+ * Warm Node.js worker for the interpreter pool.
+ *
+ * Starts ahead of time, then reads one JSON job line from the request fd, runs
+ * the code in a vm context with a captured console, waits for the timers it
+ * scheduled to settle, writes one JSON result line to the response fd and
+ * exits. The vm context is not a security boundary: isolation comes from the
+ * worker being single-use and running as the sandbox user. It gets the
+ * globals of a CommonJS main module except require, so code that loads
+ * modules runs on the cold path instead (see POOL_UNSAFE in
+ * interpreter_pool.py).
+ *
+ * Usage: node node_worker.js <request_fd> <response_fd> <max_output>
+ */
+
+'use strict';
+
+const fs = require('fs');
+const readline = require('readline');
+const util = require('util');
+const vm = require('vm');
+
+const [requestFd, responseFd, maxOutput] = process.argv.slice(2).map(Number);
+
+function send(message) {
+  fs.writeSync(responseFd, JSON.stringify(message) + '\n');
+}
+
+// Drop the worker's own frames so traces look like a plain `node main.js` run
+function cleanStack(e) {
+  const text = (e && e.stack) || String(e);
+  const lines = text.split('\n');
+  const cut = lines.findIndex((line) => line.includes('node:vm') || line.includes('node_worker.js'));
+  return (cut === -1 ? lines : lines.slice(0, cut)).join('\n');
+}
+
+function makeConsole(out, err) {
+  const write = (sink) => (...args) => sink.push(util.format(...args) + '\n');
+  return {
+    log: write(out), info: write(out), debug: write(out), table: write(out),
+    error: write(err), warn: write(err), trace: write(err),
+  };
+}
+
+async function runJob(job) {
+  const out = [];
+  const err = [];
+  const deadline = Date.now() + (job.timeout || 10) * 1000;
+  const pending = new Set();
+  let exitCode = 0;
+  const start = process.hrtime.bigint();
+  const cpuStart = process.cpuUsage();
+
+  const result = () => {
+    const cpu = process.cpuUsage(cpuStart);
+    return {
+      output: out.join('').slice(0, maxOutput),
+      error: err.join('').slice(0, maxOutput),
+      exit_code: exitCode,
+      elapsed: Number(process.hrtime.bigint() - start) / 1e9,
+      cpu_ms: (cpu.user + cpu.system) / 1000,
+    };
+  };
+  // process.exit() replies and exits right away, like the real one: an
+  // exception would be caught by the student's own try/catch
+  const exit = (code) => {
+    exitCode = code === undefined ? exitCode : Number(code) || 0;
+    send(result());
+    process.exit(0);
+  };
+
+  // Timers are tracked so we can wait for async code to finish before replying
+  const track = (schedule) => (fn, ms, ...args) => {
+    const handle = schedule(() => {
+      pending.delete(handle);
+      try { fn(...args); } catch (e) { err.push(cleanStack(e) + '\n'); exitCode = 1; }
+    }, ms);
+    pending.add(handle);
+    return handle;
+  };
+  const untrack = (cancel) => (handle) => { pending.delete(handle); cancel(handle); };
+  const trackInterval = (fn, ms, ...args) => {
+    const handle = setInterval(() => {
+      try {
+        fn(...args);
+      } catch (e) {
+        err.push(cleanStack(e) + '\n');
+        exitCode = 1;
+        pending.delete(handle);
+        clearInterval(handle);
+      }
+    }, ms);
+    pending.add(handle);
+    return handle;
+  };
+  const module = { exports: {} };
+
+  const sandbox = {
+    console: makeConsole(out, err),
+    setTimeout: track(setTimeout),
+    clearTimeout: untrack(clearTimeout),
+    setImmediate: track((fn) => setImmediate(fn)),
+    clearImmediate: untrack(clearImmediate),
+    setInterval: trackInterval,
+    clearInterval: untrack(clearInterval),
+    queueMicrotask,
+    module,
+    exports: module.exports,
+    Buffer,
+    TextEncoder,
+    TextDecoder,
+    URL,
+    URLSearchParams,
+    atob,
+    btoa,
+    structuredClone,
+    performance: { now: () => performance.now() },
+    process: { argv: ['node', 'main.js'], env: {}, exit },
+  };
+  sandbox.globalThis = sandbox;
+  sandbox.global = sandbox;
+  const context = vm.createContext(sandbox);
+
+  const onRejection = (reason) => { err.push(cleanStack(reason) + '\n'); exitCode = 1; };
+  process.on('unhandledRejection', onRejection);
+  try {
+    vm.runInContext(job.code, context, {
+      filename: 'main.js',
+      timeout: Math.max(1, deadline - Date.now()),
+    });
+    // Let promise chains and tracked timers drain, up to the deadline
+    while (Date.now() < deadline) {
+      await new Promise((resolve) => setImmediate(resolve));
+      if (pending.size === 0) break;
+      await new Promise((resolve) => setTimeout(resolve, 1));
+    }
+    if (pending.size > 0) {
+      // Still running at the deadline: let the pool treat it as a timeout
+      return null;
+    }
+  } catch (e) {
+    if (e && e.code === 'ERR_SCRIPT_EXECUTION_TIMEOUT') {
+      return null;
+    } else {
+      err.push(cleanStack(e) + '\n');
+      exitCode = 1;
+    }
+  } finally {
+    process.off('unhandledRejection', onRejection);
+  }
+
+  return result();
+}
+
+async function main() {
+  const lines = readline.createInterface({ input: fs.createReadStream(null, { fd: requestFd }) });
+  send({ ready: true });
+  for await (const line of lines) {
+    const result = await runJob(JSON.parse(line));
+    if (result === null) {
+      // Timed out with work still scheduled; let the pool treat it as a timeout
+      process.exit(124);
+    }
+    send(result);
+    process.exit(0);  // One job per worker
+  }
+}
+
+main();
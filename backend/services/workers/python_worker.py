@@ -0,0 +1,90 @@
+"""
+Warm Python worker for the interpreter pool.
+
+Starts ahead of time, then reads one JSON job line from the request fd, runs
+the code in a __main__ namespace with stdin/stdout/stderr redirected to
+in-memory buffers, writes one JSON result line to the response fd and exits.
+A worker never runs a second job, so nothing a submission changes in the
+interpreter outlives it. The student's own stdout never touches the control
+channel.
+
+Usage: python -I python_worker.py <request_fd> <response_fd> <max_output>
+"""
+
+import builtins
+import io
+import json
+import os
+import resource
+import sys
+import time
+import traceback
+
+
+def _run(code: str, stdin: str, timeout: float, max_output: int) -> dict:
+    stdout, stderr = io.StringIO(), io.StringIO()
+    real_streams = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin, sys.stdout, sys.stderr = io.StringIO(stdin), stdout, stderr
+
+    # CPU time counts from process start, so the limit covers startup too
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_used = int(used.ru_utime + used.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_used + int(timeout) + 1, hard))
+
+    namespace = {'__name__': '__main__', '__builtins__': builtins}
+    exit_code = 0
+    start = time.perf_counter()
+    try:
+        exec(compile(code, 'main.py', 'exec'), namespace)
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            stderr.write(f"{e.code}\n")
+            exit_code = 1
+    except BaseException:
+        # Trim this worker's own frame so the traceback matches a normal run
+        etype, value, tb = sys.exc_info()
+        stderr.write(''.join(traceback.format_exception(etype, value, tb.tb_next)))
+        exit_code = 1
+    finally:
+        elapsed = time.perf_counter() - start
+        finished = resource.getrusage(resource.RUSAGE_SELF)
+        try:
+            sys.stdout.flush()
+        except Exception:
+            pass
+        sys.stdin, sys.stdout, sys.stderr = real_streams
+
+    return {
+        'output': stdout.getvalue()[:max_output],
+        'error': stderr.getvalue()[:max_output],
+        'exit_code': exit_code,
+        'elapsed': elapsed,
+        'cpu_ms': (finished.ru_utime + finished.ru_stime - used.ru_utime - used.ru_stime) * 1000,
+    }
+
+
+def main():
+    request_fd, response_fd, max_output = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+    requests = os.fdopen(request_fd, 'r', encoding='utf-8')
+    responses = os.fdopen(response_fd, 'w', encoding='utf-8', buffering=1)
+
+    # Keep the modules student code commonly imports warm
+    import collections, math, random, re, string, itertools, functools  # noqa: F401,E401
+
+    responses.write(json.dumps({'ready': True}) + '\n')
+    line = requests.readline()
+    if not line:
+        return
+    job = json.loads(line)
+    requests.close()  # The job is all this worker will ever read
+    result = _run(job['code'], job.get('stdin', ''), job.get('timeout', 10), max_output)
+    responses.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
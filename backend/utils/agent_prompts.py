@@ -217,6 +217,9 @@ SPECIAL OUTPUT MATCHING FOR C#/Java COMPLEX TESTS:
 - Exact match: "Expected output text" → Output must exactly match
 - Pattern match: "CONTAINS:word1,word2,word3" → Output must contain all these words/phrases
 - Count match: "COUNT:ThreadName:5" → Output must contain "ThreadName" exactly 5 times
+- Performance match: "MAXMS:200" → The call must finish within 200 ms; "MAXMS:200:42" → must also output 42
+  * Only for function tests where the assignment asks for an efficient algorithm; use a large input
+    and a generous limit (several times what an efficient solution needs), never for Main/integration tests
 
 CRITICAL - DETECTING AND TESTING NON-DETERMINISTIC CODE:
 
@@ -358,25 +361,77 @@ EXAMPLE VALID RESPONSE:
 [{{"test_name": "test_empty_input", "function_name": "reverse_string", "input_data": "\\"\\"", "expected_output": "\\"\\"", "description": "Handle empty string", "test_type": "edge"}}]"""
 
 
-def get_parser_prompt(assignment_text: str, target_language: str,
-                      known_language: str, experience_level: str) -> str:
-    """Parser for multi-file, multi-class assignments"""
+def compact_assignment_text(assignment_text: str) -> str:
+    """
+    Shrink assignment text before it goes into a prompt.
+    Runs of spaces inside lines are collapsed (indentation is kept) and runs
+    of blank lines are squeezed, while ``` fenced blocks (code and tables from structured PDF
+    extraction) are kept verbatim so indentation survives.
+    """
+    compacted = []
+    in_fence = False
+    blank_run = 0
+    for line in assignment_text.splitlines():
+        if line.lstrip().startswith('```'):
+            in_fence = not in_fence
+            compacted.append(line.strip())
+            blank_run = 0
+            continue
+        if in_fence:
+            compacted.append(line.rstrip())
+            continue
+        # Leading indentation is kept: pasted (unfenced) code still needs it
+        indent = line[:len(line) - len(line.lstrip())]
+        line = indent + ' '.join(line.split()) if line.strip() else ''
+        if not line:
+            blank_run += 1
+            if blank_run > 1:
+                continue
+        else:
+            blank_run = 0
+        compacted.append(line)
+    return '\n'.join(compacted).strip()
+
+
+def _template_facts_section(template_facts: dict) -> str:
+    """Render pre-extracted template structure as facts for the parser prompt"""
+    lines = [
+        "TEMPLATE STRUCTURE (already extracted from the assignment's code - do NOT re-derive it):",
+        f"- Classes: {', '.join(template_facts.get('class_names', [])) or 'none'}"
+    ]
+    for class_name, methods in template_facts.get('methods_by_class', {}).items():
+        if methods:
+            lines.append(f"- {class_name} methods: {', '.join(methods)}")
+    if template_facts.get('method_signatures'):
+        lines.append(f"- Global functions: {', '.join(template_facts['method_signatures'])}")
+    if template_facts.get('variable_names'):
+        lines.append(f"- Variables to preserve: {', '.join(template_facts['variable_names'])}")
+    lines.append("- Use these exact names. Put each class's methods in that class's \"method_signatures\".")
+    lines.append("- Set \"template_structure\" to null in your output; it is filled in for you.")
+    return "\n".join(lines) + "\n\n"
 
-    return f"""Parse this assignment into structured tasks for a student to complete.
 
-Assignment: {assignment_text}
-Language: {target_language}
-Student Level: {experience_level}
+def get_parser_prompt(assignment_text: str, target_language: str,
+                      known_language: str, experience_level: str,
+                      template_facts: dict = None) -> str:
+    """
+    Parser for multi-file, multi-class assignments
 
-YOUR JOB:
-1. Identify ALL files mentioned (code files, data files, config files, etc.)
-2. For each file, create tasks that the student needs to complete
-3. Break complex implementations into 20-40 minute chunks
-4. Detect if template/boilerplate code is provided in the assignment
+    template_facts: structure pre-extracted by utils.template_extractor. When
+    given, the model is handed the names as facts instead of being asked to
+    discover them, which keeps both the prompt and the response shorter.
+    """
 
-TEMPLATE DETECTION:
+    assignment_text = compact_assignment_text(assignment_text)
+
+    if template_facts and template_facts.get('has_template'):
+        template_section = _template_facts_section(template_facts)
+        template_example = ""
+    else:
+        template_section = """TEMPLATE DETECTION:
 - Template code = starter code provided in the assignment that students must complete
 - Look for code blocks, class definitions, method signatures in the assignment text
+- Blocks fenced with ``` are copied verbatim from the handout (```table blocks are tables) - read names from them exactly
 - If you find template code:
   * Set has_template: true
   * Extract exact class names: ["ClassName1", "ClassName2"]
@@ -391,10 +446,58 @@ TEMPLATE DETECTION:
 CRITICAL - METHOD SIGNATURE ASSIGNMENT:
 - If template provides methods INSIDE a class, put them in that class's "method_signatures" array
 - If template provides global functions (not in any class), put them in template_structure.method_signatures
-- Example: If you see "class Hotel {{ void UpdatePrice() {{...}} }}", put "UpdatePrice()" in Hotel's method_signatures
+- Example: If you see "class Hotel { void UpdatePrice() {...} }", put "UpdatePrice()" in Hotel's method_signatures
 - This helps preserve the exact structure students need to complete
 
-TASK BREAKDOWN STRATEGY:
+"""
+        template_example = """EXAMPLE - Correct Method Signature Assignment:
+If template provides:
+```
+class Hotel {
+  void UpdatePrice() { }
+  void ProcessOrder() { }
+}
+class TravelAgent {
+  void CreateOrder() { }
+}
+```
+
+Correct output:
+{
+  "template_structure": {
+    "has_template": true,
+    "class_names": ["Hotel", "TravelAgent"],
+    "method_signatures": []  // Empty - all methods belong to classes
+  },
+  "files": [{
+    "classes": [
+      {
+        "class_name": "Hotel",
+        "method_signatures": ["UpdatePrice()", "ProcessOrder()"]  // Hotel's methods HERE
+      },
+      {
+        "class_name": "TravelAgent",
+        "method_signatures": ["CreateOrder()"]  // TravelAgent's methods HERE
+      }
+    ]
+  }]
+}
+
+"""
+
+    return f"""Parse this assignment into structured tasks for a student to complete.
+
+Assignment: {assignment_text}
+Language: {target_language}
+Student Level: {experience_level}
+
+YOUR JOB:
+1. Identify ALL files mentioned (code files, data files, config files, etc.)
+2. For each file, create tasks that the student needs to complete
+3. Break complex implementations into 20-40 minute chunks
+4. Detect if template/boilerplate code is provided in the assignment
+
+{template_section}TASK BREAKDOWN STRATEGY:
 - Code files: Break into logical implementation tasks (setup, core logic, error handling, etc.)
 - Data files: Create tasks for populating them (e.g., "Create Hotels.xml with sample hotel data")
 - Config files: Create tasks for configuration (e.g., "Set up database connection in config.json")
@@ -449,40 +552,7 @@ KEY RULES:
 6. Include ALL files mentioned in assignment (don't skip data/config files)
 7. CRITICAL: Assign method_signatures to the CLASS they belong to, NOT globally
 
-EXAMPLE - Correct Method Signature Assignment:
-If template provides:
-```
-class Hotel {{
-  void UpdatePrice() {{ }}
-  void ProcessOrder() {{ }}
-}}
-class TravelAgent {{
-  void CreateOrder() {{ }}
-}}
-```
-
-Correct output:
-{{
-  "template_structure": {{
-    "has_template": true,
-    "class_names": ["Hotel", "TravelAgent"],
-    "method_signatures": []  // Empty - all methods belong to classes
-  }},
-  "files": [{{
-    "classes": [
-      {{
-        "class_name": "Hotel",
-        "method_signatures": ["UpdatePrice()", "ProcessOrder()"]  // Hotel's methods HERE
-      }},
-      {{
-        "class_name": "TravelAgent",
-        "method_signatures": ["CreateOrder()"]  // TravelAgent's methods HERE
-      }}
-    ]
-  }}]
-}}
-
-Return ONLY valid JSON."""
+{template_example}Return ONLY valid JSON."""
 
 def get_helper_prompt(task_description: str, concepts: list, student_code: str,
                       question: str, previous_hints: list, help_count: int,
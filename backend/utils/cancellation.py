@@ -0,0 +1,116 @@
+"""
+Cancellation helpers for code execution
+Stops work for clients that have gone away: cancel_on_disconnect cancels a
+request's coroutine once the client disconnects (see middleware/disconnect.py),
+and run_cancellable lets that cancellation reach blocking work running in a
+thread (e.g. kill the sandboxed process it is waiting on).
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from typing import Any, Awaitable, Callable, List
+
+from fastapi import Request
+
+from middleware.disconnect import DISCONNECT_EVENT_KEY
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# How often to check whether the client is still connected
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before the work finished"""
+
+
+class Cancellation:
+    """
+    Token passed to blocking work. The work registers callbacks that abort it
+    (e.g. kill a process group); cancel() runs them from any thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.cancelled = False
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Register callback; it runs immediately if already cancelled"""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancellation callback failed: {e}")
+
+
+async def run_cancellable(executor, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run fn(*args, cancellation=token, **kwargs) in executor. If the awaiting
+    task is cancelled, the token is cancelled too so fn stops its work.
+    """
+    cancellation = Cancellation()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, functools.partial(fn, *args, cancellation=cancellation, **kwargs))
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancellation.cancel()
+        raise
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[Any],
+                               poll_interval: float = DISCONNECT_POLL_INTERVAL) -> Any:
+    """
+    Await work, cancelling it if the client disconnects first. Uses the
+    event set by DisconnectWatchMiddleware, or polls request.is_disconnected()
+    when that middleware isn't installed.
+
+    Raises ClientDisconnected in that case.
+    """
+    task = asyncio.ensure_future(work)
+    disconnected = request.scope.get(DISCONNECT_EVENT_KEY)
+    try:
+        if disconnected is not None:
+            watcher = asyncio.ensure_future(disconnected.wait())
+            try:
+                await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                watcher.cancel()
+            if task.done():
+                return task.result()
+        else:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=poll_interval)
+                if done:
+                    return task.result()
+                if await request.is_disconnected():
+                    break
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+    metrics.inc("scaffy_cancelled_requests_total", help_text="Requests cancelled after the client disconnected",
+                route=request.url.path)
+    logger.info("Client disconnected; cancelled %s", request.url.path)
+    raise ClientDisconnected()
@@ -0,0 +1,190 @@
+"""
+Single-pass structural scan of generated code
+Tokenizes a snippet once - skipping comments and string literals - and
+reports class declarations, namespace declarations, brace depth, methods
+declared outside any type and TODO comments. Used to validate model output
+without re-running a regex per class name. TodoLocator maps each task's TODO
+texts to the lines of the generated file that hold them.
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HASH_COMMENT_LANGUAGES = {'python', 'py', 'ruby', 'rb', 'bash', 'shell', 'sh'}
+TEMPLATE_STRING_LANGUAGES = {'javascript', 'js', 'typescript', 'ts'}
+
+TYPE_KEYWORDS = ('class', 'interface', 'enum', 'struct', 'record')
+METHOD_MODIFIERS = r'(?:(?:static|virtual|override|abstract|final|async|sealed)\s+)*'
+
+_TODO_PREFIX = re.compile(r'^\s*TODO\s*:?\s*', re.IGNORECASE)
+
+
+def _keyword(word: str, rest: str) -> str:
+    """
+    Branch for a keyword followed by rest. Every branch of the token pattern
+    starts with a literal character so the regex engine can skip straight to
+    candidate positions; the word boundary is a lookbehind after that character.
+    """
+    return rf'{word[0]}(?<![\w.]{word[0]}){word[1:]}{rest}'
+
+
+_TOKEN_BRANCHES = {
+    'c_comment': [r'/(?:/[^\n]*|\*.*?(?:\*/|\Z))(?P<comment>)'],
+    'hash_comment': [r'#[^\n]*(?P<comment>)'],
+    # Strings carry no group (lastgroup None); triple-quoted and C# verbatim
+    # strings may span lines, the rest end at an unescaped quote or newline
+    'string': [
+        r'"(?:""(?:.*?)(?:"""|\Z)|(?:[^"\\\n]|\\.)*"?)',
+        r"'(?:''(?:.*?)(?:'''|\Z)|(?:[^'\\\n]|\\.)*'?)",
+        r'@"(?:[^"]|"")*"?',
+    ],
+    'template': [r'`(?:[^`\\]|\\.)*`?'],
+    'structure': [
+        _keyword('class', r'\s+(?P<class_name>[A-Za-z_]\w*)'),
+        _keyword('namespace', r'\s+(?P<namespace_name>[A-Za-z_][\w.]*)'),
+        *(_keyword(word, rf'\s+[A-Za-z_](?P<{word}>)') for word in TYPE_KEYWORDS[1:]),
+        *(_keyword(word, rf'\s+{METHOD_MODIFIERS}(?!(?:{"|".join(TYPE_KEYWORDS)})\b)'
+                         rf'[\w<>\[\]?,.]+\s+[A-Za-z_]\w*\s*\((?P<method_{word}>)')
+          for word in ('public', 'private', 'protected')),
+        r'\{(?P<open>)',
+        r'\}(?P<close>)',
+        r';(?P<end>)',
+    ],
+}
+
+_patterns: Dict[tuple, "re.Pattern"] = {}
+
+
+def _token_pattern(hash_comments: bool, template_strings: bool) -> "re.Pattern":
+    key = (hash_comments, template_strings)
+    if key not in _patterns:
+        branches = list(_TOKEN_BRANCHES['hash_comment' if hash_comments else 'c_comment'])
+        branches += _TOKEN_BRANCHES['string']
+        if template_strings:
+            branches += _TOKEN_BRANCHES['template']
+        branches += _TOKEN_BRANCHES['structure']
+        _patterns[key] = re.compile('|'.join(branches), re.DOTALL)
+    return _patterns[key]
+
+
+class CodeStructure:
+    """What scan_code found; offsets index into the scanned code"""
+
+    def __init__(self, code: str):
+        self.code = code
+        self.classes: Dict[str, List[int]] = {}  # Declared name -> offsets of its declarations
+        self.namespaces: Dict[str, int] = {}  # Namespace name -> declarations
+        self.methods_outside_class: List[int] = []  # Offsets of method declarations outside any type
+        self.todo_count = 0
+        self.max_depth = 0
+        self.depth = 0  # Brace depth at the end of the code; non-zero means unbalanced
+
+    def class_count(self, name: str) -> int:
+        """Declarations of class name (case-insensitive)"""
+        name = name.lower()
+        return sum(len(offsets) for declared, offsets in self.classes.items() if declared.lower() == name)
+
+    def class_offsets(self, name: str) -> List[int]:
+        name = name.lower()
+        return sorted(offset for declared, offsets in self.classes.items() if declared.lower() == name
+                      for offset in offsets)
+
+    def line_at(self, offset: int) -> tuple:
+        """(1-based line number, stripped line text) for an offset"""
+        start = self.code.rfind('\n', 0, offset) + 1
+        end = self.code.find('\n', offset)
+        return self.code.count('\n', 0, offset) + 1, self.code[start:None if end == -1 else end].strip()
+
+
+def scan_code(code: str, language: Optional[str] = None) -> CodeStructure:
+    """
+    Scan code once and return its CodeStructure.
+
+    language only decides the comment syntax (# for Python and shell, // and
+    /* */ otherwise) and whether backtick strings exist; None means C-like.
+    """
+    language = (language or '').lower()
+    pattern = _token_pattern(language in HASH_COMMENT_LANGUAGES, language in TEMPLATE_STRING_LANGUAGES)
+    structure = CodeStructure(code)
+
+    # Kind of each open brace block ('type', 'namespace' or 'block') and the
+    # kind the next '{' opens, set by a type/namespace keyword before it
+    blocks: List[str] = []
+    pending = 'block'
+    type_depth = 0
+
+    for match in pattern.finditer(code):
+        group = match.lastgroup
+        if group == 'open':
+            blocks.append(pending)
+            if pending == 'type':
+                type_depth += 1
+            pending = 'block'
+            if len(blocks) > structure.max_depth:
+                structure.max_depth = len(blocks)
+        elif group == 'close':
+            # Stray closing braces are ignored rather than driving depth negative
+            if blocks and blocks.pop() == 'type':
+                type_depth -= 1
+            pending = 'block'
+        elif group == 'end':
+            pending = 'block'
+        elif group == 'comment':
+            structure.todo_count += match.group().count('TODO')
+        elif group == 'class_name':
+            structure.classes.setdefault(match.group('class_name'), []).append(match.start())
+            pending = 'type'
+        elif group == 'namespace_name':
+            name = match.group('namespace_name')
+            structure.namespaces[name] = structure.namespaces.get(name, 0) + 1
+            pending = 'namespace'
+        elif group is None:
+            continue  # String literal
+        elif group.startswith('method_'):
+            if type_depth == 0:
+                structure.methods_outside_class.append(match.start())
+        else:
+            # interface, enum, struct, record
+            pending = 'type'
+
+    structure.depth = len(blocks)
+    return structure
+
+
+class TodoLocator:
+    """
+    Finds the lines of a file holding each task's TODOs.
+
+    The model returns every task's TODO texts separately from the code, in
+    task order, and the same text can appear under several tasks ("Return the
+    result"), so each search starts after the previous task's last match and
+    only wraps around to the top if it finds nothing there.
+    """
+
+    def __init__(self, code: str):
+        self.todo_lines = [(number, line) for number, line in enumerate(code.split('\n'), 1) if 'TODO' in line]
+        self._next = 0
+
+    def _find(self, text: str, start: int) -> Optional[int]:
+        for index in range(start, len(self.todo_lines)):
+            if text in self.todo_lines[index][1]:
+                return index
+        return None
+
+    def locate(self, todos: List[str]) -> Optional[Tuple[int, int]]:
+        """(first line, last line), 1-based, of the lines holding todos; None if none are found"""
+        found = []
+        for todo in todos:
+            text = _TODO_PREFIX.sub('', todo).strip()
+            if not text:
+                continue
+            index = self._find(text, self._next)
+            if index is None:
+                index = self._find(text, 0)
+            if index is not None:
+                found.append(self.todo_lines[index][0])
+                self._next = index + 1
+        return (min(found), max(found)) if found else None
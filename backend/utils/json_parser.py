@@ -2,6 +2,9 @@ import json
 import re
 import logging
 
+from utils.metrics import metrics
+from utils.tracing import span, set_attribute
+
 logger = logging.getLogger(__name__)
 
 def extract_json_from_response(response_text: str) -> dict:
@@ -12,44 +15,53 @@ def extract_json_from_response(response_text: str) -> dict:
     - Unescaped newlines in strings
     - Partial JSON objects
     """
-    logger.info(f"Extracting JSON from response (length: {len(response_text)})")
-    
-    # Step 1: Clean markdown if present
-    cleaned = _remove_markdown(response_text)
-    
-    # Step 2: Try direct parsing
-    result = _try_direct_parse(cleaned)
-    if result:
-        return result
-    
-    # Step 3: Try to fix and parse
-    fixed = _fix_json_issues(cleaned)
-    if fixed != cleaned:
-        result = _try_direct_parse(fixed)
+    logger.debug("Extracting JSON from response (length: %d)", len(response_text))
+
+    with span("json.extract", **{"json.response_chars": len(response_text)}):
+        # Step 1: Clean markdown if present
+        cleaned = _remove_markdown(response_text)
+
+        # Step 2: Try direct parsing
+        result = _try_direct_parse(cleaned)
         if result:
-            return result
-    
-    # Step 4: Extract and fix JSON object
-    json_obj = _extract_and_fix_json(response_text)
-    if json_obj:
-        return json_obj
-    
-    # Step 5: Handle truncated responses
-    if _is_truncated(response_text):
-        completed = _complete_truncated_json(response_text)
-        result = _try_direct_parse(completed)
+            return _record_strategy("direct", result)
+
+        # Step 3: Try to fix and parse
+        fixed = _fix_json_issues(cleaned)
+        if fixed != cleaned:
+            result = _try_direct_parse(fixed)
+            if result:
+                return _record_strategy("fixed", result)
+
+        # Step 4: Extract and fix JSON object
+        json_obj = _extract_and_fix_json(response_text)
+        if json_obj:
+            return _record_strategy("extract_and_fix", json_obj)
+
+        # Step 5: Handle truncated responses
+        if _is_truncated(response_text):
+            completed = _complete_truncated_json(response_text)
+            result = _try_direct_parse(completed)
+            if result:
+                logger.info("Successfully parsed after completing truncated JSON")
+                return _record_strategy("truncation_completed", result)
+
+        # Step 6: Last resort - find any valid JSON
+        result = _find_any_valid_json(response_text)
         if result:
-            logger.info("Successfully parsed after completing truncated JSON")
-            return result
-    
-    # Step 6: Last resort - find any valid JSON
-    result = _find_any_valid_json(response_text)
-    if result:
-        return result
-    
-    # Failed to extract JSON
-    logger.error(f"Could not extract valid JSON. First 500 chars: {response_text[:500]}")
-    raise ValueError("Could not extract valid JSON from AI response.")
+            return _record_strategy("any_valid", result)
+
+        # Failed to extract JSON
+        _record_strategy("failed", None)
+        logger.error(f"Could not extract valid JSON. First 500 chars: {response_text[:500]}")
+        raise ValueError("Could not extract valid JSON from AI response.")
+
+
+def _record_strategy(strategy: str, result):
+    """Tag the current span and count which recovery step produced the JSON"""
+    set_attribute("json.strategy", strategy)
+    metrics.inc("scaffy_json_extract_total", help_text="JSON extractions by recovery strategy", strategy=strategy)
+    return result
 
 
 def _remove_markdown(text: str) -> str:
@@ -65,15 +77,16 @@ def _try_direct_parse(text: str) -> dict | None:
     """Try to parse JSON directly"""
     try:
         result = json.loads(text)
-        if isinstance(result, dict):
-            logger.info(f"Successfully parsed JSON with keys: {list(result.keys())}")
-        elif isinstance(result, list):
-            logger.info(f"Successfully parsed JSON array with {len(result)} items")
-        else:
-            logger.info(f"Successfully parsed JSON of type: {type(result)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            if isinstance(result, dict):
+                logger.debug("Parsed JSON with keys: %s", list(result.keys()))
+            elif isinstance(result, list):
+                logger.debug("Parsed JSON array with %d items", len(result))
+            else:
+                logger.debug("Parsed JSON of type: %s", type(result))
         return result
     except json.JSONDecodeError as e:
-        logger.debug(f"Direct parse failed: {e}")
+        logger.debug("Direct parse failed: %s", e)
         return None
 
 
@@ -0,0 +1,149 @@
+"""
+Logging setup: text or JSON output, per-module levels, request context and
+sampled debug payloads.
+
+Records are handed to a QueueHandler and written by a QueueListener thread,
+so a slow stdout or log collector never blocks a request. Every record is
+stamped with the request id, route and trace id of the request that emitted it.
+
+Verbose payloads (prompt/response previews, per-file breakdowns, failed test
+dumps) should be guarded with payload_logging_enabled(logger) so they are only
+formatted for DEBUG-enabled loggers on the sampled fraction of requests.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from config import (
+    LOG_LEVEL, LOG_FORMAT, LOG_MODULE_LEVELS, LOG_QUEUE_SIZE, LOG_DEBUG_SAMPLE_RATE
+)
+from utils.tracing import current_trace_id
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("scaffy_request_id", default=None)
+route_var: contextvars.ContextVar = contextvars.ContextVar("scaffy_route", default=None)
+debug_sampled_var: contextvars.ContextVar = contextvars.ContextVar("scaffy_debug_sampled", default=False)
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request id, route and trace id"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        record.route = route_var.get() or "-"
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including request context and `extra=` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler that renders the message and traceback in the calling thread
+    (arguments may not be safe to touch later) but leaves final formatting,
+    and all I/O, to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Dropping a log line beats stalling the request that emitted it
+            pass
+
+
+def configure_logging():
+    """Install the queue-backed root handler and per-module levels (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = _ContextQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    for module, level in LOG_MODULE_LEVELS.items():
+        logging.getLogger(module.strip()).setLevel(level.strip().upper())
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def bind_request_context(request_id: str, route: str):
+    """Set the request context for this task; returns tokens for reset_request_context"""
+    return (
+        request_id_var.set(request_id),
+        route_var.set(route),
+        debug_sampled_var.set(random.random() < LOG_DEBUG_SAMPLE_RATE),
+    )
+
+
+def reset_request_context(tokens):
+    request_token, route_token, sampled_token = tokens
+    request_id_var.reset(request_token)
+    route_var.reset(route_token)
+    debug_sampled_var.reset(sampled_token)
+
+
+def payload_logging_enabled(logger: logging.Logger) -> bool:
+    """
+    True when verbose debug payloads should be logged: the logger has DEBUG
+    enabled and this request was sampled (or we're outside any request).
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    return request_id_var.get() is None or debug_sampled_var.get()
+
+
+def get_request_id() -> str:
+    return request_id_var.get()
@@ -0,0 +1,88 @@
+"""
+In-process metrics with Prometheus text exposition
+Counters and histograms fed by the tracing layer and rendered by /metrics.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, Tuple
+
+# Latency buckets in seconds: spans range from sub-millisecond JSON parsing to
+# minute-long model calls
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: LabelKey, extra: Dict[str, str] = None) -> str:
+    pairs = list(key) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: defaultdict(float))
+        self._histograms = defaultdict(dict)
+        self._help = {}
+
+    def inc(self, name: str, value: float = 1.0, help_text: str = '', **labels):
+        """Increment a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            self._counters[name][key] += value
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def observe(self, name: str, value: float, help_text: str = '', buckets=DURATION_BUCKETS, **labels):
+        """Record one observation in a histogram"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms[name].get(key)
+            if series is None:
+                series = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+                self._histograms[name][key] = series
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+            if help_text:
+                self._help.setdefault(name, help_text)
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, data in sorted(series.items()):
+                    for bound, count in zip(data['buckets'], data['counts']):
+                        lines.append(f"{name}_bucket{_format_labels(key, {'le': f'{bound:g}'})} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {data['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {data['sum']:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {data['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+# Singleton instance
+metrics = MetricsRegistry()
@@ -2,6 +2,7 @@
 Security validation utilities
 """
 import re
+from typing import List, Tuple
 from fastapi import HTTPException
 from config import (
     MAX_ASSIGNMENT_TEXT_LENGTH,
@@ -16,6 +17,15 @@ from config import (
     ALLOWED_CODE_EXTENSIONS
 )
 
+# Blocked patterns, prepared once. Text is case-folded and searched with
+# str.find per pattern: CPython's re has no multi-literal search, so one
+# alternation regex scans 5-20x slower than these C-level searches (see
+# benchmarks/bench_security.py). Case folding also maps look-alikes such as
+# 'ſ' to 's', as Python's identifier normalization does. The rare text whose
+# length changes when folded (e.g. it contains 'İ' or 'ß') is searched the
+# same way, with a map back to the original offsets.
+_BLOCKED_FOLDED = tuple((pattern.casefold(), pattern) for pattern in BLOCKED_PATTERNS)
+
 
 def validate_text_length(text: str, max_length: int, field_name: str = "Text"):
     """Validate text input length"""
@@ -46,6 +56,30 @@ def validate_hint_question(question: str):
     return validate_text_length(question, MAX_HINT_QUESTION_LENGTH, "Question")
 
 
+def find_malicious_patterns(text: str) -> List[Tuple[int, str]]:
+    """
+    Find every blocked pattern in text
+
+    Returns:
+        (offset, pattern) for each match in order of appearance; pattern is
+        the entry from BLOCKED_PATTERNS, whatever case the text used
+    """
+    folded = text.casefold()
+    matches = []
+    for needle, pattern in _BLOCKED_FOLDED:
+        offset = folded.find(needle)
+        while offset != -1:
+            matches.append((offset, pattern))
+            offset = folded.find(needle, offset + len(needle))
+
+    if matches and len(folded) != len(text):
+        # Map offsets in folded back to text; casefold maps each character on its own
+        offsets = [index for index, char in enumerate(text) for _ in char.casefold()]
+        matches = [(offsets[offset], pattern) for offset, pattern in matches]
+    matches.sort()
+    return matches
+
+
 def check_malicious_content(text: str, check_type: str = "text"):
     """
     Check for potentially malicious content patterns
@@ -57,14 +91,15 @@ def check_malicious_content(text: str, check_type: str = "text"):
     Returns:
         True if safe, raises HTTPException if suspicious
     """
-    text_lower = text.lower()
-
-    for pattern in BLOCKED_PATTERNS:
-        if pattern.lower() in text_lower:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Content contains potentially unsafe pattern: '{pattern}'. Please review your {check_type}."
-            )
+    matches = find_malicious_patterns(text)
+    if matches:
+        patterns = list(dict.fromkeys(pattern for _, pattern in matches))
+        listed = ', '.join(f"'{pattern}'" for pattern in patterns)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Content contains potentially unsafe pattern{'s' if len(patterns) > 1 else ''}: {listed}. "
+                   f"Please review your {check_type}."
+        )
 
     return True
 
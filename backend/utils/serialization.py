@@ -0,0 +1,63 @@
+"""
+JSON serialization for API responses and stored results
+Responses carry large nested schemas (a starter-code batch repeats the full
+file's code in every task), so they are encoded with orjson and, on the hot
+endpoints, straight from the model to JSON bytes by a cached pydantic
+TypeAdapter - no intermediate dicts, no re-validation of a model the handler
+just built, no second encoding pass.
+"""
+
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # Listed in requirements.txt; plain json keeps the API working without it
+    orjson = None
+    logger.warning("orjson is not installed, falling back to the standard json encoder")
+
+# Default response class for the app
+DefaultJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+
+@lru_cache(maxsize=None)
+def get_adapter(schema: Any) -> TypeAdapter:
+    """The TypeAdapter for schema, built (and its validator/serializer compiled) once"""
+    return TypeAdapter(schema)
+
+
+def dumps(value: Any) -> bytes:
+    """Encode plain JSON-compatible data"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def model_response(value: Any, schema: Any, status_code: int = 200,
+                   headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serialize value as schema in one pass and wrap it in a JSON response.
+
+    value may already be an instance of schema (a model the handler built) or
+    plain data (a dict from a service), which is validated first - the same
+    check FastAPI's response_model would make. Keep response_model on the
+    route for the OpenAPI docs.
+    """
+    adapter = get_adapter(schema)
+    if not (isinstance(schema, type) and isinstance(value, schema)):
+        value = adapter.validate_python(value)
+    return Response(content=adapter.dump_json(value), status_code=status_code,
+                    headers=headers, media_type="application/json")
@@ -0,0 +1,55 @@
+"""
+Server-owned files on disk
+The PDF cache, job database and trace file hold assignment text, generated
+code and request details. Sandboxed student code runs as another local user
+(see services/sandbox.py), so these live in directories only the server can
+enter and are created readable by the server alone.
+"""
+
+import os
+import stat
+
+
+def _makedirs(path: str, mode: int):
+    """os.makedirs(), but missing parents get mode too rather than the default 0777"""
+    parent = os.path.dirname(path)
+    if parent and parent != path and not os.path.isdir(parent):
+        _makedirs(parent, mode)
+    try:
+        os.mkdir(path, mode)
+    except FileExistsError:
+        pass
+
+
+def ensure_dir(path: str, mode: int = 0o700) -> str:
+    """
+    Create path (missing parents are created 0700) and set its mode. Refuses
+    a directory that belongs to another user - e.g. one planted in a shared
+    temp dir.
+    """
+    _makedirs(path, 0o700)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid():
+        raise PermissionError(f"{path} is not a directory owned by the server's user")
+    if stat.S_IMODE(info.st_mode) != mode:
+        os.chmod(path, mode)
+    return path
+
+
+def ensure_parent(path: str):
+    """Create the missing directories above a private file, 0700 each; existing ones are left alone"""
+    parent = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(parent):
+        _makedirs(parent, 0o700)
+
+
+def open_private(path: str, flags: int) -> int:
+    """os.open() for a file only the server may read (created 0600, never through a symlink)"""
+    fd = os.open(path, flags | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600)
+    try:
+        # Files created by older versions, or under a looser umask
+        os.fchmod(fd, 0o600)
+    except OSError:
+        os.close(fd)
+        raise
+    return fd
@@ -0,0 +1,302 @@
+"""
+Deterministic template-structure extraction
+Finds code snippets in assignment text and pulls out class names, method
+signatures and variable names without asking the model. Python snippets are
+parsed with ast; C-like languages (Java, C#, C++, JavaScript, ...) use a
+brace-depth aware regex scan.
+"""
+
+import ast
+import logging
+import re
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FENCE_RE = re.compile(r'^```([\w+#-]*)[^\n]*\n(.*?)^```', re.MULTILINE | re.DOTALL)
+
+# Unfenced code detection: a line that only makes sense as code
+CODE_LINE_RE = re.compile(
+    r'^\s*(?:'
+    r'(?:public|private|protected|internal|static|abstract|final|sealed)\b.*[({;]\s*$'
+    r'|(?:class|struct|interface)\s+\w+.*[:{]\s*$'
+    r'|def\s+\w+\s*\(.*\)\s*(?:->.*)?:\s*$'
+    r'|function\s+\w+\s*\(.*\)\s*\{?\s*$'
+    r'|#include\s*[<"]'
+    r'|(?:import|using|package)\s+[\w.]+.*;?\s*$'
+    r'|[}{]\s*;?\s*$'
+    r'|.*\)\s*\{\s*$'
+    r')'
+)
+
+C_MODIFIERS = (
+    'public', 'private', 'protected', 'internal', 'static', 'final', 'abstract',
+    'virtual', 'override', 'async', 'sealed', 'synchronized', 'extern', 'inline',
+    'const', 'readonly', 'volatile', 'export', 'default', 'unsafe', 'new'
+)
+CONTROL_KEYWORDS = {
+    'if', 'for', 'foreach', 'while', 'switch', 'catch', 'return', 'new', 'else',
+    'do', 'try', 'using', 'lock', 'throw', 'sizeof', 'typeof', 'nameof', 'function',
+    'import', 'package', 'case', 'break', 'continue', 'yield', 'await', 'delete'
+}
+
+NAMESPACE_RE = re.compile(r'^\s*namespace\s+([\w.]+)')
+CLASS_RE = re.compile(r'\b(?:class|struct|interface)\s+([A-Za-z_]\w*)')
+METHOD_RE = re.compile(
+    r'^\s*(?:(?:' + '|'.join(C_MODIFIERS) + r')\s+)*'
+    r'(?:[\w<>\[\],.?*&:]+\s+)*?'           # return type (absent for constructors / JS methods)
+    r'(?:function\s+)?'
+    r'([A-Za-z_]\w*)\s*\(([^()]*)\)\s*'
+    r'(?:const\s*)?(?:throws\s+[\w\s,.]+)?(?::\s*[\w<>\[\]|, .]+)?\s*(?:\{|;|=>|$)'
+)
+JS_ARROW_RE = re.compile(r'^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?\(([^()]*)\)\s*=>')
+C_FIELD_RE = re.compile(
+    r'^\s*(?:(?:' + '|'.join(C_MODIFIERS) + r')\s+)*'
+    r'(?:(?:let|const|var)\s+|[\w<>\[\],.?*&:]+\s+)'
+    r'([A-Za-z_]\w*)\s*(?:=[^=>].*)?;\s*$'
+)
+
+
+def find_code_blocks(text: str) -> List[str]:
+    """
+    Find code snippets in assignment text.
+    Fenced ``` blocks win (structured PDF extraction emits them); otherwise
+    runs of code-looking lines are collected.
+    """
+    fenced = [body for lang, body in FENCE_RE.findall(text) if lang.lower() != 'table']
+    if fenced:
+        return fenced
+
+    blocks = []
+    current = []
+    for line in text.splitlines():
+        looks_like_code = bool(CODE_LINE_RE.match(line))
+        # Indented lines continue a block that is already open
+        continues_block = current and (line.startswith((' ', '\t')) or not line.strip())
+        if looks_like_code or continues_block:
+            current.append(line)
+        elif current:
+            blocks.append('\n'.join(current))
+            current = []
+    if current:
+        blocks.append('\n'.join(current))
+
+    # A single stray brace or import line is not a template
+    return [block for block in blocks if len(block.strip().splitlines()) >= 2]
+
+
+def _format_signature(name: str, params: str) -> str:
+    return f"{name}({' '.join(params.split())})"
+
+
+def _python_params(args: ast.arguments) -> str:
+    """Parameter list without annotations, keeping default values as written"""
+    def param(arg: ast.arg, default: Optional[ast.expr]) -> str:
+        return arg.arg if default is None else f"{arg.arg}={ast.unparse(default)}"
+
+    positional = args.posonlyargs + args.args
+    # defaults line up with the last positional parameters
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    names = [param(arg, default) for arg, default in zip(positional, defaults)]
+    if positional and positional[0].arg in ('self', 'cls'):
+        names = names[1:]
+    if args.vararg:
+        names.append('*' + args.vararg.arg)
+    elif args.kwonlyargs:
+        names.append('*')
+    names.extend(param(arg, default) for arg, default in zip(args.kwonlyargs, args.kw_defaults))
+    if args.kwarg:
+        names.append('**' + args.kwarg.arg)
+    return ', '.join(names)
+
+
+def _parse_python_source(block: str) -> Optional[ast.Module]:
+    """Parse a Python snippet, patching empty bodies (common in templates)"""
+    try:
+        return ast.parse(block)
+    except SyntaxError:
+        pass
+
+    # Templates often leave bodies empty ("def f():" followed by a comment)
+    lines = block.splitlines()
+    patched = []
+    for i, line in enumerate(lines):
+        patched.append(line)
+        if line.rstrip().endswith(':') and not line.lstrip().startswith('#'):
+            indent = len(line) - len(line.lstrip())
+            following = [l for l in lines[i + 1:] if l.strip() and not l.lstrip().startswith('#')]
+            if not following or len(following[0]) - len(following[0].lstrip()) <= indent:
+                patched.append(' ' * (indent + 4) + 'pass')
+    try:
+        return ast.parse('\n'.join(patched))
+    except SyntaxError:
+        return None
+
+
+def _extract_python(block: str, structure: Dict):
+    tree = _parse_python_source(block)
+    if tree is None:
+        return False
+
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            methods = structure['methods_by_class'].setdefault(node.name, [])
+            if node.name not in structure['class_names']:
+                structure['class_names'].append(node.name)
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    methods.append(_format_signature(item.name, _python_params(item.args)))
+                    # Instance attributes assigned on self
+                    for sub in ast.walk(item):
+                        if (isinstance(sub, ast.Attribute) and isinstance(sub.ctx, ast.Store)
+                                and isinstance(sub.value, ast.Name) and sub.value.id == 'self'):
+                            structure['variable_names'].append(sub.attr)
+                elif isinstance(item, (ast.Assign, ast.AnnAssign)):
+                    targets = item.targets if isinstance(item, ast.Assign) else [item.target]
+                    structure['variable_names'].extend(t.id for t in targets if isinstance(t, ast.Name))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            structure['method_signatures'].append(_format_signature(node.name, _python_params(node.args)))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            structure['variable_names'].extend(t.id for t in targets if isinstance(t, ast.Name))
+    return True
+
+
+def _strip_c_line(line: str, in_block_comment: bool):
+    """Remove comments and string literal contents from one line of C-like code"""
+    out = []
+    i = 0
+    quote = None
+    while i < len(line):
+        ch = line[i]
+        if in_block_comment:
+            if line.startswith('*/', i):
+                in_block_comment = False
+                i += 2
+                continue
+            i += 1
+            continue
+        if quote:
+            if ch == '\\':
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+                out.append(ch)
+            i += 1
+            continue
+        if line.startswith('//', i):
+            break
+        if line.startswith('/*', i):
+            in_block_comment = True
+            i += 2
+            continue
+        if ch in '"\'`':
+            quote = ch
+        out.append(ch)
+        i += 1
+    return ''.join(out), in_block_comment
+
+
+def _extract_c_like(block: str, structure: Dict):
+    depth = 0
+    in_block_comment = False
+    # Stack of (kind, name, body depth); namespaces are transparent scopes
+    scope_stack = []
+    pending_scope = None
+
+    for raw_line in block.splitlines():
+        line, in_block_comment = _strip_c_line(raw_line, in_block_comment)
+        if not line.strip():
+            continue
+
+        scope = scope_stack[-1] if scope_stack and scope_stack[-1][2] == depth else None
+        current_class = scope[1] if scope and scope[0] == 'class' else None
+        at_top_level = depth == 0 or (scope is not None and scope[0] == 'namespace')
+
+        namespace_match = NAMESPACE_RE.search(line)
+        class_match = CLASS_RE.search(line)
+        if namespace_match:
+            pending_scope = ('namespace', namespace_match.group(1))
+        elif class_match:
+            pending_scope = ('class', class_match.group(1))
+            if class_match.group(1) not in structure['class_names']:
+                structure['class_names'].append(class_match.group(1))
+            structure['methods_by_class'].setdefault(class_match.group(1), [])
+        elif (current_class or at_top_level) and line.split()[0] not in CONTROL_KEYWORDS:
+            method_match = METHOD_RE.match(line) or JS_ARROW_RE.match(line)
+            if method_match and method_match.group(1) not in CONTROL_KEYWORDS:
+                signature = _format_signature(method_match.group(1), method_match.group(2))
+                if current_class:
+                    structure['methods_by_class'][current_class].append(signature)
+                else:
+                    structure['method_signatures'].append(signature)
+            else:
+                field_match = C_FIELD_RE.match(line)
+                if field_match:
+                    structure['variable_names'].append(field_match.group(1))
+
+        for ch in line:
+            if ch == '{':
+                depth += 1
+                if pending_scope:
+                    scope_stack.append((pending_scope[0], pending_scope[1], depth))
+                    pending_scope = None
+            elif ch == '}':
+                if scope_stack and scope_stack[-1][2] == depth:
+                    scope_stack.pop()
+                depth = max(depth - 1, 0)
+    return True
+
+
+def _dedupe(items: List[str]) -> List[str]:
+    seen = set()
+    return [x for x in items if not (x in seen or seen.add(x))]
+
+
+def extract_template_structure(assignment_text: str, language: str = None) -> Dict:
+    """
+    Extract template structure from code snippets in an assignment.
+
+    Returns:
+        Dict with has_template, class_names, variable_names, method_signatures
+        (global functions) and methods_by_class (class name -> signatures),
+        shaped like the parser's template_structure.
+    """
+    structure = {
+        'has_template': False,
+        'class_names': [],
+        'variable_names': [],
+        'method_signatures': [],
+        'methods_by_class': {}
+    }
+
+    blocks = find_code_blocks(assignment_text or '')
+    if not blocks:
+        return structure
+
+    is_python = (language or '').lower() in ('python', 'py', 'python3')
+    for block in blocks:
+        looks_python = is_python or (
+            re.search(r'^\s*(?:def|class)\s+\w+.*:\s*$', block, re.MULTILINE) and '{' not in block
+        )
+        if not (looks_python and _extract_python(block, structure)):
+            _extract_c_like(block, structure)
+
+    structure['class_names'] = _dedupe(structure['class_names'])
+    structure['variable_names'] = _dedupe(structure['variable_names'])
+    structure['method_signatures'] = _dedupe(structure['method_signatures'])
+    structure['methods_by_class'] = {
+        cls: _dedupe(methods) for cls, methods in structure['methods_by_class'].items()
+    }
+    structure['has_template'] = bool(
+        structure['class_names'] or structure['method_signatures']
+    )
+
+    if structure['has_template']:
+        logger.info(
+            f"Pre-extracted template: {len(structure['class_names'])} classes, "
+            f"{len(structure['method_signatures'])} global functions, "
+            f"{len(structure['variable_names'])} variables"
+        )
+    return structure
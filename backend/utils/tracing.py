@@ -0,0 +1,208 @@
+"""
+Per-request tracing and stage timing
+
+Lightweight spans that follow the OpenTelemetry data model (trace/span ids,
+parent links, attributes, status) and are exported as OTLP-style JSON lines
+to a local file or the console. With TRACE_EXPORTER=otel and the
+opentelemetry SDK installed, spans are mirrored to the configured OTel tracer
+instead. Every finished span also feeds utils.metrics, which backs /metrics.
+
+Usage:
+    with span("prompt.build", agent="parser"):
+        prompt = get_parser_prompt(...)
+    set_attribute("json.strategy", "direct")
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from config import TRACE_EXPORTER, TRACE_FILE, TRACE_FILE_MAX_BYTES, TRACE_QUEUE_MAX_SPANS
+from utils.metrics import metrics
+from utils.storage import ensure_parent, open_private
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("scaffy_current_span", default=None)
+
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+        "attributes", "status", "error", "_otel_span"
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Dict[str, Any] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.error = None
+        self._otel_span = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    @property
+    def duration_seconds(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_seconds * 1000, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.error},
+        }
+
+
+class _SpanExporter:
+    """
+    Writes finished spans as JSON lines from a background thread.
+
+    The queue is bounded so a stalled writer drops spans rather than holding
+    them in memory, and the file is rotated to path + ".1" once it reaches
+    max_bytes, so at most two files' worth of traces are kept on disk.
+    """
+
+    def __init__(self, target: str, path: str = None, max_bytes: int = TRACE_FILE_MAX_BYTES,
+                 max_queued: int = TRACE_QUEUE_MAX_SPANS):
+        self.target = target
+        self.path = path
+        self.max_bytes = max_bytes
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            metrics.inc("scaffy_trace_spans_dropped_total", help_text="Spans dropped because the exporter fell behind")
+
+    def _open(self):
+        if self.target != "file":
+            return sys.stderr
+        try:
+            ensure_parent(self.path)
+            fd = open_private(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+            return open(fd, "a", encoding="utf-8", buffering=1)
+        except OSError as e:
+            logger.warning(f"Cannot open trace file {self.path}, tracing to console: {e}")
+            self.target = "console"
+            return sys.stderr
+
+    def _rotate(self, stream):
+        stream.close()
+        try:
+            os.replace(self.path, self.path + ".1")
+        except OSError as e:
+            logger.debug(f"Failed to rotate trace file: {e}")
+        return self._open()
+
+    def _run(self):
+        stream = self._open()
+        written = stream.tell() if self.target == "file" else 0
+        while True:
+            span = self._queue.get()
+            try:
+                line = json.dumps(span.to_dict(), default=str) + "\n"
+                if self.target == "file" and written + len(line) > self.max_bytes and written:
+                    stream = self._rotate(stream)
+                    written = 0
+                stream.write(line)
+                written += len(line)
+            except Exception as e:  # never let tracing take the process down
+                logger.debug(f"Failed to export span: {e}")
+
+
+def _init_otel():
+    try:
+        from opentelemetry import trace as otel_trace
+    except ImportError:
+        logger.warning("TRACE_EXPORTER=otel but opentelemetry is not installed; tracing to file")
+        return None
+    return otel_trace.get_tracer("scaffy")
+
+
+_exporter = None
+_otel_tracer = None
+if TRACE_EXPORTER == "otel":
+    _otel_tracer = _init_otel()
+if TRACE_EXPORTER in ("file", "console") or (TRACE_EXPORTER == "otel" and _otel_tracer is None):
+    _exporter = _SpanExporter("console" if TRACE_EXPORTER == "console" else "file", TRACE_FILE)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Open a child span of the current span (or a new trace) for the with-block"""
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+
+    otel_context = None
+    if _otel_tracer is not None:
+        otel_context = _otel_tracer.start_as_current_span(name, attributes=attributes)
+        current._otel_span = otel_context.__enter__()
+
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "ERROR"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if otel_context is not None:
+            otel_context.__exit__(None, None, None)
+        _finish(current)
+
+
+def _finish(finished: Span):
+    metrics.observe(
+        "scaffy_stage_duration_seconds", finished.duration_seconds,
+        help_text="Duration of traced stages", stage=finished.name, status=finished.status
+    )
+    if _exporter is not None:
+        _exporter.export(finished)
+
+
+def current_span() -> Optional[Span]:
+    """The span active in this context, if any"""
+    return _current_span.get()
+
+
+def set_attribute(key: str, value: Any):
+    """Set an attribute on the current span; a no-op outside any span"""
+    active = _current_span.get()
+    if active is not None:
+        active.set_attribute(key, value)
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current_span.get()
+    return active.trace_id if active else None
@@ -6,18 +6,40 @@ export const API_CONFIG = {
   timeout: 30000, // 30 seconds
 };
 
+// POSTs to these endpoints carry an Idempotency-Key derived from the request,
+// so a retry or double click gets the response of the request already sent
+// instead of paying for another model call. Parsing and scaffolding go through
+// /jobs/*, where the server already joins a repeat to the running job
+const IDEMPOTENT_ENDPOINTS = ['/generate-tests', '/get-hint'];
+
+// Per page load, so only this tab's own repeats share a key
+const SESSION_ID = globalThis.crypto?.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+async function idempotencyKey(endpoint: string, options: RequestInit): Promise<string | null> {
+  if (options.method !== 'POST' || !IDEMPOTENT_ENDPOINTS.includes(endpoint) || typeof options.body !== 'string') {
+    return null;
+  }
+  // crypto.subtle is only available in secure contexts (https, localhost)
+  if (!globalThis.crypto?.subtle) return null;
+  const data = new TextEncoder().encode(`${SESSION_ID}\n${endpoint}\n${options.body}`);
+  const digest = await crypto.subtle.digest('SHA-256', data);
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+}
+
 // Helper function for API calls
 async function apiCall<T>(
   endpoint: string,
   options: RequestInit = {}
 ): Promise<T> {
   const url = `${API_CONFIG.baseURL}${endpoint}`;
+  const key = await idempotencyKey(endpoint, options);
   
   try {
     const response = await fetch(url, {
       ...options,
       headers: {
         'Content-Type': 'application/json',
+        ...(key ? { 'Idempotency-Key': key } : {}),
         ...options.headers,
       },
     });
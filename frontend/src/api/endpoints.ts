@@ -2,7 +2,7 @@ import apiCall from "./client";
 import type {
   TaskBreakdownSchema,
   TaskSchema,
-  StarterCode,
+  BatchScaffoldResponse,
   HintSchema,
   ParserOutput,
   ScaffoldPackage,
@@ -11,6 +11,52 @@ import type {
   TestCase,
 } from "../types";
 
+// Parsing and starter code generation can outlast request and proxy timeouts,
+// so they run as background jobs: the POST returns a job id at once and the
+// result is polled for. Re-posting the same request attaches to the same job.
+const JOB_POLL_INTERVAL_MS = 1500;
+const JOB_POLL_MAX_FAILURES = 5; // Consecutive failed polls before giving up
+
+interface JobStatus<T> {
+  job_id: string;
+  status: "queued" | "running" | "succeeded" | "failed";
+  result: T | null;
+  partial: Record<string, unknown>;
+  completed: number;
+  total: number;
+  error: string | null;
+  status_code: number | null;
+}
+
+async function runJob<T>(
+  kind: string,
+  body: unknown,
+  onUpdate?: (job: JobStatus<T>) => void
+): Promise<T> {
+  let job = await apiCall<JobStatus<T>>(`/jobs/${kind}`, {
+    method: "POST",
+    body: JSON.stringify(body),
+  });
+
+  let failures = 0;
+  while (job.status === "queued" || job.status === "running") {
+    onUpdate?.(job);
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    try {
+      job = await apiCall<JobStatus<T>>(`/jobs/${job.job_id}`, { method: "GET" });
+      failures = 0;
+    } catch (error) {
+      // The job keeps running on the server; ride out brief network drops
+      if (++failures >= JOB_POLL_MAX_FAILURES) throw error;
+    }
+  }
+
+  if (job.status === "failed" || job.result === null) {
+    throw new Error(`API Error: ${job.status_code ?? 500} - ${job.error ?? "Job failed"}`);
+  }
+  return job.result;
+}
+
 // Health check
 export async function checkHealth(): Promise<{
   status: string;
@@ -30,18 +76,16 @@ export async function parseAssignment(
   knownLanguage?: string,
   experienceLevel: string = "intermediate"
 ): Promise<ParserOutput> {
-  return apiCall<ParserOutput>("/parse-assignment", {
-    method: "POST",
-    body: JSON.stringify({
-      assignment_text: assignmentText,
-      target_language: targetLanguage,
-      known_language: knownLanguage || null,
-      experience_level: experienceLevel,
-    }),
+  return runJob<ParserOutput>("parse-assignment", {
+    assignment_text: assignmentText,
+    target_language: targetLanguage,
+    known_language: knownLanguage || null,
+    experience_level: experienceLevel,
   });
 }
 
-// Generate starter code - matches backend /generate-starter-code endpoint (UPDATED FOR MULTI-FILE)
+// Generate starter code - matches backend /generate-scaffold endpoint: each file's
+// code comes once in `files` rather than repeated in every task
 export async function generateStarterCodeBatch(
   tasks: Array<{
     task_description: string;
@@ -50,15 +94,11 @@ export async function generateStarterCodeBatch(
     known_language?: string;
     experience_level?: string;
     filename: string;  // NEW: required for multi-file support
-  }>
-): Promise<{
-  tasks: StarterCode[];
-  total_tasks: number;
-  generation_time: string;
-}> {
-  return apiCall("/generate-starter-code-batch", {
-    method: "POST",
-    body: JSON.stringify({ tasks }),
+  }>,
+  onJobProgress?: (completed: number, total: number) => void
+): Promise<BatchScaffoldResponse> {
+  return runJob<BatchScaffoldResponse>("generate-scaffold", { tasks }, (job) => {
+    if (onJobProgress && job.total > 0) onJobProgress(job.completed, job.total);
   });
 }
 
@@ -247,9 +287,15 @@ export async function parseAndScaffold(
   }, 4000); // Update every 3 seconds for smoother feel
 
   try {
-    // Single API call for all tasks
-    const batchResponse = await generateStarterCodeBatch(batchRequest);
+    // Single job for all tasks; finished files move the progress forward
+    const batchResponse = await generateStarterCodeBatch(batchRequest, (completed) => {
+      if (completed > currentProgress && completed < totalTasks) {
+        currentProgress = completed;
+        if (onProgress) onProgress("generating", currentProgress, totalTasks);
+      }
+    });
     const starterCodes = batchResponse.tasks;
+    const fileContents = batchResponse.files;
 
     // Clear interval and show complete
     clearInterval(progressInterval);
@@ -286,19 +332,6 @@ export async function parseAndScaffold(
 
     const commentSyntax = getCommentSyntax(targetLanguage);
 
-    // Group code snippets by filename
-    // IMPORTANT: Backend returns N tasks where each code_snippet contains the COMPLETE file.
-    // We only need the FIRST code_snippet for each file to avoid duplication.
-    const fileContents: Record<string, string> = {};
-    starterCodes.forEach((code) => {
-      const filename = code.filename;
-
-      // Only use the first task's code for each file (it already contains all tasks integrated)
-      if (!fileContents[filename]) {
-        fileContents[filename] = code.code_snippet;
-      }
-    });
-
     // Note: All files (code and data) are now handled by the backend code generation
     // Data files will have their own tasks and generated content just like code files
 
@@ -383,7 +416,8 @@ export async function extractPdfText(file: File): Promise<{
 }> {
   const API_BASE_URL =
     import.meta.env.VITE_API_BASE_URL || "http://localhost:8000";
-  const url = `${API_BASE_URL}/extract-pdf-text`;
+  // structured=true keeps code listings and tables as fenced blocks for the parser
+  const url = `${API_BASE_URL}/extract-pdf-text?structured=true`;
 
   const formData = new FormData();
   formData.append("file", file);
@@ -1,5 +1,5 @@
 import { useState } from 'react';
-import { Check, X, ChevronDown, ChevronRight, Edit2 } from 'lucide-react';
+import { Check, X, ChevronDown, ChevronRight, Edit2, MinusCircle } from 'lucide-react';
 import { Button } from './ui/button';
 import type { TestResult } from '../types';
 
@@ -7,10 +7,11 @@ interface TestCaseResultsProps {
   testResults?: TestResult[];
   testsPassedCount?: number;
   testsFailedCount?: number;
+  testsSkippedCount?: number;  // Tests not run because the code didn't compile
   onEditTests?: () => void;
 }
 
-export function TestCaseResults({ testResults, testsPassedCount, testsFailedCount, onEditTests }: TestCaseResultsProps) {
+export function TestCaseResults({ testResults, testsPassedCount, testsFailedCount, testsSkippedCount, onEditTests }: TestCaseResultsProps) {
   const [expandedTest, setExpandedTest] = useState<string | null>(null);
 
   if (!testResults || testResults.length === 0) {
@@ -38,6 +39,15 @@ export function TestCaseResults({ testResults, testsPassedCount, testsFailedCoun
                 <X className="h-4 w-4" />
                 {testsFailedCount || 0} failed
               </span>
+              {(testsSkippedCount || 0) > 0 && (
+                <>
+                  <span className="text-gray-400">|</span>
+                  <span className="flex items-center gap-1 text-gray-600 dark:text-gray-400">
+                    <MinusCircle className="h-4 w-4" />
+                    {testsSkippedCount} skipped
+                  </span>
+                </>
+              )}
             </div>
             {onEditTests && (
               <Button
@@ -59,7 +69,7 @@ export function TestCaseResults({ testResults, testsPassedCount, testsFailedCoun
             className={`h-full transition-all duration-300 ${
               testsPassedCount === totalTests
                 ? 'bg-green-500'
-                : (testsFailedCount || 0) > 0
+                : (testsFailedCount || 0) > 0 || (testsSkippedCount || 0) > 0
                 ? 'bg-red-500'
                 : 'bg-gray-400'
             }`}
@@ -102,6 +112,15 @@ export function TestCaseResults({ testResults, testsPassedCount, testsFailedCoun
                 {test.test_name}
               </span>
 
+              {/* Call duration */}
+              {test.skipped ? (
+                <span className="flex-shrink-0 text-xs text-gray-500 dark:text-gray-400">skipped</span>
+              ) : test.wall_time_ms != null && (
+                <span className="flex-shrink-0 text-xs text-gray-500 dark:text-gray-400 tabular-nums">
+                  {test.wall_time_ms < 1 ? '<1' : Math.round(test.wall_time_ms)} ms
+                </span>
+              )}
+
               {/* Expand/Collapse icon */}
               {expandedTest === test.test_name ? (
                 <ChevronDown className="h-4 w-4 text-gray-400" />
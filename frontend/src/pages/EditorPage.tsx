@@ -617,6 +617,7 @@ export function EditorPage() {
                             testResults={runnerResult.test_results}
                             testsPassedCount={runnerResult.tests_passed}
                             testsFailedCount={runnerResult.tests_failed}
+                            testsSkippedCount={runnerResult.tests_skipped}
                             onEditTests={() => setRunnerResult(null)}
                           />
                         </div>
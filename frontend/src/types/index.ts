@@ -74,6 +74,25 @@ export interface StarterCode {
   filename: string;  // NEW: which file this task belongs to
 }
 
+// Scaffold task (from backend /generate-scaffold): references its file's code
+// instead of carrying it
+export interface ScaffoldTask {
+  filename: string;  // Key into BatchScaffoldResponse.files
+  instructions: string;
+  todos: string[];
+  todo_lines?: { start_line: number; end_line: number } | null;  // 1-based lines holding this task's TODOs
+  concept_examples?: Record<string, string>;
+}
+
+// Generated starter code (v2): each file's code once, plus per-task records
+export interface BatchScaffoldResponse {
+  version: number;
+  files: Record<string, string>;  // filename -> complete starter code
+  tasks: ScaffoldTask[];
+  total_tasks: number;
+  generation_time?: string;
+}
+
 // Scaffold Package (adapted from StarterCode for compatibility)
 export interface ScaffoldPackage {
   todo_list: string[];
@@ -105,6 +124,10 @@ export interface TestResult {
   expected_output: string;
   actual_output: string;
   error?: string;
+  wall_time_ms?: number;   // Duration of the tested call
+  cpu_time_ms?: number;
+  peak_memory_kb?: number; // Peak memory of the process that ran the test
+  skipped?: boolean;       // Not run: the code failed the compile/syntax check
 }
 
 export interface FailedTest {
@@ -119,9 +142,14 @@ export interface RunnerResult {
   error: string;
   exit_code: number;
   execution_time: string;
+  wall_time_ms?: number;
+  cpu_time_ms?: number;
+  peak_memory_kb?: number;
   test_results?: TestResult[];
   tests_passed?: number;
   tests_failed?: number;
+  tests_skipped?: number;
+  cached?: boolean;        // Repeat of a recent identical run
 }
 
 export interface FeedbackResponse {